@@ -1,7 +1,8 @@
-import os, requests, time
-from flask import Flask, jsonify, request, send_from_directory
+import startup
+import os, time
+from flask import Flask, jsonify, request, Response
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager
+from flask_jwt_extended import JWTManager, verify_jwt_in_request
 from flask_bcrypt import Bcrypt
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
@@ -25,21 +26,50 @@ app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "super-secret-key") #
 app.config["MONGO_URI"] = os.getenv("MONGO_URI", "mongodb://localhost:27017/portfolio_db")
 app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024 # 16 MB limit
 
-from extensions import bcrypt, jwt, limiter
-from auth import auth_bp, init_admin
-from routes import api_bp
-from models import init_db
+with startup.phase("static manifest"):
+    from static_assets import static_files
+with startup.phase("imports"):
+    from extensions import bcrypt, jwt, limiter
+    from auth import auth_bp
+    from routes import api_bp
+    from visitor_ingest import visitor_ingest
+    import rollups
+    from sms_service import sms_outbox
+    from campaigns import campaigns
+    import bootstrap
+    from metrics import metrics
 
 bcrypt.init_app(app)
 jwt.init_app(app)
+# Before the limiter, so rejected requests are timed and counted too
+metrics.init_app(app)
 limiter.init_app(app)
 
 app.register_blueprint(auth_bp, url_prefix="/api/auth")
 app.register_blueprint(api_bp, url_prefix="/api")
 
-with app.app_context():
-    init_db()
-    init_admin()
+# index.html is served with the public content and settings embedded
+static_files.index_renderer = bootstrap.index_renderer
+
+# Keep the analytics rollups current as visitor logs are flushed
+visitor_ingest.listeners.append(rollups.record)
+rollups.url_map = app.url_map
+
+# Seed data, indexes and migrations: once per deployment, not per worker (see startup.py)
+with app.app_context(), startup.phase("database bootstrap"):
+    startup.bootstrap_database()
+
+print(startup.summary(), flush=True)
+
+@app.before_request
+def start_sms_dispatcher():
+    # One dispatcher per worker process, so messages left queued by a restart still go out
+    sms_outbox.start()
+
+@app.before_request
+def start_campaign_watcher():
+    # Picks up broadcasts whose worker went away mid-send
+    campaigns.watch()
 
 @app.before_request
 def log_visitor():
@@ -48,7 +78,7 @@ def log_visitor():
         return
 
     # Skip logging for static files, API calls (except home), admin, and broadcast
-    if request.path.startswith('/static') or request.path.startswith('/api/auth') or request.path.startswith('/admin') or request.path.startswith('/api/broadcast-message'):
+    if request.path.startswith('/static') or request.path.startswith('/api/media') or request.path.startswith('/api/metrics') or request.path.startswith('/api/auth') or request.path.startswith('/admin') or request.path.startswith('/api/broadcast-message'):
         return
 
     # Don't log internal API calls or specific static assets
@@ -61,27 +91,14 @@ def log_visitor():
         
         ua = request.headers.get('User-Agent', '')
         
-        # Geolocation via free API (ip-api.com)
-        geo_data = {}
-        try:
-            geo_resp = requests.get(f"http://ip-api.com/json/{ip}?fields=status,country,city,lat,lon", timeout=2).json()
-            if geo_resp.get('status') == 'success':
-                geo_data = {
-                    "country": geo_resp.get('country'),
-                    "city": geo_resp.get('city'),
-                    "lat": geo_resp.get('lat'),
-                    "lon": geo_resp.get('lon')
-                }
-        except:
-            pass
-
-        from models import visitor_logs
-        visitor_logs.insert_one({
+        # Geolocation and the Mongo write happen in the background ingest worker
+        visitor_ingest.submit({
             "ip": ip,
             "ua": ua,
             "path": request.path,
-            "timestamp": int(time.time()),
-            **geo_data
+            # The matched rule; analytics counts routes rather than raw URLs
+            "route": request.url_rule.rule if request.url_rule else None,
+            "timestamp": int(time.time())
         })
     except Exception as e:
         print(f"Logging error: {e}")
@@ -90,21 +107,28 @@ def log_visitor():
 def health_check():
     return jsonify({"status": "healthy"}), 200
 
+# Prometheus scrape endpoint: the merged metrics of every worker on this host.
+# Open to a bearer METRICS_TOKEN (for the scraper) or an admin session.
+@app.route("/api/metrics", methods=["GET"])
+@limiter.exempt
+def metrics_endpoint():
+    token = os.getenv("METRICS_TOKEN")
+    if not (token and request.headers.get("Authorization") == f"Bearer {token}"):
+        verify_jwt_in_request()
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 # Serve Frontend Static Files (Production)
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
+@limiter.exempt
 def serve_frontend(path):
     """Serve the React frontend in production"""
-    dist_dir = os.path.join(os.path.dirname(__file__), 'static', 'dist')
-    
-    # If path exists in dist directory, serve it
-    if path and os.path.exists(os.path.join(dist_dir, path)):
-        return send_from_directory(dist_dir, path)
-    
-    # Otherwise serve index.html (for SPA routing)
-    if os.path.exists(os.path.join(dist_dir, 'index.html')):
-        return send_from_directory(dist_dir, 'index.html')
-    
+    # Precompressed, in-memory files from the startup manifest of static/dist;
+    # unknown paths get index.html (for SPA routing)
+    response = static_files.serve(path)
+    if response is not None:
+        return response
+
     # Fallback if dist not built yet
     return jsonify({"message": "Frontend not built. Run 'npm run build' in frontend directory."}), 404
 
@@ -1,32 +1,54 @@
 import os
 import random
 import time
+import datetime
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from models import settings, password_reset_otp
-from extensions import bcrypt, limiter
-from sms_service import sms_service
+from extensions import limiter
+from sms_service import sms_outbox
+from passwords import hasher, HasherBusy
 
 auth_bp = Blueprint("auth", __name__)
 
 # Hardcoded Admin Credentials (Initial setup)
 # In a real app, these would be moved to env or DB after first setup
 ADMIN_MOBILE = os.getenv("ADMIN_MOBILE", "9860000000")
-ADMIN_PASSWORD_HASH = bcrypt.generate_password_hash(os.getenv("ADMIN_PASSWORD", "Admin@123")).decode('utf-8')
 
 def init_admin():
+    # The bcrypt hash is deliberately slow, so it is only computed when the record is missing
     if settings.count_documents({"type": "admin_credentials"}) == 0:
         settings.insert_one({
             "type": "admin_credentials",
+            "updated_at": int(time.time()),
             "mobile": ADMIN_MOBILE,
-            "password": ADMIN_PASSWORD_HASH
+            "password": hasher.hash(os.getenv("ADMIN_PASSWORD", "Admin@123"))
         })
 
-import pyotp
-import qrcode
+def _ttl_date(expiry):
+    # OTP records are purged by the expires_at TTL index; keep them a while past expiry
+    # so the "OTP expired" message still works
+    return datetime.datetime.fromtimestamp(expiry + 3600, datetime.timezone.utc)
+
 import io
 import base64
 
+@auth_bp.errorhandler(HasherBusy)
+def hasher_busy(e):
+    # Every password-hashing slot stayed taken for the whole queue timeout
+    response = jsonify({"error": "Too many sign-in attempts right now, please retry"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+def _rehash_if_needed(admin, password):
+    # Moves the stored hash to the configured bcrypt cost; skipped if the password changed meanwhile
+    if not hasher.needs_rehash(admin["password"]):
+        return
+    hasher.rehash_later(password, lambda new_hash: settings.update_one(
+        {"_id": admin["_id"], "password": admin["password"]},
+        {"$set": {"password": new_hash, "updated_at": int(time.time())}}
+    ))
+
 @auth_bp.route("/login", methods=["POST"])
 @limiter.limit("5 per minute")
 def login():
@@ -36,17 +58,19 @@ def login():
     totp_code = data.get("totp_code")
 
     admin = settings.find_one({"type": "admin_credentials"})
-    if admin and admin["mobile"] == mobile and bcrypt.check_password_hash(admin["password"], password):
+    if admin and admin["mobile"] == mobile and hasher.check(admin["password"], password):
         
         # Check MFA
         if admin.get("totp_secret"):
             if not totp_code:
                 return jsonify({"error": "mfa_required", "message": "Two-factor authentication code required"}), 403
             
+            import pyotp
             totp = pyotp.TOTP(admin["totp_secret"])
             if not totp.verify(totp_code):
                 return jsonify({"error": "Invalid 2FA code"}), 401
 
+        _rehash_if_needed(admin, password)
         access_token = create_access_token(identity=mobile)
         return jsonify({"token": access_token}), 200
     
@@ -55,6 +79,10 @@ def login():
 @auth_bp.route("/setup-2fa", methods=["POST"])
 @jwt_required()
 def setup_2fa():
+    # pyotp and qrcode (which pulls in Pillow) are only needed by the 2FA endpoints
+    import pyotp
+    import qrcode
+
     # Generate random secret
     secret = pyotp.random_base32()
     
@@ -80,12 +108,13 @@ def verify_2fa_setup():
     secret = data.get("secret")
     token = data.get("token")
     
+    import pyotp
     totp = pyotp.TOTP(secret)
     if totp.verify(token):
         # Save secret to admin credentials
         settings.update_one(
             {"type": "admin_credentials"},
-            {"$set": {"totp_secret": secret}}
+            {"$set": {"totp_secret": secret, "updated_at": int(time.time())}}
         )
         return jsonify({"message": "2FA enabled successfully"}), 200
     
@@ -99,12 +128,12 @@ def disable_2fa():
     
     # verify password first for security
     admin = settings.find_one({"type": "admin_credentials"})
-    if not bcrypt.check_password_hash(admin["password"], password):
+    if not hasher.check(admin["password"], password):
         return jsonify({"error": "Invalid password"}), 401
         
     settings.update_one(
         {"type": "admin_credentials"},
-        {"$unset": {"totp_secret": ""}}
+        {"$unset": {"totp_secret": ""}, "$set": {"updated_at": int(time.time())}}
     )
     return jsonify({"message": "2FA disabled successfully"}), 200
 
@@ -124,11 +153,11 @@ def forgot_password():
 
     password_reset_otp.update_one(
         {"mobile": mobile},
-        {"$set": {"otp": otp, "expiry": expiry, "attempts": 0}},
+        {"$set": {"otp": otp, "expiry": expiry, "expires_at": _ttl_date(expiry), "attempts": 0}},
         upsert=True
     )
 
-    sms_service.send_sms(mobile, f"Your OTP for password reset is {otp}. Valid for 60 seconds.")
+    sms_outbox.enqueue(mobile, f"Your OTP for password reset is {otp}. Valid for 60 seconds.", sensitive=True, expires_at=expiry)
     
     return jsonify({"message": "OTP sent successfully"}), 200
 
@@ -167,10 +196,13 @@ def reset_password():
     if reset_token != "verified":
         return jsonify({"error": "Unauthorized"}), 401
 
-    new_hash = bcrypt.generate_password_hash(new_password).decode('utf-8')
+    try:
+        new_hash = hasher.hash(new_password or "")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     settings.update_one(
         {"type": "admin_credentials"},
-        {"$set": {"password": new_hash}}
+        {"$set": {"password": new_hash, "updated_at": int(time.time())}}
     )
     
     # Clear OTP
@@ -191,11 +223,11 @@ def request_mobile_change():
 
     password_reset_otp.update_one(
         {"mobile": mobile},
-        {"$set": {"otp": otp, "expiry": expiry, "attempts": 0, "type": "change_mobile"}},
+        {"$set": {"otp": otp, "expiry": expiry, "expires_at": _ttl_date(expiry), "attempts": 0, "type": "change_mobile"}},
         upsert=True
     )
 
-    sms_service.send_sms(mobile, f"Your OTP to change admin mobile is {otp}. Do not share this.")
+    sms_outbox.enqueue(mobile, f"Your OTP to change admin mobile is {otp}. Do not share this.", sensitive=True, expires_at=expiry)
     return jsonify({"message": f"OTP sent to ending in {mobile[-4:]}"}), 200
 
 @auth_bp.route("/verify-mobile-change", methods=["POST"])
@@ -226,7 +258,7 @@ def verify_mobile_change():
     # Success
     settings.update_one(
         {"type": "admin_credentials"},
-        {"$set": {"mobile": new_mobile}}
+        {"$set": {"mobile": new_mobile, "updated_at": int(time.time())}}
     )
     password_reset_otp.delete_one({"mobile": current_mobile})
 
@@ -0,0 +1,185 @@
+import sys
+import time
+import zlib
+import json
+import hashlib
+import datetime
+from bson import json_util
+from models import db, settings
+from content_cache import content_cache
+
+# Streaming backup archive.
+# An archive is one gzip stream of NDJSON. Documents are Extended JSON (so
+# ObjectIds and dates survive a restore), grouped into per-collection sections
+# that are delimited by control lines carrying a "__backup__" key:
+#
+#   {"__backup__": "header", "version": 1, "created_at": ...}
+#   {"__backup__": "section", "collection": "contact_messages"}
+#   ...one document per line...
+#   {"__backup__": "end", "collection": "contact_messages", "count": n, "sha256": "..."}
+#   {"__backup__": "manifest", "collections": {name: {"count", "sha256"}}, ...}
+#
+# Each section's checksum covers its document lines exactly as written.
+#
+# A "full" archive holds every document. A "delta" archive holds only what
+# changed since the previous backup (settings.last_backup): documents whose
+# change field is at or after that watermark, plus tombstones for deletes.
+# The watermark is backed off by DELTA_OVERLAP seconds so writes stamped just
+# before a backup but committed after it are picked up by the next delta;
+# replaying a document twice is harmless. Visitor logs are stamped with
+# ingested_at when the write-behind worker inserts them, not when the visit
+# happened, which can be a flush interval or more earlier.
+# restore.py replays a full archive followed by its chain of deltas.
+
+FORMAT_VERSION = 1
+COLLECTIONS = ["portfolio_content", "blog_posts", "settings", "contact_messages", "visitor_logs"]
+# Never written to an archive
+EXCLUDED_FIELDS = {"settings": {"password": 0, "totp_secret": 0}}
+# Field each collection's writes stamp, used to select a delta
+CHANGE_FIELDS = {
+    "portfolio_content": "updated_at",
+    "blog_posts": "updated_at",
+    "settings": "updated_at",
+    "contact_messages": "updated_at",
+    "visitor_logs": "ingested_at",
+    "tombstones": "deleted_at"
+}
+DELTA_OVERLAP = 60
+BATCH_SIZE = 1000
+COMPRESS_LEVEL = 6
+FLUSH_BYTES = 256 * 1024
+
+def _control(kind, **fields):
+    return json.dumps({"__backup__": kind, **fields}) + "\n"
+
+def _lines(collections, created_at, query=None, manifest_extra=None):
+    # Yields NDJSON text lines; fills in the manifest as sections complete
+    manifest = {}
+    yield _control("header", version=FORMAT_VERSION, created_at=created_at, **(manifest_extra or {}))
+    for name in collections:
+        digest = hashlib.sha256()
+        count = 0
+        yield _control("section", collection=name)
+        cursor = db[name].find((query or {}).get(name, {}), EXCLUDED_FIELDS.get(name)).batch_size(BATCH_SIZE)
+        for doc in cursor:
+            line = json_util.dumps(doc) + "\n"
+            digest.update(line.encode("utf-8"))
+            count += 1
+            yield line
+        manifest[name] = {"count": count, "sha256": digest.hexdigest()}
+        yield _control("end", collection=name, **manifest[name])
+    yield _control("manifest", version=FORMAT_VERSION, created_at=created_at, collections=manifest, **(manifest_extra or {}))
+
+def stream_archive(collections, created_at, query=None, manifest_extra=None, on_complete=None):
+    # gzip-compressed archive as a generator of byte chunks
+    compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 31)
+    pending = []
+    size = 0
+    for line in _lines(collections, created_at, query, manifest_extra):
+        data = line.encode("utf-8")
+        pending.append(data)
+        size += len(data)
+        if size >= FLUSH_BYTES:
+            chunk = compressor.compress(b"".join(pending))
+            pending, size = [], 0
+            if chunk:
+                yield chunk
+    yield compressor.compress(b"".join(pending)) + compressor.flush()
+    if on_complete:
+        on_complete()
+
+def record_backup(started_at, mode):
+    # Fills the last_backup field init_db reserves in the admin settings; public settings
+    # show it, so cached responses are invalidated like any other settings edit
+    settings.update_one(
+        {"type": "admin_credentials"},
+        {"$set": {"last_backup": started_at, "last_backup_mode": mode, "updated_at": int(time.time())}}
+    )
+    content_cache.bump()
+
+def full_backup_stream():
+    started_at = int(time.time())
+    return stream_archive(
+        COLLECTIONS,
+        started_at,
+        manifest_extra={"mode": "full"},
+        on_complete=lambda: record_backup(started_at, "full")
+    )
+
+def last_backup():
+    admin = settings.find_one({"type": "admin_credentials"}, {"last_backup": 1})
+    return admin.get("last_backup") if admin else None
+
+def delta_backup_stream():
+    since = last_backup()
+    if since is None:
+        raise ValueError("No previous backup to diff against; take a full backup first")
+    started_at = int(time.time())
+    names = COLLECTIONS + ["tombstones"]
+    query = {name: {CHANGE_FIELDS[name]: {"$gte": since - DELTA_OVERLAP}} for name in names}
+    # Logs written before ingested_at was stamped
+    query["visitor_logs"] = {"$or": [
+        query["visitor_logs"],
+        {"ingested_at": {"$exists": False}, "timestamp": {"$gte": since - DELTA_OVERLAP}}
+    ]}
+    return stream_archive(
+        names,
+        started_at,
+        query,
+        manifest_extra={"mode": "delta", "since": since},
+        on_complete=lambda: record_backup(started_at, "delta")
+    )
+
+class ArchiveError(Exception):
+    pass
+
+def read_archive(fileobj):
+    # Yields ("header"|"manifest", meta) and ("doc", collection, doc) events,
+    # verifying each section's count and checksum against its end line
+    section = None
+    digest = None
+    count = 0
+    for raw in fileobj:
+        line = raw.decode("utf-8") if isinstance(raw, bytes) else raw
+        if not line.strip():
+            continue
+        if line.startswith('{"__backup__"'):
+            meta = json.loads(line)
+            kind = meta["__backup__"]
+            if kind == "section":
+                section, digest, count = meta["collection"], hashlib.sha256(), 0
+            elif kind == "end":
+                if meta["collection"] != section:
+                    raise ArchiveError(f"Section {section} closed as {meta['collection']}")
+                if meta["count"] != count or meta["sha256"] != digest.hexdigest():
+                    raise ArchiveError(f"Checksum mismatch in section {section}")
+                section = None
+            else:
+                yield (kind, meta)
+            continue
+        if section is None:
+            raise ArchiveError("Document outside of a section")
+        digest.update(line.encode("utf-8") if line.endswith("\n") else (line + "\n").encode("utf-8"))
+        count += 1
+        yield ("doc", section, json_util.loads(line))
+
+def write_archive(path, stream):
+    written = 0
+    with open(path, "wb") as f:
+        for chunk in stream:
+            f.write(chunk)
+            written += len(chunk)
+    return written
+
+def archive_name(kind="full"):
+    return f"portfolio_backup_{kind}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.ndjson.gz"
+
+if __name__ == "__main__":
+    # python backup.py [--delta] [output path]
+    args = sys.argv[1:]
+    delta = "--delta" in args
+    args = [a for a in args if a != "--delta"]
+    path = args[0] if args else archive_name("delta" if delta else "full")
+    start = time.perf_counter()
+    size = write_archive(path, delta_backup_stream() if delta else full_backup_stream())
+    print(f"Wrote {path} ({size} bytes) in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,323 @@
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import argparse
+import threading
+import resource
+import tempfile
+
+# Endpoint benchmarks.
+# Seeds a throwaway database with configurable volumes, drives the endpoints
+# through Flask's test client, and reports per-scenario latency percentiles,
+# throughput and RSS growth as JSON, plus the run's peak RSS. Outbound calls
+# are stubbed: SMS goes to the fake gateway and ip-api geo lookups to a
+# deterministic local function.
+#
+#   python bench.py                                  # in-process mongomock
+#   python bench.py --mongo-uri mongodb://localhost:27017/ --preset large
+#   python bench.py --save-baseline                  # record bench_baseline.json
+#   python bench.py --check                          # exit 1 on regression
+#
+# mongomock is not a dependency of the app (pip install mongomock to use the
+# stand-in). Against a real server the data goes into MONGO_DB_NAME
+# (portfolio_bench by default), which is dropped first.
+
+PRESETS = {
+    "small": {"visitors": 10_000, "messages": 10_000, "posts": 200, "post_words": 1500, "portfolio_items": 100},
+    "medium": {"visitors": 100_000, "messages": 50_000, "posts": 1000, "post_words": 2000, "portfolio_items": 300},
+    "large": {"visitors": 1_000_000, "messages": 100_000, "posts": 5000, "post_words": 3000, "portfolio_items": 1000}
+}
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+BENCH_DB = "portfolio_bench"
+SEED_BATCH = 10_000
+RSS_SLACK_MB = 5
+COUNTRIES = ["Nepal", "India", "United States", "Germany", "Japan", "Australia", "Brazil", "Canada"]
+PATHS = ["/", "/api/content", "/api/blog", "/api/settings_public", "/resume", "/portfolio"]
+REASONS = ["Project Inquiry", "Job Offer", "Collaboration", "Other"]
+WORDS = "flutter dart mobile app design backend api cloud firebase state widget build release test deploy".split()
+
+def _environment(args):
+    # Everything the app reads at import time
+    os.environ["MONGO_DB_NAME"] = args.db_name
+    os.environ["SMS_GATEWAY"] = "fake"
+    os.environ["RATELIMIT_STORAGE"] = "memory"
+    os.environ["STARTUP_BOOTSTRAP"] = "always"
+    os.environ["BCRYPT_LOG_ROUNDS"] = "4"
+    os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="bench-metrics-")
+    os.environ["VISITOR_FLUSH_INTERVAL"] = "0.5"
+    os.environ.setdefault("JWT_SECRET_KEY", "bench-" + "x" * 40)
+    if args.mongo_uri:
+        os.environ["MONGO_URI"] = args.mongo_uri
+        return "mongodb"
+    try:
+        import mongomock
+    except ImportError:
+        sys.exit("mongomock is not installed; pip install mongomock or pass --mongo-uri")
+    import pymongo
+    client = mongomock.MongoClient()
+    pymongo.MongoClient = lambda *a, **k: client
+    return "mongomock"
+
+def _text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+def seed(volumes, rng):
+    from models import db, visitor_logs, contact_messages, blog_posts
+    import rollups
+    import blog
+    import sections
+    now = int(time.time())
+    started = time.perf_counter()
+
+    for start in range(0, volumes["visitors"], SEED_BATCH):
+        visitor_logs.insert_many([{
+            "ip": f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}",
+            "ua": "Mozilla/5.0 (bench)",
+            "path": rng.choice(PATHS),
+            "timestamp": now - rng.randrange(90 * 86400),
+            "country": rng.choice(COUNTRIES),
+            "city": "Bench City"
+        } for _ in range(min(SEED_BATCH, volumes["visitors"] - start))], ordered=False)
+    rollups.backfill()
+
+    for start in range(0, volumes["messages"], SEED_BATCH):
+        docs = []
+        for i in range(min(SEED_BATCH, volumes["messages"] - start)):
+            ts = now - rng.randrange(365 * 86400)
+            docs.append({
+                "name": f"Sender {start + i}",
+                "email": f"sender{start + i}@example.com",
+                "phone": f"98{rng.randrange(10 ** 8):08d}",
+                "reason": rng.choice(REASONS),
+                "message": _text(rng, rng.randrange(20, 200)),
+                "status": rng.choice(["unread", "read"]),
+                "timestamp": ts,
+                "updated_at": ts
+            })
+        contact_messages.insert_many(docs, ordered=False)
+
+    posts = []
+    for i in range(volumes["posts"]):
+        day = time.strftime("%Y-%m-%d", time.gmtime(now - i * 86400))
+        post = {
+            "slug": f"bench-post-{i}", "title": f"Bench post {i}", "category": "Bench", "date": day,
+            "image": "", "image_srcset": "",
+            "content": "".join(f"<p>{_text(rng, 100)}</p>" for _ in range(volumes["post_words"] // 100)),
+            "version": 1, "created_at": now, "updated_at": now
+        }
+        post.update(blog.derived_fields(post))
+        posts.append(post)
+    if posts:
+        blog_posts.insert_many(posts, ordered=False)
+
+    items = [{"title": f"Project {i}", "category": "App", "image": "", "description": _text(rng, 60)} for i in range(volumes["portfolio_items"])]
+    sections.replace_section("portfolio", items)
+    return {"seconds": round(time.perf_counter() - started, 2), "collections": {
+        name: db[name].estimated_document_count() for name in ("visitor_logs", "contact_messages", "blog_posts")
+    }}
+
+def scenarios(requests):
+    # (name, method, path, needs_auth, iterations); heavy exports/backups run fewer times
+    heavy = max(3, requests // 20)
+    return [
+        ("get_content", "GET", "/api/content", False, requests),
+        ("blog_list", "GET", "/api/blog", False, requests),
+        ("blog_post", "GET", "/api/blog/bench-post-0", False, requests),
+        ("get_inbox", "GET", "/api/inbox?limit=50", True, requests),
+        ("get_analytics", "GET", "/api/analytics?window=30d", True, max(10, requests // 4)),
+        ("export_csv", "GET", "/api/export-messages?format=csv", True, heavy),
+        ("export_xlsx", "GET", "/api/export-messages?format=xlsx", True, heavy),
+        ("backup_full", "GET", "/api/backup", True, heavy),
+        ("log_visitor", "GET", "/api/health", False, requests)
+    ]
+
+def _percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def _current_rss_mb():
+    # Resident set size right now (Linux); None where /proc is not available
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * resource.getpagesize() / (1024 * 1024)
+
+class RSSSampler:
+    # How far RSS rose above its starting point while a scenario ran. ru_maxrss is the peak of
+    # the whole process, so it carries every earlier scenario's peak; sampling the current RSS
+    # keeps each scenario's figure its own. Without /proc it falls back to growth of the peak.
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.growth_mb = 0.0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        return _current_rss_mb() or _peak_rss_mb()
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            self._peak = max(self._peak, self._sample())
+
+    def __enter__(self):
+        self._start = self._peak = self._sample()
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._peak = max(self._peak, self._sample())
+        self.growth_mb = round(max(0.0, self._peak - self._start), 1)
+
+def run(client, headers, name, method, path, auth, iterations, warmup, rng):
+    latencies = []
+    status = None
+    sampler = RSSSampler()
+    with sampler:
+        for i in range(warmup + iterations):
+            request_headers = dict(headers) if auth else {}
+            if name == "log_visitor":
+                # A different visitor each time, so the hook does its full work
+                request_headers["X-Forwarded-For"] = f"172.16.{rng.randrange(256)}.{rng.randrange(256)}"
+            started = time.perf_counter()
+            response = client.open(path, method=method, headers=request_headers)
+            response.get_data()  # drain streamed bodies (exports, backups)
+            elapsed = time.perf_counter() - started
+            status = response.status_code
+            if status >= 400:
+                raise RuntimeError(f"{name}: {method} {path} returned {status}: {response.get_data(as_text=True)[:200]}")
+            if i >= warmup:
+                latencies.append(elapsed)
+    total = sum(latencies)
+    return {
+        "iterations": iterations,
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 3),
+        "throughput_rps": round(iterations / total, 1) if total else None,
+        "rss_growth_mb": sampler.growth_mb
+    }
+
+def compare(results, baseline, tolerance):
+    # Regressions beyond tolerance: slower p95, lower throughput or more memory than the baseline.
+    # Memory figures of a few MB are mostly allocator noise, so RSS_SLACK_MB is allowed on top.
+    failures = []
+    if results["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + tolerance) + RSS_SLACK_MB:
+        failures.append(f"peak RSS {results['peak_rss_mb']}MB vs baseline {baseline['peak_rss_mb']}MB")
+    for name, base in baseline["scenarios"].items():
+        current = results["scenarios"].get(name)
+        if current is None:
+            continue
+        if current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            failures.append(f"{name}: p95 {current['p95_ms']}ms vs baseline {base['p95_ms']}ms")
+        if base.get("throughput_rps") and current["throughput_rps"] < base["throughput_rps"] / (1 + tolerance):
+            failures.append(f"{name}: {current['throughput_rps']} req/s vs baseline {base['throughput_rps']} req/s")
+        if current["rss_growth_mb"] > base["rss_growth_mb"] * (1 + tolerance) + RSS_SLACK_MB:
+            failures.append(f"{name}: RSS growth {current['rss_growth_mb']}MB vs baseline {base['rss_growth_mb']}MB")
+    return failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the API endpoints against seeded data")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="small")
+    for key in PRESETS["small"]:
+        parser.add_argument(f"--{key.replace('_', '-')}", type=int, help=f"overrides the preset's {key}")
+    parser.add_argument("--mongo-uri", help="benchmark a real MongoDB instead of the in-process mongomock")
+    parser.add_argument("--db-name", default=BENCH_DB)
+    parser.add_argument("--requests", type=int, default=200, help="iterations per light scenario")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--only", help="comma-separated scenario names")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write the JSON report here as well as to stdout")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="exit 1 if a scenario regressed past the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed regression as a fraction (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    if args.db_name == "portfolio_db":
+        sys.exit("Refusing to benchmark in portfolio_db; the benchmark database is dropped first")
+    volumes = {key: getattr(args, key) if getattr(args, key) is not None else value for key, value in PRESETS[args.preset].items()}
+    backend = _environment(args)
+    rng = random.Random(args.seed)
+
+    from models import client as mongo_client
+    mongo_client.drop_database(args.db_name)
+    import app as app_module
+    from flask_jwt_extended import create_access_token
+    from extensions import limiter
+    from visitor_ingest import visitor_ingest, ip_api_geo
+    import routes
+
+    limiter.enabled = False
+    # ip-api is the only outbound lookup on the request path; answer it locally
+    def stub_geo(batch):
+        for event in batch:
+            event.setdefault("country", COUNTRIES[zlib.crc32(str(event.get("ip")).encode()) % len(COUNTRIES)])
+    visitor_ingest.enrichers[:] = [stub_geo if e is ip_api_geo else e for e in visitor_ingest.enrichers]
+    notes = []
+    if backend == "mongomock":
+        # mongomock has no $substrCP; the inbox list is measured without its message preview
+        routes.INBOX_SUMMARY_FIELDS = {k: v for k, v in routes.INBOX_SUMMARY_FIELDS.items() if k != "preview"}
+        notes.append("mongomock: inbox measured without the $substrCP preview projection")
+
+    try:
+        seeded = seed(volumes, rng)
+        app = app_module.app
+        with app.app_context():
+            from models import settings
+            mobile = settings.find_one({"type": "admin_credentials"})["mobile"]
+            headers = {"Authorization": f"Bearer {create_access_token(identity=mobile)}"}
+        client = app.test_client()
+
+        wanted = set(args.only.split(",")) if args.only else None
+        results = {
+            "backend": backend, "preset": args.preset, "volumes": volumes, "seed": seeded, "notes": notes,
+            "python": sys.version.split()[0], "scenarios": {}
+        }
+        for name, method, path, auth, iterations in scenarios(args.requests):
+            if wanted and name not in wanted:
+                continue
+            print(f"Running {name} ({iterations}x)", file=sys.stderr, flush=True)
+            results["scenarios"][name] = run(client, headers, name, method, path, auth, iterations, args.warmup, rng)
+        results["peak_rss_mb"] = _peak_rss_mb()
+        results["ingest"] = visitor_ingest.stats()
+
+        report = json.dumps(results, indent=2)
+        print(report)
+        if args.out:
+            with open(args.out, "w") as f:
+                f.write(report + "\n")
+
+        if args.save_baseline:
+            with open(args.baseline, "w") as f:
+                f.write(report + "\n")
+            print(f"Baseline saved to {args.baseline}", file=sys.stderr)
+        if args.check:
+            if not os.path.exists(args.baseline):
+                sys.exit(f"No baseline at {args.baseline}; record one with --save-baseline")
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+            if baseline.get("volumes") != volumes or baseline.get("backend") != backend:
+                sys.exit("Baseline was recorded with different volumes or backend; re-record it")
+            failures = compare(results, baseline, args.tolerance)
+            for failure in failures:
+                print(f"REGRESSION {failure}", file=sys.stderr)
+            if failures:
+                sys.exit(1)
+            print(f"No regressions beyond {args.tolerance:.0%}", file=sys.stderr)
+    finally:
+        mongo_client.drop_database(args.db_name)
+
+if __name__ == "__main__":
+    main()
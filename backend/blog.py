@@ -0,0 +1,242 @@
+import re
+import sys
+import math
+import time
+import base64
+import datetime
+import unicodedata
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from models import blog_posts, portfolio_content, record_deletion
+import search
+
+# Blog posts, one document each (previously one array in the "blog" section
+# of portfolio_content):
+#
+#   {"slug", "title", "category", "date", "image", "image_srcset", "content",
+#    "summary", "reading_time", "published_at", "version", "created_at",
+#    "updated_at", "legacy_id"}
+#
+# "date" is the display date the admin types; published_at is its parsed
+# timestamp and orders the list. summary and reading_time are derived from
+# the body on every write, so list pages never need the bodies.
+
+PAGE_SIZE = 10
+MAX_PAGE_SIZE = 50
+SUMMARY_LENGTH = 200
+WORDS_PER_MINUTE = 200
+EDITABLE_FIELDS = ("title", "category", "date", "image", "image_srcset", "content")
+SUMMARY_FIELDS = {
+    "slug": 1, "title": 1, "category": 1, "date": 1, "image": 1, "image_srcset": 1,
+    "summary": 1, "reading_time": 1, "published_at": 1, "version": 1
+}
+DATE_FORMATS = ("%Y-%m-%d", "%b %d, %Y", "%B %d, %Y", "%d %B, %Y", "%d %b, %Y", "%d %B %Y", "%d %b %Y", "%m/%d/%Y")
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_SLUG_RE = re.compile(r"[^a-z0-9]+")
+
+class NotFound(Exception):
+    pass
+
+class Conflict(Exception):
+    def __init__(self, current, message="Post was changed by someone else"):
+        super().__init__(message)
+        self.current = current
+
+def slugify(title):
+    text = unicodedata.normalize("NFKD", str(title or "")).encode("ascii", "ignore").decode("ascii")
+    return _SLUG_RE.sub("-", text.lower()).strip("-")[:80] or "post"
+
+def unique_slug(title, exclude_id=None):
+    base = slugify(title)
+    slug, n = base, 1
+    while True:
+        query = {"slug": slug}
+        if exclude_id is not None:
+            query["_id"] = {"$ne": exclude_id}
+        if blog_posts.count_documents(query, limit=1) == 0:
+            return slug
+        n += 1
+        slug = f"{base}-{n}"
+
+def plain_text(html):
+    text = _TAG_RE.sub(" ", str(html or ""))
+    for entity, char in (("&nbsp;", " "), ("&amp;", "&"), ("&lt;", "<"), ("&gt;", ">"), ("&quot;", '"'), ("&#39;", "'")):
+        text = text.replace(entity, char)
+    return " ".join(text.split())
+
+def summarize(text, length=SUMMARY_LENGTH):
+    if len(text) <= length:
+        return text
+    cut = text[:length].rsplit(" ", 1)[0]
+    return cut.rstrip(",.;:-") + "…"
+
+def parse_date(value, default=None):
+    for fmt in DATE_FORMATS:
+        try:
+            return int(datetime.datetime.strptime(str(value).strip(), fmt).timestamp())
+        except ValueError:
+            continue
+    return default if default is not None else int(time.time())
+
+def derived_fields(post):
+    # summary/reading_time/published_at for a post's current fields
+    text = plain_text(post.get("content"))
+    words = len(text.split())
+    return {
+        "summary": summarize(text),
+        "reading_time": max(1, math.ceil(words / WORDS_PER_MINUTE)),
+        "published_at": parse_date(post.get("date"), post.get("published_at"))
+    }
+
+def _public(post):
+    post["id"] = str(post.pop("_id"))
+    post.pop("legacy_id", None)
+    return post
+
+def encode_cursor(post):
+    raw = f"{post['published_at']}:{post['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    ts, last_id = raw.split(":", 1)
+    return int(ts), ObjectId(last_id)
+
+def list_summaries(cursor=None, limit=PAGE_SIZE):
+    # Newest first, keyset-paginated on (published_at, _id); raises ValueError on a bad cursor
+    limit = min(max(int(limit), 1), MAX_PAGE_SIZE)
+    query = {}
+    if cursor:
+        try:
+            ts, last_id = decode_cursor(cursor)
+        except (ValueError, InvalidId, UnicodeDecodeError):
+            raise ValueError("Invalid cursor")
+        query["$or"] = [
+            {"published_at": {"$lt": ts}},
+            {"published_at": ts, "_id": {"$lt": last_id}}
+        ]
+    posts = list(blog_posts.find(query, SUMMARY_FIELDS).sort([("published_at", -1), ("_id", -1)]).limit(limit + 1))
+    next_cursor = None
+    if len(posts) > limit:
+        posts = posts[:limit]
+        next_cursor = encode_cursor(posts[-1])
+    return {"posts": [_public(p) for p in posts], "next_cursor": next_cursor}
+
+def get_post(slug):
+    post = blog_posts.find_one({"slug": slug})
+    if post is None:
+        raise NotFound("Post not found")
+    return _public(post)
+
+def count():
+    # Collection metadata count; no documents are read
+    return blog_posts.estimated_document_count()
+
+def _fields(data):
+    return {k: data[k] for k in EDITABLE_FIELDS if k in data}
+
+def create_post(data, legacy_id=None):
+    # None if a post for legacy_id already exists (another worker migrated it first)
+    now = int(time.time())
+    post = {"title": "Untitled", "content": "", **_fields(data)}
+    post.update(derived_fields(post))
+    post.update({"version": 1, "created_at": now, "updated_at": now})
+    if legacy_id:
+        post["legacy_id"] = legacy_id
+    for _ in range(5):
+        post["slug"] = unique_slug(post["title"])
+        try:
+            post["_id"] = blog_posts.insert_one(post).inserted_id
+            break
+        except DuplicateKeyError:
+            if legacy_id and blog_posts.count_documents({"legacy_id": legacy_id}, limit=1):
+                return None
+            post.pop("_id", None)
+    else:
+        # Other posts with the same title kept taking each free slug first
+        raise Conflict(None, "Could not reserve a slug for this title, please retry")
+    search.safely(index_post, post)
+    return _public(post)
+
+def update_post(post_id, data, version):
+    # Applies the changed fields if the post is still at `version`
+    post_id = ObjectId(post_id)
+    current = blog_posts.find_one({"_id": post_id})
+    if current is None:
+        raise NotFound("Post not found")
+    if current.get("version") != version:
+        raise Conflict(_public(current))
+    changes = _fields(data)
+    merged = {**current, **changes}
+    changes.update(derived_fields(merged))
+    if "title" in changes and changes["title"] != current.get("title"):
+        # Slugs follow the title; a link to the old slug stops working once the title changes
+        changes["slug"] = unique_slug(changes["title"], exclude_id=post_id)
+    changes["updated_at"] = int(time.time())
+    post = blog_posts.find_one_and_update(
+        {"_id": post_id, "version": version},
+        {"$set": changes, "$inc": {"version": 1}},
+        return_document=ReturnDocument.AFTER
+    )
+    if post is None:
+        raise Conflict(_public(blog_posts.find_one({"_id": post_id})))
+    search.safely(index_post, post)
+    return _public(post)
+
+def delete_post(post_id, version):
+    post_id = ObjectId(post_id)
+    result = blog_posts.delete_one({"_id": post_id, "version": version})
+    if result.deleted_count == 0:
+        current = blog_posts.find_one({"_id": post_id})
+        if current is None:
+            raise NotFound("Post not found")
+        raise Conflict(_public(current))
+    record_deletion(blog_posts, post_id)
+    search.safely(search.remove_post, str(post_id))
+
+def index_post(post):
+    search.index_post(str(post["_id"]), post)
+
+def migrate_from_section():
+    # Moves posts out of portfolio_content's blog array; safe to run repeatedly
+    section = portfolio_content.find_one({"section": "blog"})
+    posts = section.get("content") if section else None
+    if not posts:
+        return 0
+    moved = 0
+    for i, item in enumerate(posts):
+        if not isinstance(item, dict):
+            continue
+        legacy_id = item.get("id") or f"blog:{i}"
+        if blog_posts.count_documents({"legacy_id": legacy_id}, limit=1):
+            continue
+        if create_post(item, legacy_id=legacy_id):
+            moved += 1
+    # Drop the array (and the positional search entries built from it) once every post is copied
+    portfolio_content.update_one(
+        {"_id": section["_id"]},
+        {"$set": {"content": [], "migrated_to": "blog_posts", "updated_at": int(time.time())}}
+    )
+    search.safely(search.remove_legacy_blog)
+    return moved
+
+def rebuild_search():
+    n = 0
+    for post in blog_posts.find().batch_size(500):
+        index_post(post)
+        n += 1
+    return n
+
+if __name__ == "__main__":
+    # python blog.py migrate | reindex
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "migrate":
+        print(f"Moved {migrate_from_section()} posts into blog_posts")
+    elif command == "reindex":
+        print(f"Indexed {rebuild_search()} posts")
+    else:
+        print("Usage: python blog.py migrate | reindex")
+        sys.exit(2)
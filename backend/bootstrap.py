@@ -0,0 +1,57 @@
+import re
+import html
+import json
+from content_cache import content_cache, public_content, public_settings
+from static_assets import memory_asset
+import blog
+
+# index.html with the first page view's data built in.
+# The public content and settings payloads and the first page of blog
+# summaries (the same cached bytes served by /api/content,
+# /api/settings_public and /api/blog) are embedded as a JSON script tag
+# and the <title>/meta tags are filled from site_title/site_description, so
+# the first render needs no API round trips. The rendered page and its
+# compressed variants are cached per content version.
+
+TITLE = re.compile(rb"<title>.*?</title>", re.S)
+HEAD_END = b"</head>"
+
+def _payload():
+    content, _ = content_cache.get("content", public_content)
+    site, _ = content_cache.get("settings_public", public_settings)
+    posts, _ = content_cache.get("blog:first", blog.list_summaries)
+    payload = b'{"content":' + content + b',"settings":' + site + b',"blog":' + posts + b"}"
+    # "<" only occurs inside JSON strings, so escaping it keeps </script> out of the tag
+    return payload.replace(b"<", b"\\u003c")
+
+def _meta(site):
+    title = site.get("site_title")
+    description = site.get("site_description")
+    tags = []
+    if description:
+        tags.append(f'<meta name="description" content="{html.escape(description)}" />')
+        tags.append(f'<meta property="og:description" content="{html.escape(description)}" />')
+    if title:
+        tags.append(f'<meta property="og:title" content="{html.escape(title)}" />')
+    if site.get("site_logo"):
+        tags.append(f'<meta property="og:image" content="{html.escape(site["site_logo"])}" />')
+    return title, "\n  ".join(tags).encode("utf-8")
+
+def render(index_html):
+    site, _ = content_cache.get("settings_public", public_settings)
+    title, meta = _meta(json.loads(site) or {})
+    page = index_html
+    if title:
+        page = TITLE.sub(f"<title>{html.escape(title)}</title>".encode("utf-8"), page, count=1)
+    script = b'<script id="bootstrap-data" type="application/json">' + _payload() + b"</script>"
+    return page.replace(HEAD_END, meta + b"\n  " + script + b"\n" + HEAD_END, 1)
+
+def index_renderer(index):
+    # Plugged into static_files.index_renderer; falls back to the plain page if rendering fails
+    if not index.bodies:
+        return index
+    try:
+        return content_cache.cached(f"index_html:{index.etag}", lambda: memory_asset(render(index.bodies[None]), "text/html"))
+    except Exception as e:
+        print(f"Bootstrap render error: {e}", flush=True)
+        return index
@@ -0,0 +1,281 @@
+import os
+import re
+import sys
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from bson import ObjectId
+from pymongo import InsertOne
+from models import sms_campaigns, sms_campaign_recipients
+from sms_service import sms_service, SMSDeliveryError
+
+# Broadcast campaigns.
+# A broadcast is stored as a campaign plus one recipient document per unique
+# number, then sent in provider-sized chunks (one comma-separated request per
+# chunk) by a bounded thread pool behind a shared rate limiter. The request
+# that creates a campaign returns straight away; progress is polled from the
+# campaign document, and per-recipient outcomes live in sms_campaign_recipients.
+#
+# The process running a campaign holds a lease on it ("owner", "lease_until")
+# and renews it while chunks are in flight. A watcher thread in every worker
+# resumes queued or running campaigns whose lease has lapsed, so a deploy,
+# worker recycle or crash only delays a broadcast instead of stalling it.
+#
+#   campaign:  {"message", "status": queued|running|completed, "total", "sent",
+#               "failed", "invalid", "duplicates", "chunks", "created_at",
+#               "started_at", "finished_at", "owner", "lease_until"}
+#   recipient: {"campaign", "number", "chunk", "status": pending|sent|failed,
+#               "attempts", "error", "updated_at"}
+
+CHUNK_SIZE = int(os.getenv("CAMPAIGN_CHUNK_SIZE", "100"))
+WORKERS = int(os.getenv("CAMPAIGN_WORKERS", "4"))
+RATE = float(os.getenv("CAMPAIGN_RATE", "5"))  # gateway requests per second, per process
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 2.0
+INSERT_BATCH = 1000
+LEASE_SECONDS = int(os.getenv("CAMPAIGN_LEASE", "120"))
+WATCH_INTERVAL = float(os.getenv("CAMPAIGN_WATCH_INTERVAL", "30"))
+
+NON_DIGITS = re.compile(r"\D")
+
+def normalize(number):
+    # Local 10-digit mobile number (98XXXXXXXX), or None if it isn't one
+    digits = NON_DIGITS.sub("", str(number))
+    if len(digits) == 13 and digits.startswith("977"):
+        digits = digits[3:]
+    elif len(digits) == 11 and digits.startswith("0"):
+        digits = digits[1:]
+    if len(digits) != 10 or not digits.startswith("9"):
+        return None
+    return digits
+
+def prepare(numbers):
+    # -> (unique valid numbers in input order, invalid count, duplicate count)
+    if isinstance(numbers, str):
+        numbers = numbers.split(",")
+    seen = set()
+    unique = []
+    invalid = duplicates = 0
+    for raw in numbers:
+        number = normalize(raw)
+        if number is None:
+            invalid += 1
+        elif number in seen:
+            duplicates += 1
+        else:
+            seen.add(number)
+            unique.append(number)
+    return unique, invalid, duplicates
+
+class RateLimiter:
+    # Token bucket shared by the pool's threads
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class CampaignRunner:
+    def __init__(self, gateway, workers=WORKERS, rate=RATE, chunk_size=CHUNK_SIZE):
+        self.gateway = gateway
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.limiter = RateLimiter(rate)
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._pool = None
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._pid = os.getpid()
+        self.owner = uuid.uuid4().hex
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="campaign")
+            return self._pool
+
+    def create(self, recipients, message):
+        # recipients is prepare()'s result; callers check there is at least one valid number first
+        unique, invalid, duplicates = recipients
+        now = time.time()
+        chunks = (len(unique) + self.chunk_size - 1) // self.chunk_size
+        campaign_id = sms_campaigns.insert_one({
+            "message": message,
+            "status": "queued",
+            "total": len(unique),
+            "sent": 0,
+            "failed": 0,
+            "invalid": invalid,
+            "duplicates": duplicates,
+            "chunks": chunks,
+            "created_at": now,
+            "started_at": None,
+            "finished_at": None,
+            # Held by this process until start() picks it up
+            "owner": self.owner,
+            "lease_until": now + LEASE_SECONDS
+        }).inserted_id
+        ops = []
+        for i, number in enumerate(unique):
+            ops.append(InsertOne({
+                "campaign": campaign_id,
+                "number": number,
+                "chunk": i // self.chunk_size,
+                "status": "pending",
+                "attempts": 0,
+                "updated_at": now
+            }))
+            if len(ops) >= INSERT_BATCH:
+                sms_campaign_recipients.bulk_write(ops, ordered=False)
+                ops = []
+        if ops:
+            sms_campaign_recipients.bulk_write(ops, ordered=False)
+        return campaign_id
+
+    def start(self, campaign_id):
+        # Runs in a background thread; the chunks themselves go through the pool
+        threading.Thread(target=self.run, args=(campaign_id,), name=f"campaign-{campaign_id}", daemon=True).start()
+
+    def _claim(self, campaign_id):
+        # The campaign if this process holds its lease or the lease has lapsed, else None
+        now = time.time()
+        return sms_campaigns.find_one_and_update(
+            {
+                "_id": campaign_id,
+                "status": {"$in": ["queued", "running"]},
+                "$or": [{"owner": self.owner}, {"lease_until": {"$not": {"$gte": now}}}]
+            },
+            {"$set": {"status": "running", "owner": self.owner, "lease_until": now + LEASE_SECONDS}}
+        )
+
+    def run(self, campaign_id):
+        # Sends every chunk that still has pending recipients, so it can resume a campaign
+        campaign = self._claim(campaign_id)
+        if campaign is None:
+            return False
+        if campaign.get("started_at") is None:
+            sms_campaigns.update_one({"_id": campaign_id}, {"$set": {"started_at": time.time()}})
+        chunks = sms_campaign_recipients.distinct("chunk", {"campaign": campaign_id, "status": "pending"})
+        pool = self._executor()
+        pending = {pool.submit(self._send_chunk, campaign_id, campaign["message"], chunk) for chunk in sorted(chunks)}
+        while pending:
+            done, pending = wait(pending, timeout=LEASE_SECONDS / 3)
+            for future in done:
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"Campaign {campaign_id} chunk error: {e}", flush=True)
+            if pending:
+                sms_campaigns.update_one(
+                    {"_id": campaign_id, "owner": self.owner},
+                    {"$set": {"lease_until": time.time() + LEASE_SECONDS}}
+                )
+        sms_campaigns.update_one(
+            {"_id": campaign_id, "owner": self.owner},
+            {"$set": {"status": "completed", "finished_at": time.time()}, "$unset": {"owner": "", "lease_until": ""}}
+        )
+        return True
+
+    def stale(self):
+        # Ids of unfinished campaigns nobody holds a lease on
+        return [c["_id"] for c in sms_campaigns.find(
+            {"status": {"$in": ["queued", "running"]}, "lease_until": {"$not": {"$gte": time.time()}}},
+            {"_id": 1}
+        )]
+
+    def _watch(self):
+        while True:
+            try:
+                for campaign_id in self.stale():
+                    print(f"Resuming campaign {campaign_id}", flush=True)
+                    self.start(campaign_id)
+            except Exception as e:
+                print(f"Campaign watcher error: {e}", flush=True)
+            time.sleep(WATCH_INTERVAL)
+
+    def watch(self):
+        # One watcher per worker process; safe to call on every request
+        if self._pid != os.getpid():
+            self._reset()
+        if self._watcher is None or not self._watcher.is_alive():
+            with self._lock:
+                if self._watcher is None or not self._watcher.is_alive():
+                    self._watcher = threading.Thread(target=self._watch, name="campaign-watcher", daemon=True)
+                    self._watcher.start()
+
+    def _send_chunk(self, campaign_id, message, chunk):
+        query = {"campaign": campaign_id, "chunk": chunk, "status": "pending"}
+        numbers = [r["number"] for r in sms_campaign_recipients.find(query, {"number": 1})]
+        if not numbers:
+            return
+        error = None
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            self.limiter.acquire()
+            try:
+                self.gateway.deliver(",".join(numbers), message)
+                error = None
+                break
+            except SMSDeliveryError as e:
+                error = str(e)
+                if not e.retryable:
+                    break
+            except Exception as e:
+                error = str(e)
+            if attempt < MAX_ATTEMPTS:
+                time.sleep(RETRY_DELAY * attempt)
+        status = "failed" if error else "sent"
+        result = sms_campaign_recipients.update_many(query, {"$set": {
+            "status": status,
+            "attempts": attempt,
+            "error": error,
+            "updated_at": time.time()
+        }})
+        sms_campaigns.update_one({"_id": campaign_id}, {"$inc": {status: result.modified_count}})
+
+    def status(self, campaign_id, failures=100):
+        campaign = sms_campaigns.find_one({"_id": campaign_id})
+        if campaign is None:
+            return None
+        campaign["_id"] = str(campaign["_id"])
+        campaign["pending"] = campaign["total"] - campaign["sent"] - campaign["failed"]
+        campaign["failed_recipients"] = [
+            {"number": r["number"], "error": r.get("error")}
+            for r in sms_campaign_recipients.find(
+                {"campaign": ObjectId(campaign["_id"]), "status": "failed"},
+                {"number": 1, "error": 1}
+            ).limit(failures)
+        ]
+        return campaign
+
+campaigns = CampaignRunner(sms_service)
+
+if __name__ == "__main__":
+    # python campaigns.py resume <campaign id>
+    # Workers resume stalled campaigns by themselves; this runs one now, in the foreground
+    if len(sys.argv) != 3 or sys.argv[1] != "resume":
+        print("Usage: python campaigns.py resume <campaign id>")
+        sys.exit(2)
+    campaign_id = ObjectId(sys.argv[2])
+    if not campaigns.run(campaign_id):
+        print("Campaign is finished or another process holds its lease")
+    print(campaigns.status(campaign_id))
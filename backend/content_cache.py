@@ -0,0 +1,90 @@
+import os
+import json
+import time
+import threading
+from hashlib import sha1
+from flask import Response, request
+from pymongo import ReturnDocument
+from models import settings, portfolio_content
+
+# Cache of pre-serialized public responses keyed by a content version.
+# Admin writes bump the version document in `settings`; every worker compares
+# its cached version against it (at most once per CONTENT_VERSION_CHECK seconds)
+# and rebuilds stale entries. Responses carry a strong ETag derived from the
+# body, so repeat visits get a bodiless 304.
+
+VERSION_TYPE = "content_version"
+
+class VersionedCache:
+    def __init__(self, check_interval=1.0):
+        self.check_interval = check_interval
+        self._entries = {}
+        self._version = None
+        self._checked = 0.0
+        self._lock = threading.RLock()  # builders may read other cached entries
+
+    def version(self):
+        now = time.monotonic()
+        if self._version is None or now - self._checked >= self.check_interval:
+            doc = settings.find_one({"type": VERSION_TYPE}, {"_id": 0, "version": 1})
+            self._version = doc["version"] if doc else 0
+            self._checked = now
+        return self._version
+
+    def bump(self):
+        doc = settings.find_one_and_update(
+            {"type": VERSION_TYPE},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self._version = doc["version"]
+        self._checked = time.monotonic()
+        return self._version
+
+    def cached(self, key, build):
+        # build() result for key, rebuilt when the content version has moved on
+        version = self.version()
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != version:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is None or entry[0] != version:
+                    entry = (version, build())
+                    self._entries[key] = entry
+        return entry[1]
+
+    def get(self, key, build):
+        # (body, etag) of build() serialized as JSON
+        def serialize():
+            body = json.dumps(build(), separators=(",", ":")).encode("utf-8")
+            return body, sha1(body).hexdigest()
+        return self.cached(key, serialize)
+
+    def respond(self, key, build):
+        return conditional_json(*self.get(key, build))
+
+    def section(self, name):
+        # One section of the cached public content, without another database read
+        body, _ = self.get("content", public_content)
+        sections = self.cached("content_by_section", lambda: {doc["section"]: doc for doc in json.loads(body)})
+        return sections.get(name)
+
+def conditional_json(body, etag=None):
+    # JSON response revalidated by ETag (304 when the client's copy is current)
+    if not isinstance(body, bytes):
+        body = json.dumps(body, separators=(",", ":")).encode("utf-8")
+    response = Response(body, mimetype="application/json")
+    response.set_etag(etag or sha1(body).hexdigest())
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+# Builders of the public payloads (served by /api/content and /api/settings_public
+# and embedded into index.html by bootstrap.py)
+def public_content():
+    return list(portfolio_content.find({}, {"_id": 0}))
+
+def public_settings():
+    return settings.find_one({"type": "admin_credentials"}, {"_id": 0, "password": 0, "mobile": 0, "totp_secret": 0})
+
+content_cache = VersionedCache(check_interval=float(os.getenv("CONTENT_VERSION_CHECK", "1")))
@@ -0,0 +1,134 @@
+import os
+import io
+import csv
+import json
+import datetime
+import tempfile
+from itertools import islice
+from models import contact_messages
+
+# Streaming exports of contact_messages.
+# Rows come from a batched cursor and are written out as they arrive, so memory
+# stays flat however large the inbox grows.
+
+HEADERS = ["Date", "Name", "Email", "Phone", "Reason", "Message", "Status"]
+FIELDS = {"_id": 0, "timestamp": 1, "name": 1, "email": 1, "phone": 1, "reason": 1, "message": 1, "status": 1}
+BATCH_SIZE = 1000
+WIDTH_SAMPLE = 500
+MAX_WIDTH = 50
+CHUNK_SIZE = 64 * 1024
+
+def build_query(start=None, end=None, status=None, reason=None):
+    # start/end are YYYY-MM-DD (inclusive, server local time)
+    query = {}
+    if start or end:
+        query["timestamp"] = {}
+        if start:
+            query["timestamp"]["$gte"] = int(datetime.datetime.strptime(start, "%Y-%m-%d").timestamp())
+        if end:
+            end_day = datetime.datetime.strptime(end, "%Y-%m-%d") + datetime.timedelta(days=1)
+            query["timestamp"]["$lt"] = int(end_day.timestamp())
+    if status:
+        query["status"] = status
+    if reason:
+        query["reason"] = reason
+    return query
+
+def _messages(query):
+    return contact_messages.find(query, FIELDS).sort([("timestamp", -1), ("_id", -1)]).batch_size(BATCH_SIZE)
+
+def _row(msg):
+    return [
+        datetime.datetime.fromtimestamp(msg.get("timestamp", 0)).strftime("%Y-%m-%d %H:%M:%S"),
+        msg.get("name", ""),
+        msg.get("email", ""),
+        msg.get("phone", ""),
+        msg.get("reason", ""),
+        msg.get("message", ""),
+        msg.get("status", "unread")
+    ]
+
+def stream_csv(query):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HEADERS)
+    for i, msg in enumerate(_messages(query), 1):
+        writer.writerow(_row(msg))
+        if i % BATCH_SIZE == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+def stream_ndjson(query):
+    lines = []
+    for msg in _messages(query):
+        lines.append(json.dumps(msg, ensure_ascii=False, default=str))
+        if len(lines) >= BATCH_SIZE:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+def write_xlsx(query, path):
+    # openpyxl takes ~100ms to import; only XLSX exports pay for it
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, Alignment, Border, Side
+    from openpyxl.utils import get_column_letter
+    # Write-only workbook: rows are flushed to a temp file as they are appended.
+    # Column widths have to be set before the first row is written, so they are
+    # measured on the first WIDTH_SAMPLE rows, which are held back until then.
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Contact Messages")
+    ws.page_setup.paperSize = 9 # A4
+    ws.page_setup.orientation = 'landscape'
+    ws.page_setup.fitToWidth = 1
+
+    rows = (_row(msg) for msg in _messages(query))
+    sample = list(islice(rows, WIDTH_SAMPLE))
+    widths = [len(h) for h in HEADERS]
+    for row in sample:
+        for i, value in enumerate(row):
+            widths[i] = max(widths[i], len(str(value)))
+    for i, width in enumerate(widths, 1):
+        ws.column_dimensions[get_column_letter(i)].width = min(width + 2, MAX_WIDTH)
+
+    header = []
+    for title in HEADERS:
+        cell = WriteOnlyCell(ws, value=title)
+        cell.font = Font(bold=True)
+        cell.alignment = Alignment(horizontal="center", vertical="center")
+        cell.border = Border(bottom=Side(style="thin"))
+        header.append(cell)
+    ws.append(header)
+    for row in sample:
+        ws.append(row)
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+
+def stream_file(path):
+    # Yield a file in chunks; the caller removes it (see remove_file)
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def xlsx_file(query):
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        write_xlsx(query, path)
+    except Exception:
+        remove_file(path)
+        raise
+    return path
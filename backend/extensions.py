@@ -2,11 +2,16 @@ from flask_bcrypt import Bcrypt
 from flask_jwt_extended import JWTManager
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+from ratelimit_store import storage_config
 
 bcrypt = Bcrypt()
 jwt = JWTManager()
+# Counters are shared by all workers (see ratelimit_store.py)
+storage_uri, storage_options = storage_config()
 limiter = Limiter(
     get_remote_address,
     default_limits=["2000 per day", "500 per hour"],
-    storage_uri="memory://",
+    storage_uri=storage_uri,
+    storage_options=storage_options,
+    strategy="sliding-window-counter",
 )
@@ -0,0 +1,226 @@
+import os
+import sys
+import csv
+import time
+import pickle
+import ipaddress
+import threading
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+
+# Offline IP -> country/city/lat/lon resolution.
+# Ranges are held in sorted arrays and searched with bisect, so a lookup is a
+# couple of microseconds and never touches the network.
+#
+# Accepted source files:
+#   - CSV "start,end,country,city,lat,lon"
+#   - DB-IP "city lite" CSV "start,end,continent,country,region,city,lat,lon"
+#   - a compiled index written by `python geoip.py build <csv> <out>`
+# start/end may be dotted/colon addresses or integers.
+
+INDEX_MAGIC = b"GEOIDX1\n"
+
+class LRUCache:
+    def __init__(self, maxsize=10000, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+def _to_int(value):
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    return int(ipaddress.ip_address(value))
+
+def _is_v6(value):
+    return ":" in value
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+class GeoIndex:
+    def __init__(self):
+        # IPv4 fits in unsigned 32-bit arrays; IPv6 keys are kept as sorted Python ints
+        self.v4_starts = array("I")
+        self.v4_ends = array("I")
+        self.v4_locs = array("I")
+        self.v6_starts = []
+        self.v6_ends = []
+        self.v6_locs = array("I")
+        # Deduplicated (country, city, lat, lon) tuples referenced by position
+        self.locations = []
+
+    def __len__(self):
+        return len(self.v4_starts) + len(self.v6_starts)
+
+    @classmethod
+    def from_csv(cls, path):
+        index = cls()
+        loc_ids = {}
+        v4, v6 = [], []
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.reader(f):
+                if len(row) >= 8:
+                    start, end, _, country, _, city, lat, lon = row[:8]
+                elif len(row) >= 6:
+                    start, end, country, city, lat, lon = row[:6]
+                else:
+                    continue
+                try:
+                    lo, hi = _to_int(start), _to_int(end)
+                except ValueError:
+                    continue  # header or malformed line
+                loc = (country or None, city or None, _float(lat), _float(lon))
+                loc_id = loc_ids.setdefault(loc, len(loc_ids))
+                (v6 if _is_v6(start) else v4).append((lo, hi, loc_id))
+
+        index.locations = [None] * len(loc_ids)
+        for loc, loc_id in loc_ids.items():
+            index.locations[loc_id] = loc
+        v4.sort()
+        v6.sort()
+        for lo, hi, loc_id in v4:
+            index.v4_starts.append(lo)
+            index.v4_ends.append(hi)
+            index.v4_locs.append(loc_id)
+        for lo, hi, loc_id in v6:
+            index.v6_starts.append(lo)
+            index.v6_ends.append(hi)
+            index.v6_locs.append(loc_id)
+        return index
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(INDEX_MAGIC)
+            pickle.dump({
+                "v4_starts": self.v4_starts.tobytes(),
+                "v4_ends": self.v4_ends.tobytes(),
+                "v4_locs": self.v4_locs.tobytes(),
+                "v6_starts": self.v6_starts,
+                "v6_ends": self.v6_ends,
+                "v6_locs": self.v6_locs.tobytes(),
+                "locations": self.locations
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            if f.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+                return cls.from_csv(path)
+            data = pickle.load(f)
+        index = cls()
+        index.v4_starts.frombytes(data["v4_starts"])
+        index.v4_ends.frombytes(data["v4_ends"])
+        index.v4_locs.frombytes(data["v4_locs"])
+        index.v6_starts = data["v6_starts"]
+        index.v6_ends = data["v6_ends"]
+        index.v6_locs.frombytes(data["v6_locs"])
+        index.locations = data["locations"]
+        return index
+
+    def find(self, ip):
+        if ip.version == 4:
+            starts, ends, locs = self.v4_starts, self.v4_ends, self.v4_locs
+        else:
+            starts, ends, locs = self.v6_starts, self.v6_ends, self.v6_locs
+        key = int(ip)
+        i = bisect_right(starts, key) - 1
+        if i < 0 or key > ends[i]:
+            return None
+        return self.locations[locs[i]]
+
+class GeoIPResolver:
+    def __init__(self, path=None, cache_size=10000, cache_ttl=3600):
+        self.path = path
+        self.cache = LRUCache(cache_size, cache_ttl)
+        self._index = None
+        self._lock = threading.Lock()
+
+    @property
+    def index(self):
+        # Loaded on first use so importing the module stays cheap
+        if self._index is None and self.path:
+            with self._lock:
+                if self._index is None:
+                    try:
+                        self._index = GeoIndex.load(self.path)
+                    except OSError as e:
+                        print(f"GeoIP load error: {e}", flush=True)
+                        self._index = GeoIndex()
+        return self._index
+
+    @property
+    def available(self):
+        return bool(self.path)
+
+    def lookup(self, ip):
+        geo = self.cache.get(ip)
+        if geo is not None:
+            return geo
+        geo = {}
+        try:
+            addr = ipaddress.ip_address(ip.strip())
+        except (ValueError, AttributeError):
+            addr = None
+        if addr is not None and addr.version == 6 and addr.ipv4_mapped:
+            addr = addr.ipv4_mapped
+        if addr is not None and addr.is_global and self.index is not None:
+            loc = self.index.find(addr)
+            if loc:
+                country, city, lat, lon = loc
+                geo = {"country": country, "city": city, "lat": lat, "lon": lon}
+        self.cache.set(ip, geo)
+        return geo
+
+    def enrich(self, batch):
+        for event in batch:
+            if event.get("ip"):
+                event.update(self.lookup(event["ip"]))
+
+geoip = GeoIPResolver(
+    path=os.getenv("GEOIP_DB"),
+    cache_size=int(os.getenv("GEOIP_CACHE_SIZE", "10000")),
+    cache_ttl=int(os.getenv("GEOIP_CACHE_TTL", "3600"))
+)
+
+if __name__ == "__main__":
+    # python geoip.py build <source.csv> <out.idx>
+    # python geoip.py lookup <ip> [<ip> ...]
+    if len(sys.argv) >= 4 and sys.argv[1] == "build":
+        start = time.perf_counter()
+        index = GeoIndex.from_csv(sys.argv[2])
+        index.save(sys.argv[3])
+        print(f"Indexed {len(index)} ranges, {len(index.locations)} locations in {time.perf_counter() - start:.1f}s")
+    elif len(sys.argv) >= 3 and sys.argv[1] == "lookup":
+        for ip in sys.argv[2:]:
+            print(ip, geoip.lookup(ip))
+    else:
+        print("Usage: python geoip.py build <source.csv> <out.idx> | lookup <ip> ...")
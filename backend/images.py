@@ -0,0 +1,132 @@
+import os
+import io
+import sys
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+# Image pipeline for uploads.
+# An uploaded image is decoded once, oriented from its EXIF tag and then
+# re-encoded into width-bounded WebP variants, a thumbnail and one JPEG (PNG
+# when the image has transparency) fallback. Encoders are never given the
+# source metadata, so EXIF/GPS/ICC data is stripped from everything served.
+# Each output is encoded as its own task on a shared bounded pool, which both
+# parallelizes one upload and caps CPU use across concurrent uploads.
+
+WIDTHS = [int(w) for w in os.getenv("IMAGE_WIDTHS", "480,960,1600").split(",")]
+FALLBACK_WIDTH = int(os.getenv("IMAGE_FALLBACK_WIDTH", "1200"))
+THUMBNAIL_SIZE = (320, 320)
+WEBP_QUALITY = int(os.getenv("IMAGE_WEBP_QUALITY", "80"))
+JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "82"))
+WORKERS = int(os.getenv("IMAGE_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Refuse decompression bombs well before they exhaust memory
+MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(40_000_000)))
+
+class NotAnImage(Exception):
+    pass
+
+def _pil():
+    # Pillow is imported by the first upload instead of at every worker boot
+    from PIL import Image
+    Image.MAX_IMAGE_PIXELS = MAX_PIXELS
+    return Image
+
+def _has_alpha(img):
+    return img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+
+def _resized(img, width):
+    if img.width <= width:
+        return img
+    height = max(1, round(img.height * width / img.width))
+    return img.resize((width, height), _pil().LANCZOS)
+
+def _encode(img, fmt):
+    buffer = io.BytesIO()
+    if fmt == "webp":
+        img.save(buffer, "WEBP", quality=WEBP_QUALITY, method=4)
+    elif fmt == "jpeg":
+        img.convert("RGB").save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    else:
+        img.save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+def _render(img, kind, width, fmt):
+    if kind == "thumbnail":
+        out = img.copy()
+        out.thumbnail(THUMBNAIL_SIZE, _pil().LANCZOS)
+    else:
+        out = _resized(img, width)
+    return out.width, out.height, _encode(out, fmt)
+
+def load(data):
+    # Decoded, upright image in RGB/RGBA; raises NotAnImage for anything Pillow can't read
+    Image = _pil()
+    from PIL import ImageOps, UnidentifiedImageError
+    try:
+        img = Image.open(io.BytesIO(data))
+        img.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise NotAnImage(str(e))
+    img = ImageOps.exif_transpose(img)
+    return img.convert("RGBA" if _has_alpha(img) else "RGB")
+
+def plan(img):
+    # [(kind, width, format)] for one source image; no variant is upscaled
+    widths = sorted({min(w, img.width) for w in WIDTHS})
+    jobs = [("variant", w, "webp") for w in widths]
+    jobs.append(("fallback", min(FALLBACK_WIDTH, img.width), "png" if img.mode == "RGBA" else "jpeg"))
+    jobs.append(("thumbnail", THUMBNAIL_SIZE[0], "webp"))
+    return jobs
+
+class ImagePipeline:
+    def __init__(self, workers=WORKERS):
+        self.workers = workers
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._pool = None
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="images")
+        return self._pool
+
+    def process(self, data, stem, save):
+        # Renders every output of `data` and hands each to save(name, bytes) -> url.
+        # Returns the manifest the upload route responds with.
+        img = load(data)
+        jobs = plan(img)
+        pool = self._executor()
+        futures = [pool.submit(_render, img, kind, width, fmt) for kind, width, fmt in jobs]
+        manifest = {"width": img.width, "height": img.height, "variants": []}
+        for (kind, width, fmt), future in zip(jobs, futures):
+            w, h, body = future.result()
+            suffix = "thumb" if kind == "thumbnail" else f"{w}w"
+            ext = "jpg" if fmt == "jpeg" else fmt
+            entry = {"url": save(f"{stem}_{suffix}.{ext}", body), "width": w, "height": h, "format": fmt, "bytes": len(body)}
+            if kind == "variant":
+                manifest["variants"].append(entry)
+            else:
+                manifest[kind] = entry
+        manifest["url"] = manifest["fallback"]["url"]
+        manifest["srcset"] = ", ".join(f"{v['url']} {v['width']}w" for v in manifest["variants"])
+        return manifest
+
+image_pipeline = ImagePipeline()
+
+if __name__ == "__main__":
+    # python images.py <image> [output dir] - renders the variants locally and prints the manifest
+    if len(sys.argv) < 2:
+        print("Usage: python images.py <image> [output dir]")
+        sys.exit(2)
+    out_dir = sys.argv[2] if len(sys.argv) > 2 else "."
+    def save(name, body):
+        path = os.path.join(out_dir, name)
+        with open(path, "wb") as f:
+            f.write(body)
+        return path
+    with open(sys.argv[1], "rb") as f:
+        data = f.read()
+    stem = os.path.splitext(os.path.basename(sys.argv[1]))[0]
+    print(json.dumps(image_pipeline.process(data, stem, save), indent=2))
@@ -0,0 +1,305 @@
+import sys
+import gzip
+import time
+from bson import ObjectId, json_util
+from pymongo import UpdateOne, InsertOne, DeleteOne
+from pymongo.errors import BulkWriteError
+from models import db
+from backup import read_archive, ArchiveError
+import blog
+import search
+import rollups
+
+# Bulk import of backup archives or plain NDJSON.
+# Documents are validated per collection and written in chunks with
+# bulk_write(ordered=False) upserts keyed on each collection's natural key, so
+# re-importing the same data is idempotent and memory stays bounded by one chunk.
+# The search index and visitor rollups are derived data, so each chunk also
+# updates them for just the documents it wrote (see DerivedData).
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 50
+# Fields an import may never set
+PROTECTED_FIELDS = {"settings": {"password", "totp_secret"}}
+
+class ValidationError(Exception):
+    pass
+
+def _require(doc, *fields):
+    missing = [f for f in fields if doc.get(f) in (None, "")]
+    if missing:
+        raise ValidationError(f"missing {', '.join(missing)}")
+
+def _int_field(doc, field):
+    try:
+        doc[field] = int(doc[field])
+    except KeyError:
+        raise ValidationError(f"missing {field}")
+    except (TypeError, ValueError):
+        raise ValidationError(f"{field} must be an integer timestamp")
+
+def _validate_content(doc):
+    _require(doc, "section")
+    if not isinstance(doc["section"], str):
+        raise ValidationError("section must be a string")
+    if "content" not in doc:
+        raise ValidationError("missing content")
+
+def _validate_post(doc):
+    _require(doc, "slug", "title")
+    # Archives carry the derived fields; hand-written NDJSON may not
+    for field, value in blog.derived_fields(doc).items():
+        doc.setdefault(field, value)
+    _int_field(doc, "published_at")
+
+def _validate_settings(doc):
+    _require(doc, "type")
+
+def _validate_message(doc):
+    _require(doc, "name", "email", "message", "timestamp")
+    _int_field(doc, "timestamp")
+    doc.setdefault("status", "unread")
+
+def _validate_visitor(doc):
+    _require(doc, "ip", "timestamp")
+    _int_field(doc, "timestamp")
+
+VALIDATORS = {
+    "portfolio_content": _validate_content,
+    "blog_posts": _validate_post,
+    "settings": _validate_settings,
+    "contact_messages": _validate_message,
+    "visitor_logs": _validate_visitor
+}
+
+# Natural key per collection; None means the document's own _id.
+# Blog slugs are unique but follow the title, so posts are matched on _id.
+NATURAL_KEYS = {
+    "portfolio_content": "section",
+    "blog_posts": None,
+    "settings": "type",
+    "contact_messages": None,
+    "visitor_logs": None
+}
+# Key for documents that have no _id (hand-written NDJSON), where the natural key is _id
+FALLBACK_KEYS = {"blog_posts": "slug"}
+# Indexing hooks for collections that are searchable: (index(doc), remove(id string))
+SEARCH_HOOKS = {
+    "contact_messages": (search.index_message, search.remove_message),
+    "blog_posts": (blog.index_post, search.remove_post)
+}
+SEARCH_KINDS = {"contact_messages": "message", "blog_posts": "blog"}
+ROLLUP_FIELDS = {"_id": 0, "timestamp": 1, "country": 1, "path": 1, "route": 1, "ip": 1}
+
+def write_op(collection, doc):
+    # Upsert on the natural key, keeping the archived _id for newly inserted documents
+    doc = dict(doc)
+    for field in PROTECTED_FIELDS.get(collection, ()):
+        doc.pop(field, None)
+    doc_id = doc.pop("_id", None)
+    key = NATURAL_KEYS.get(collection)
+    if key:
+        update = {"$set": doc}
+        if doc_id is not None:
+            update["$setOnInsert"] = {"_id": doc_id}
+        return UpdateOne({key: doc[key]}, update, upsert=True)
+    if doc_id is None:
+        if collection in FALLBACK_KEYS:
+            return UpdateOne({FALLBACK_KEYS[collection]: doc[FALLBACK_KEYS[collection]]}, {"$set": doc}, upsert=True)
+        return InsertOne(doc)
+    return UpdateOne({"_id": doc_id}, {"$set": doc}, upsert=True)
+
+def _lookup(entries):
+    # Query matching the stored copies of the documents behind a chunk's writes
+    ids, slugs = [], []
+    for op, doc in entries:
+        if isinstance(op, DeleteOne) or doc is None:
+            continue
+        if "_id" in doc:
+            ids.append(doc["_id"])
+        elif doc.get("slug"):
+            slugs.append(doc["slug"])
+    clauses = ([{"_id": {"$in": ids}}] if ids else []) + ([{"slug": {"$in": slugs}}] if slugs else [])
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+class DerivedData:
+    # Keeps the search index and visitor rollups in step with an import, one chunk at a time,
+    # rather than wiping and rebuilding them: written messages and posts are re-indexed from
+    # their stored copy, deleted ones are dropped from the index, and visitor logs that did
+    # not exist before the chunk are folded into the rollups like an ingest batch. Logs that
+    # were already there were counted when they were first recorded.
+    def __init__(self):
+        self.stats = {"indexed": 0, "unindexed": 0, "rolled_up": 0}
+
+    def before(self, collection, entries):
+        # _ids of the chunk's visitor logs that are already stored
+        if collection != "visitor_logs":
+            return None
+        query = _lookup(entries)
+        return {d["_id"] for d in db[collection].find(query, {"_id": 1})} if query else set()
+
+    def after(self, collection, entries, existing):
+        if collection == "visitor_logs":
+            fresh = [(op, doc) for op, doc in entries if doc and doc.get("_id") not in existing]
+            query = _lookup(fresh)
+            logs = list(db[collection].find(query, ROLLUP_FIELDS)) if query else []
+            if logs:
+                rollups.record(logs)
+                self.stats["rolled_up"] += len(logs)
+            return
+        if collection not in SEARCH_HOOKS:
+            return
+        index, remove = SEARCH_HOOKS[collection]
+        for op, doc in entries:
+            if isinstance(op, DeleteOne):
+                search.safely(remove, str(doc["_id"]))
+                self.stats["unindexed"] += 1
+        query = _lookup(entries)
+        for stored in (db[collection].find(query) if query else []):
+            search.safely(index, stored)
+            self.stats["indexed"] += 1
+
+    def clear(self, collection):
+        # The collection was emptied, so everything derived from it goes too
+        if collection == "visitor_logs":
+            rollups.clear()
+        elif collection in SEARCH_KINDS:
+            search.clear(SEARCH_KINDS[collection])
+
+class BulkImporter:
+    def __init__(self, chunk_size=CHUNK_SIZE, validate=True, progress=None, derived=True):
+        self.chunk_size = chunk_size
+        self.validate = validate
+        self.progress = progress
+        self.derived = DerivedData() if derived else None
+        self.pending = {}
+        self.chunks = 0
+        self.stats = {"processed": 0, "written": 0, "deleted": 0, "invalid": 0, "errors": 0}
+        self.error_samples = []
+
+    def _report(self, entry):
+        if len(self.error_samples) < MAX_REPORTED_ERRORS:
+            self.error_samples.append(entry)
+
+    def add_doc(self, collection, doc, line=None):
+        self.stats["processed"] += 1
+        if collection not in VALIDATORS:
+            self.stats["invalid"] += 1
+            self._report({"collection": collection, "line": line, "error": "unknown collection"})
+            return
+        if self.validate:
+            try:
+                VALIDATORS[collection](doc)
+            except ValidationError as e:
+                self.stats["invalid"] += 1
+                self._report({"collection": collection, "line": line, "error": str(e)})
+                return
+        if NATURAL_KEYS.get(collection) is None and collection not in FALLBACK_KEYS:
+            # Known up front so the derived data can find the document once it is written
+            doc.setdefault("_id", ObjectId())
+        self.add_op(collection, write_op(collection, doc), doc)
+
+    def add_op(self, collection, op, doc=None):
+        # doc is what op writes (for a DeleteOne, {"_id": ...}); the derived data is updated from it
+        entries = self.pending.setdefault(collection, [])
+        entries.append((op, doc))
+        if len(entries) >= self.chunk_size:
+            self.flush(collection)
+
+    def drop(self, collection):
+        # Empties a collection, along with the search entries or rollups built from it
+        self.flush(collection)
+        db[collection].delete_many({})
+        if self.derived:
+            self.derived.clear(collection)
+
+    def flush(self, collection=None):
+        for name in ([collection] if collection else list(self.pending)):
+            entries = self.pending.pop(name, [])
+            if not entries:
+                continue
+            ops = [op for op, _ in entries]
+            self.chunks += 1
+            existing = self.derived.before(name, entries) if self.derived else None
+            try:
+                result = db[name].bulk_write(ops, ordered=False)
+                details = result.bulk_api_result
+            except BulkWriteError as e:
+                details = e.details
+                for err in details.get("writeErrors", [])[:5]:
+                    self._report({"collection": name, "chunk": self.chunks, "error": err.get("errmsg")})
+            written = details.get("nInserted", 0) + details.get("nUpserted", 0) + details.get("nModified", 0)
+            errors = len(details.get("writeErrors", []))
+            self.stats["written"] += written
+            self.stats["deleted"] += details.get("nRemoved", 0)
+            self.stats["errors"] += errors
+            if self.derived:
+                self.derived.after(name, entries, existing)
+            if self.progress:
+                self.progress({"collection": name, "chunk": self.chunks, "ops": len(ops), "written": written, "errors": errors, **self.stats})
+
+    def result(self):
+        self.flush()
+        result = {**self.stats, "chunks": self.chunks, "error_samples": self.error_samples}
+        if self.derived:
+            result["derived"] = dict(self.derived.stats)
+        return result
+
+def _lines(fileobj):
+    # Accepts gzip or plain bytes/text streams
+    head = fileobj.peek(2)[:2] if hasattr(fileobj, "peek") else b""
+    if head == b"\x1f\x8b":
+        fileobj = gzip.GzipFile(fileobj=fileobj)
+    for raw in fileobj:
+        yield raw.decode("utf-8") if isinstance(raw, bytes) else raw
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+def import_stream(fileobj, collection=None, importer=None):
+    # A backup archive (sections name their collections) or NDJSON for `collection`
+    importer = importer or BulkImporter()
+    lines = _lines(fileobj)
+    first = next(lines, "")
+    if first.startswith('{"__backup__"'):
+        for event in read_archive(_chain(first, lines)):
+            if event[0] != "doc":
+                continue
+            _, name, doc = event
+            if name == "tombstones":
+                continue
+            importer.add_doc(name, doc)
+    else:
+        if collection is None:
+            raise ArchiveError("Plain NDJSON needs a target collection")
+        for n, line in enumerate(_chain(first, lines), 1):
+            if not line.strip():
+                continue
+            try:
+                doc = json_util.loads(line)
+            except ValueError as e:
+                importer.stats["processed"] += 1
+                importer.stats["invalid"] += 1
+                importer._report({"collection": collection, "line": n, "error": f"bad JSON: {e}"})
+                continue
+            importer.add_doc(collection, doc, line=n)
+    return importer.result()
+
+if __name__ == "__main__":
+    # python importer.py <archive or .ndjson[.gz]> [collection]
+    if len(sys.argv) < 2:
+        print("Usage: python importer.py <file> [collection]")
+        sys.exit(2)
+    start = time.perf_counter()
+    def progress(p):
+        rate = p["processed"] / max(time.perf_counter() - start, 1e-6)
+        print(f"[{p['collection']}] chunk {p['chunk']}: {p['processed']} processed, {p['written']} written, {p['errors']} errors ({rate:.0f} docs/s)", flush=True)
+    rollups.load_routes()
+    with open(sys.argv[1], "rb") as f:
+        result = import_stream(f, sys.argv[2] if len(sys.argv) > 2 else None, BulkImporter(progress=progress))
+    for sample in result["error_samples"]:
+        print(f"  {sample}")
+    print(f"Imported in {time.perf_counter() - start:.1f}s: { {k: v for k, v in result.items() if k != 'error_samples'} }")
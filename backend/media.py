@@ -0,0 +1,187 @@
+import os
+import re
+import sys
+import time
+import hashlib
+import tempfile
+from pymongo import UpdateOne
+from models import media_objects, media_uploads, portfolio_content, blog_posts, settings
+
+# Content-addressed upload storage.
+# Every stored file is named by the sha256 of its bytes and lives at
+# <MEDIA_ROOT>/<first two hex digits>/<digest>.<ext>, so identical files are
+# stored once and a URL's content never changes (served as immutable).
+#
+#   media_objects: {"_id": digest, "name", "size", "refs", "created_at"}
+#       refs counts stores of the object; gc() resets it to the number of
+#       live references found in portfolio_content, blog_posts and
+#       settings.site_logo.
+#   media_uploads: {"_id": digest of the uploaded bytes, "manifest", "objects",
+#       "uploads", "created_at"}
+#       lets a repeated upload reuse the earlier result without reprocessing.
+
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", os.path.join(os.getcwd(), "static", "uploads", "objects"))
+CHUNK_SIZE = 64 * 1024
+# Uploads happen before the content referencing them is saved, so new objects get a grace period
+GC_GRACE_SECONDS = int(os.getenv("MEDIA_GC_GRACE", str(24 * 3600)))
+NAME_PATTERN = re.compile(r"^([0-9a-f]{64})\.([a-z0-9]{1,8})$")
+URL_PATTERN = re.compile(r"/media/([0-9a-f]{64})\.[a-z0-9]{1,8}")
+
+def path_for(name):
+    return os.path.join(MEDIA_ROOT, name[:2], name)
+
+def media_url(name):
+    base_url = os.getenv("BASE_URL", "http://localhost:5000")
+    return f"{base_url}/api/media/{name}"
+
+class HashingWriter:
+    # Spools a stream to a temp file in MEDIA_ROOT while hashing it
+    def __init__(self):
+        os.makedirs(MEDIA_ROOT, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=MEDIA_ROOT, suffix=".part")
+        self.file = os.fdopen(fd, "wb")
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, chunk):
+        self.file.write(chunk)
+        self.digest.update(chunk)
+        self.size += len(chunk)
+
+    def copy_from(self, stream):
+        while True:
+            chunk = stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            self.write(chunk)
+        return self
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+        return self.digest.hexdigest()
+
+    def discard(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def commit(writer, ext):
+    # Moves a spooled file to its content address (or drops it if already stored)
+    digest = writer.close()
+    name = f"{digest}.{ext}"
+    target = path_for(name)
+    if os.path.exists(target):
+        os.remove(writer.path)
+    else:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(writer.path, target)
+    media_objects.update_one(
+        {"_id": digest},
+        {"$setOnInsert": {"name": name, "size": writer.size, "created_at": int(time.time())}, "$inc": {"refs": 1}},
+        upsert=True
+    )
+    return name
+
+def store_bytes(body, ext):
+    writer = HashingWriter()
+    try:
+        writer.write(body)
+        return commit(writer, ext)
+    except Exception:
+        writer.discard()
+        raise
+
+def spool(stream):
+    # HashingWriter holding the whole upload; caller commits or discards it
+    writer = HashingWriter()
+    try:
+        return writer.copy_from(stream)
+    except Exception:
+        writer.discard()
+        raise
+
+def known_upload(digest):
+    upload = media_uploads.find_one_and_update({"_id": digest}, {"$inc": {"uploads": 1}})
+    if upload is None:
+        return None
+    # Objects of an earlier upload may have been collected since; reprocess then
+    if media_objects.count_documents({"_id": {"$in": upload["objects"]}}) != len(upload["objects"]):
+        return None
+    media_objects.update_many({"_id": {"$in": upload["objects"]}}, {"$inc": {"refs": 1}})
+    return upload["manifest"]
+
+def record_upload(digest, manifest, names):
+    media_uploads.update_one(
+        {"_id": digest},
+        {"$set": {"manifest": manifest, "objects": [n.split(".")[0] for n in names]},
+         "$setOnInsert": {"created_at": int(time.time())},
+         "$inc": {"uploads": 1}},
+        upsert=True
+    )
+
+def _strings(value):
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for v in value.values():
+            yield from _strings(v)
+    elif isinstance(value, list):
+        for v in value:
+            yield from _strings(v)
+
+def live_references():
+    # {digest: reference count} over every portfolio section, blog post and the site logo
+    counts = {}
+    sources = [doc.get("content") for doc in portfolio_content.find({}, {"content": 1})]
+    sources += list(blog_posts.find({}, {"image": 1, "image_srcset": 1, "content": 1}))
+    sources += [doc.get("site_logo") for doc in settings.find({"site_logo": {"$exists": True}}, {"site_logo": 1})]
+    for source in sources:
+        for text in _strings(source):
+            for digest in URL_PATTERN.findall(text):
+                counts[digest] = counts.get(digest, 0) + 1
+    return counts
+
+def gc(dry_run=False):
+    # Resets refcounts from live references and deletes unreferenced objects past the grace period
+    live = live_references()
+    cutoff = int(time.time()) - GC_GRACE_SECONDS
+    ops = []
+    removed = []
+    for obj in media_objects.find({}, {"name": 1, "refs": 1, "created_at": 1, "size": 1}):
+        refs = live.get(obj["_id"], 0)
+        if refs == 0 and obj.get("created_at", 0) < cutoff:
+            removed.append(obj)
+        elif refs != obj.get("refs"):
+            ops.append(UpdateOne({"_id": obj["_id"]}, {"$set": {"refs": refs}}))
+    if dry_run:
+        return {"removed": len(removed), "bytes": sum(o.get("size", 0) for o in removed), "dry_run": True}
+    if ops:
+        media_objects.bulk_write(ops, ordered=False)
+    for obj in removed:
+        # Skip objects re-stored since the scan (their refs changed)
+        if media_objects.delete_one({"_id": obj["_id"], "refs": obj.get("refs")}).deleted_count == 0:
+            continue
+        try:
+            os.remove(path_for(obj["name"]))
+        except FileNotFoundError:
+            pass
+    if removed:
+        media_uploads.delete_many({"objects": {"$in": [o["_id"] for o in removed]}})
+    return {"removed": len(removed), "bytes": sum(o.get("size", 0) for o in removed), "dry_run": False}
+
+def storage_stats():
+    objects = media_objects.count_documents({})
+    size = sum(o.get("size", 0) for o in media_objects.find({}, {"size": 1}))
+    return {"objects": objects, "bytes": size, "uploads": media_uploads.count_documents({})}
+
+if __name__ == "__main__":
+    # python media.py gc [--dry-run] | stats
+    args = sys.argv[1:]
+    if args[:1] == ["gc"]:
+        print(gc(dry_run="--dry-run" in args))
+    elif args[:1] == ["stats"]:
+        print(storage_stats())
+    else:
+        print("Usage: python media.py gc [--dry-run] | stats")
+        sys.exit(2)
@@ -0,0 +1,302 @@
+import os
+import sys
+import json
+import time
+import fcntl
+import atexit
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from pymongo import monitoring
+from ratelimit_store import SHM_DIR
+
+# Request, database and outbound-HTTP metrics in Prometheus text format.
+# Recording never takes a lock. Each thread adds into its own shard (a dict
+# of counters and histogram bucket lists), and shards are only summed when a
+# snapshot is taken. Every worker writes its snapshot to
+# METRICS_DIR/<pid>.json every METRICS_FLUSH_INTERVAL seconds and at exit.
+# /api/metrics, whichever worker serves it, merges all those files, so
+# scrapes see the whole host. Snapshots of workers that are gone are folded
+# into retired.json, so counters never go backwards.
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_DIR = os.getenv("METRICS_DIR", os.path.join(SHM_DIR, "portfolio-metrics"))
+FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+RETIRED = "retired.json"
+
+METRICS = {
+    "http_requests_total": ("counter", "HTTP requests by route, method and status"),
+    "http_request_duration_seconds": ("histogram", "HTTP request latency by route and method"),
+    "mongodb_command_duration_seconds": ("histogram", "MongoDB command latency by collection and command"),
+    "mongodb_command_failures_total": ("counter", "Failed MongoDB commands by collection and command"),
+    "outbound_http_requests_total": ("counter", "Outbound HTTP calls by target and outcome"),
+    "outbound_http_duration_seconds": ("histogram", "Outbound HTTP call latency by target")
+}
+
+class Registry:
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = {}
+            # Only taken once per thread
+            with self._shards_lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def inc(self, name, amount=1, **labels):
+        shard = self._shard()
+        key = (name, tuple(labels.items()))
+        shard[key] = shard.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        shard = self._shard()
+        key = (name, tuple(labels.items()))
+        series = shard.get(key)
+        if series is None:
+            # One count per bucket (the last one is +Inf), then the sum
+            series = shard[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+        series[bisect_left(BUCKETS, value)] += 1
+        series[-1] += value
+
+    def snapshot(self):
+        # {(name, labels): value} summed over every thread's shard
+        with self._shards_lock:
+            shards = list(self._shards)
+        total = {}
+        for shard in shards:
+            for key, value in list(shard.items()):
+                _add(total, key, list(value) if isinstance(value, list) else value)
+        return total
+
+    def reset(self):
+        # The child of a fork starts from zero; the parent keeps reporting its own counts
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+
+def _add(total, key, value):
+    current = total.get(key)
+    if current is None:
+        total[key] = value
+    elif isinstance(current, list):
+        total[key] = [a + b for a, b in zip(current, value)]
+    else:
+        total[key] = current + value
+
+def _dump(series):
+    return [[name, [list(pair) for pair in labels], value] for (name, labels), value in series.items()]
+
+def _load(rows):
+    return {(name, tuple(tuple(pair) for pair in labels)): value for name, labels, value in rows}
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class Metrics:
+    def __init__(self, directory=METRICS_DIR, flush_interval=FLUSH_INTERVAL):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.registry = Registry()
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset_child)
+        atexit.register(self.flush)
+
+    def _reset(self):
+        self._thread = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def _reset_child(self):
+        self.registry.reset()
+        self._reset()
+
+    # Recording
+    def inc(self, name, amount=1, **labels):
+        self.registry.inc(name, amount, **labels)
+
+    def observe(self, name, value, **labels):
+        self.registry.observe(name, value, **labels)
+
+    @contextmanager
+    def outbound(self, target):
+        # Times an outbound HTTP call; the outcome is "error" if the block raises
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            yield
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            self.observe("outbound_http_duration_seconds", time.perf_counter() - started, target=target)
+            self.inc("outbound_http_requests_total", target=target, outcome=outcome)
+
+    # Sharing between workers
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def flush(self):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(f"{os.getpid()}.json")
+            with open(path + ".tmp", "w") as f:
+                json.dump(_dump(self.registry.snapshot()), f, separators=(",", ":"))
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            print(f"Metrics flush error: {e}", flush=True)
+
+    def _read(self, name):
+        try:
+            with open(self._path(name)) as f:
+                return _load(json.load(f))
+        except (OSError, ValueError):
+            return {}
+
+    def collect(self):
+        # {(name, labels): value} across every worker on the host, this one's counts current
+        self.flush()
+        total = {}
+        with open(self._path(".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            retired = self._read(RETIRED)
+            names = os.listdir(self.directory)
+            changed = False
+            for name in names:
+                if not name.endswith(".json") or name == RETIRED:
+                    continue
+                series = self._read(name)
+                pid = int(name[:-5]) if name[:-5].isdigit() else None
+                if pid is not None and pid != os.getpid() and not _alive(pid):
+                    for key, value in series.items():
+                        _add(retired, key, value)
+                    os.remove(self._path(name))
+                    changed = True
+                    continue
+                for key, value in series.items():
+                    _add(total, key, value)
+            if changed:
+                with open(self._path(RETIRED + ".tmp"), "w") as f:
+                    json.dump(_dump(retired), f, separators=(",", ":"))
+                os.replace(self._path(RETIRED + ".tmp"), self._path(RETIRED))
+        for key, value in retired.items():
+            _add(total, key, value)
+        return total
+
+    def render(self):
+        # Prometheus text exposition format
+        series = self.collect()
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            rows = sorted((labels, value) for (n, labels), value in series.items() if n == name)
+            if not rows:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in rows:
+                if kind == "histogram":
+                    cumulative = 0
+                    for bound, count in zip(list(BUCKETS) + ["+Inf"], value[:-1]):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_labels(labels, le=bound)} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(labels)} {value[-1]:.6f}")
+                    lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+                else:
+                    lines.append(f"{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    # Background flushing, one thread per worker
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="metrics-flush", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    # Flask wiring
+    def init_app(self, app):
+        from flask import g, request
+
+        @app.before_request
+        def start_request_timer():
+            self.start()
+            g.metrics_started = time.perf_counter()
+
+        def record(status):
+            started = g.pop("metrics_started", None)
+            if started is None:
+                return
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            self.observe("http_request_duration_seconds", time.perf_counter() - started, route=route, method=request.method)
+            self.inc("http_requests_total", route=route, method=request.method, status=str(status))
+
+        @app.after_request
+        def record_request(response):
+            record(response.status_code)
+            return response
+
+        @app.teardown_request
+        def record_failed_request(error):
+            # Only still pending when the view raised and no response went through after_request
+            if error is not None:
+                record(500)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+class MongoCommandListener(monitoring.CommandListener):
+    # Per collection/command timings from pymongo's command monitoring
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self._pending = {}
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            target = event.command.get("collection")
+        self._pending[event.request_id] = target if isinstance(target, str) else event.database_name
+
+    def _finish(self, event, failed):
+        collection = self._pending.pop(event.request_id, event.database_name)
+        self.metrics.observe("mongodb_command_duration_seconds", event.duration_micros / 1e6, collection=collection, command=event.command_name)
+        if failed:
+            self.metrics.inc("mongodb_command_failures_total", collection=collection, command=event.command_name)
+
+    def succeeded(self, event):
+        self._finish(event, False)
+
+    def failed(self, event):
+        self._finish(event, True)
+
+metrics = Metrics()
+mongo_listener = MongoCommandListener(metrics)
+
+if __name__ == "__main__":
+    # python metrics.py - prints the merged metrics of the workers on this host
+    if len(sys.argv) > 1:
+        print("Usage: python metrics.py")
+        sys.exit(2)
+    sys.stdout.write(metrics.render())
@@ -1,27 +1,208 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, IndexModel, ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+from dotenv import load_dotenv
 import os
+import sys
+import time
 import certifi
+from metrics import mongo_listener
+
+load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
-DB_NAME = "portfolio_db"
+DB_NAME = os.getenv("MONGO_DB_NAME", "portfolio_db")
 
-client = MongoClient(MONGO_URI, tlsCAFile=certifi.where())
+# Command timings per collection feed /api/metrics (see metrics.py)
+client = MongoClient(MONGO_URI, tlsCAFile=certifi.where(), event_listeners=[mongo_listener])
 db = client[DB_NAME]
 
 # Collections
 contact_messages = db["contact_messages"]
 portfolio_content = db["portfolio_content"]
+blog_posts = db["blog_posts"]
 settings = db["settings"]
 password_reset_otp = db["password_reset_otp"]
 visitor_logs = db["visitor_logs"]
+visitor_rollups = db["visitor_rollups"]
+visitor_sketches = db["visitor_sketches"]
+search_postings = db["search_postings"]
+search_docs = db["search_docs"]
+sms_outbox = db["sms_outbox"]
+sms_campaigns = db["sms_campaigns"]
+sms_campaign_recipients = db["sms_campaign_recipients"]
+media_objects = db["media_objects"]
+media_uploads = db["media_uploads"]
+# Deleted documents, so differential backups can replay deletes
+tombstones = db["tombstones"]
+
+# Index registry: every index the app relies on, declared next to its collection.
+# Applied idempotently by ensure_indexes() at startup or `python models.py indexes`.
+INDEXES = {
+    contact_messages: [
+        IndexModel([("timestamp", DESCENDING), ("_id", DESCENDING)], name="timestamp_desc"),
+        IndexModel([("status", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], name="status_timestamp"),
+        IndexModel([("reason", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], name="reason_timestamp")
+    ],
+    portfolio_content: [
+        IndexModel([("section", ASCENDING)], name="section_unique", unique=True)
+    ],
+    blog_posts: [
+        IndexModel([("slug", ASCENDING)], name="slug_unique", unique=True),
+        IndexModel([("published_at", DESCENDING), ("_id", DESCENDING)], name="published_desc"),
+        # One post per legacy blog entry, however many workers run the migration at once
+        IndexModel([("legacy_id", ASCENDING)], name="legacy_id_unique", unique=True, sparse=True)
+    ],
+    settings: [
+        IndexModel([("type", ASCENDING)], name="type_unique", unique=True)
+    ],
+    password_reset_otp: [
+        IndexModel([("mobile", ASCENDING)], name="mobile_unique", unique=True),
+        # TTL: Mongo removes OTP records once expires_at has passed
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0)
+    ],
+    visitor_logs: [
+        IndexModel([("timestamp", DESCENDING)], name="timestamp_desc"),
+        IndexModel([("ingested_at", ASCENDING)], name="ingested_at")
+    ],
+    visitor_rollups: [
+        IndexModel([("granularity", ASCENDING), ("bucket", ASCENDING)], name="granularity_bucket")
+    ],
+    visitor_sketches: [
+        IndexModel([("granularity", ASCENDING), ("bucket", ASCENDING)], name="granularity_bucket")
+    ],
+    search_postings: [
+        IndexModel([("term", ASCENDING), ("doc", ASCENDING)], name="term_doc", unique=True),
+        IndexModel([("doc", ASCENDING)], name="doc")
+    ],
+    search_docs: [
+        IndexModel([("kind", ASCENDING), ("ref", ASCENDING)], name="kind_ref")
+    ],
+    tombstones: [
+        IndexModel([("deleted_at", ASCENDING)], name="deleted_at")
+    ],
+    sms_outbox: [
+        # Idempotency: the same key is only ever queued once
+        IndexModel([("key", ASCENDING)], name="key_unique_sparse", unique=True, sparse=True),
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt"),
+        IndexModel([("created_at", DESCENDING)], name="created_at_desc"),
+        # TTL: finished jobs are removed once purge_at has passed (see sms_service.py)
+        IndexModel([("purge_at", ASCENDING)], name="purge_at_ttl", expireAfterSeconds=0)
+    ],
+    sms_campaigns: [
+        IndexModel([("created_at", DESCENDING)], name="created_at_desc"),
+        IndexModel([("status", ASCENDING), ("lease_until", ASCENDING)], name="status_lease")
+    ],
+    sms_campaign_recipients: [
+        IndexModel([("campaign", ASCENDING), ("chunk", ASCENDING), ("status", ASCENDING)], name="campaign_chunk_status"),
+        IndexModel([("campaign", ASCENDING), ("status", ASCENDING)], name="campaign_status")
+    ],
+    media_uploads: [
+        IndexModel([("objects", ASCENDING)], name="objects")
+    ]
+}
+
+# Change tracking for differential backups: every write path stamps updated_at
+for _collection in (contact_messages, portfolio_content, blog_posts, settings):
+    INDEXES[_collection].append(IndexModel([("updated_at", ASCENDING)], name="updated_at"))
+
+# Known route queries; check_query_plans() fails if any of them is answered by a COLLSCAN.
+# (collection, filter, sort, limit)
+QUERY_PLANS = {
+    "inbox": (contact_messages, {}, [("timestamp", -1), ("_id", -1)], 50),
+    "inbox_by_status": (contact_messages, {"status": "unread"}, [("timestamp", -1), ("_id", -1)], 50),
+    "inbox_by_reason": (contact_messages, {"reason": "Other"}, [("timestamp", -1), ("_id", -1)], 50),
+    "content_section": (portfolio_content, {"section": "blog"}, None, 0),
+    "settings_admin": (settings, {"type": "admin_credentials"}, None, 0),
+    "otp_by_mobile": (password_reset_otp, {"mobile": "0000000000"}, None, 0),
+    "recent_visitors": (visitor_logs, {}, [("timestamp", -1)], 20),
+    "visitors_range": (visitor_logs, {"timestamp": {"$gte": 0, "$lte": 1}}, None, 0),
+    "hourly_rollups": (visitor_rollups, {"granularity": "hour", "bucket": {"$gte": 0, "$lte": 1}}, [("bucket", 1)], 0),
+    "sketch_range": (visitor_sketches, {"granularity": "day", "bucket": {"$gte": 0, "$lte": 1}}, None, 0),
+    "search_term": (search_postings, {"term": "flutter"}, None, 0),
+    "search_prefix": (search_postings, {"term": {"$regex": "^flu"}}, None, 0),
+    "search_doc_postings": (search_postings, {"doc": "message:0"}, None, 0),
+    "search_legacy_blog": (search_docs, {"kind": "blog", "ref": {"$type": "int"}}, None, 0),
+    "blog_page": (blog_posts, {}, [("published_at", -1), ("_id", -1)], 11),
+    "blog_by_slug": (blog_posts, {"slug": "hello-world"}, None, 0),
+    "blog_by_legacy_id": (blog_posts, {"legacy_id": "blog:0"}, None, 0),
+    "changed_posts": (blog_posts, {"updated_at": {"$gte": 0}}, None, 0),
+    "changed_messages": (contact_messages, {"updated_at": {"$gte": 0}}, None, 0),
+    "changed_content": (portfolio_content, {"updated_at": {"$gte": 0}}, None, 0),
+    "changed_visitors": (visitor_logs, {"ingested_at": {"$gte": 0}}, None, 0),
+    "changed_settings": (settings, {"updated_at": {"$gte": 0}}, None, 0),
+    "new_tombstones": (tombstones, {"deleted_at": {"$gte": 0}}, None, 0),
+    "sms_due": (sms_outbox, {"status": {"$in": ["pending", "sending"]}, "next_attempt_at": {"$lte": 0}}, [("next_attempt_at", 1)], 1),
+    "sms_by_key": (sms_outbox, {"key": "contact:0"}, None, 0),
+    "sms_recent": (sms_outbox, {}, [("created_at", -1)], 50),
+    "campaigns_recent": (sms_campaigns, {}, [("created_at", -1)], 20),
+    "campaigns_stale": (sms_campaigns, {"status": {"$in": ["queued", "running"]}, "lease_until": {"$not": {"$gte": 0}}}, None, 0),
+    "campaign_chunk": (sms_campaign_recipients, {"campaign": 0, "chunk": 0, "status": "pending"}, None, 0),
+    "campaign_failures": (sms_campaign_recipients, {"campaign": 0, "status": "failed"}, None, 100),
+    "uploads_by_object": (media_uploads, {"objects": {"$in": ["0"]}}, None, 0)
+}
+
+def record_deletion(collection, doc_id):
+    tombstones.insert_one({"collection": collection.name, "doc_id": doc_id, "deleted_at": int(time.time())})
+
+# Indexes replaced by a differently specified one on the same keys; ensure_indexes() drops them first
+RETIRED_INDEXES = {
+    blog_posts: ["legacy_id"],
+    sms_outbox: ["key_unique"]
+}
+
+def ensure_indexes():
+    # create_indexes is a no-op for indexes that already exist with the same spec
+    errors = []
+    for collection, names in RETIRED_INDEXES.items():
+        existing = collection.index_information()
+        for name in names:
+            if name in existing:
+                collection.drop_index(name)
+    for collection, indexes in INDEXES.items():
+        try:
+            collection.create_indexes(indexes)
+        except OperationFailure as e:
+            errors.append(f"{collection.name}: {e}")
+            print(f"Index error on {collection.name}: {e}", flush=True)
+    return errors
+
+def _plan_stages(plan):
+    yield plan.get("stage")
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+def check_query_plans():
+    # {name: [stages]} for every known query whose winning plan contains a COLLSCAN
+    failures = {}
+    for name, (collection, query, sort, limit) in QUERY_PLANS.items():
+        cursor = collection.find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        plan = cursor.explain()["queryPlanner"]["winningPlan"]
+        stages = list(_plan_stages(plan))
+        if "COLLSCAN" in stages:
+            failures[name] = stages
+    return failures
+
+def _hash_password(password):
+    # Only needed when the admin record is first created
+    from passwords import hasher
+    return hasher.hash(password)
 
 def init_db():
+    now = int(time.time())
     # Initialize basic settings if they don't exist
     if settings.count_documents({"type": "admin_credentials"}) == 0:
         settings.insert_one({
             "type": "admin_credentials",
+            "updated_at": now,
             "mobile": os.getenv("ADMIN_MOBILE", "9855062769"),
-            "password": generate_password_hash(os.getenv("ADMIN_PASSWORD", "Admin@123")),
+            "password": _hash_password(os.getenv("ADMIN_PASSWORD", "Admin@123")),
             "maintenance_mode": False,
             "site_title": "Aarambha Aryal",
             "site_description": "Personal VCard / Portfolio",
@@ -39,6 +220,7 @@ def init_db():
         portfolio_content.insert_many([
             {
                 "section": "personal_info",
+                "updated_at": now,
                 "content": {
                     "name": "Aarambha Aryal",
                     "role": "Flutter Developer",
@@ -51,6 +233,7 @@ def init_db():
             },
             {
                 "section": "about",
+                "updated_at": now,
                 "content": {
                     "bio": "I am a Aarambha Aryal, an Flutter developer from Nepal, focused on building clean, high-quality applications. My work is driven by a passion for learning full stack development and exploring new technologies and tools.",
                     "services": [
@@ -63,6 +246,7 @@ def init_db():
             },
             {
                 "section": "clients",
+                "updated_at": now,
                 "content": [
                     {"name": "Client 1", "logo": "https://via.placeholder.com/150", "url": "#"},
                     {"name": "Client 2", "logo": "https://via.placeholder.com/150", "url": "#"}
@@ -70,6 +254,7 @@ def init_db():
             },
             {
                 "section": "resume",
+                "updated_at": now,
                 "content": {
                     "education": [
                         {"title": "University name", "date": "2010 — 2013", "description": "Nemo enims ipsam voluptatem, voldruptas sit aspernatur aut odit aut fugit, sed cursuxu luto."}
@@ -91,6 +276,7 @@ def init_db():
     if portfolio_content.count_documents({"section": "portfolio"}) == 0:
         portfolio_content.insert_one({
             "section": "portfolio",
+            "updated_at": now,
             "content": [
                 { "title": "Finance App", "category": "Web Development", "image": "https://api.dicebear.com/7.x/shapes/svg?seed=p1" },
                 { "title": "Orizon", "category": "Web Design", "image": "https://api.dicebear.com/7.x/shapes/svg?seed=p2" },
@@ -103,5 +289,24 @@ def init_db():
     if portfolio_content.count_documents({"section": "blog"}) == 0:
         portfolio_content.insert_one({
             "section": "blog",
+            "updated_at": now,
             "content": []
         })
+
+if __name__ == "__main__":
+    # python models.py indexes  -> apply the index registry
+    # python models.py check    -> apply it, then fail if any known query plans a COLLSCAN
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command not in ("indexes", "check"):
+        print("Usage: python models.py indexes | check")
+        sys.exit(2)
+    if ensure_indexes():
+        sys.exit(1)
+    print("Indexes up to date")
+    if command == "check":
+        failures = check_query_plans()
+        for name, stages in failures.items():
+            print(f"COLLSCAN: {name} ({' -> '.join(str(s) for s in stages)})")
+        if failures:
+            sys.exit(1)
+        print(f"All {len(QUERY_PLANS)} query plans use indexes")
@@ -0,0 +1,205 @@
+import os
+import sys
+import time
+import fcntl
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import bcrypt
+from ratelimit_store import SHM_DIR
+
+# Password hashing off the request path.
+# bcrypt is slow on purpose, so a burst of logins could otherwise occupy
+# every core and stall the public endpoints. Every hash or check runs on a
+# small per-process pool (PASSWORD_HASH_WORKERS threads), and each task must
+# first take one of PASSWORD_HASH_SLOTS host-wide slots. The slots are
+# byte-range locks on a shared file, so the cap holds across all gunicorn
+# workers. A task that has not got a pool thread and a slot within
+# PASSWORD_HASH_QUEUE_TIMEOUT seconds fails with HasherBusy (a task still in
+# the pool's queue is cancelled), and the endpoint answers 503 instead of
+# queueing without bound.
+#
+# BCRYPT_LOG_ROUNDS is the cost for new hashes; `python passwords.py
+# calibrate` picks one for a target latency on this machine. A stored hash
+# with a different cost is rehashed in the background after the next
+# successful login.
+
+ROUNDS = int(os.getenv("BCRYPT_LOG_ROUNDS", "12"))
+WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+SLOTS = int(os.getenv("PASSWORD_HASH_SLOTS", str(max(1, (os.cpu_count() or 2) // 2))))
+QUEUE_TIMEOUT = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", "2"))
+SLOT_PATH = os.getenv("PASSWORD_HASH_SLOT_PATH", os.path.join(SHM_DIR, "portfolio-bcrypt-slots"))
+# bcrypt only reads the first 72 bytes; longer passwords are refused rather than truncated
+MAX_PASSWORD_BYTES = 72
+
+class HasherBusy(Exception):
+    pass
+
+class HostSlots:
+    # At most `count` holders across every process on the host
+    def __init__(self, count, path):
+        self.count = count
+        self.path = path
+        self._fd = None
+        self._held = set()
+        self._lock = threading.Lock()
+
+    def _file(self):
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        return self._fd
+
+    def acquire(self, deadline):
+        # fcntl locks belong to the process, so slots held by this process's other threads are skipped explicitly
+        while True:
+            with self._lock:
+                fd = self._file()
+                for i in range(self.count):
+                    if i in self._held:
+                        continue
+                    try:
+                        fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, i)
+                    except OSError:
+                        continue
+                    self._held.add(i)
+                    return i
+            if time.monotonic() >= deadline:
+                raise HasherBusy("Password hashing is busy")
+            time.sleep(0.005)
+
+    def release(self, slot):
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, slot)
+            self._held.discard(slot)
+
+    def reset(self):
+        # The child of a fork holds none of the parent's locks
+        self._fd = None
+        self._held = set()
+        self._lock = threading.Lock()
+
+def _encode(password):
+    data = password.encode("utf-8")
+    if not data or len(data) > MAX_PASSWORD_BYTES:
+        raise ValueError(f"Password must be 1-{MAX_PASSWORD_BYTES} bytes")
+    return data
+
+def _checkpw(data, pw_hash):
+    try:
+        return bcrypt.checkpw(data, pw_hash.encode("utf-8"))
+    except ValueError:  # not a bcrypt hash
+        return False
+
+def cost(pw_hash):
+    # Cost factor of a stored hash ("$2b$12$..." -> 12)
+    try:
+        return int(pw_hash.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+class PasswordHasher:
+    def __init__(self, rounds=ROUNDS, workers=WORKERS, slots=SLOTS, queue_timeout=QUEUE_TIMEOUT, slot_path=SLOT_PATH):
+        self.rounds = rounds
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self.slots = HostSlots(slots, slot_path)
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self.slots.reset()
+
+    def _executor(self):
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._pool
+
+    def _guarded(self, deadline, fn, *args):
+        slot = self.slots.acquire(deadline)
+        try:
+            return fn(*args)
+        finally:
+            self.slots.release(slot)
+
+    def submit(self, fn, *args):
+        # Future for fn(*args) run under a host-wide slot; it fails with HasherBusy past the queue timeout
+        deadline = time.monotonic() + self.queue_timeout
+        return self._executor().submit(self._guarded, deadline, fn, *args)
+
+    def run(self, fn, *args):
+        # fn(*args) under a host-wide slot; the caller waits at most the queue timeout for it to start
+        deadline = time.monotonic() + self.queue_timeout
+        future = self._executor().submit(self._guarded, deadline, fn, *args)
+        try:
+            return future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeout:
+            if future.cancel():
+                raise HasherBusy("Password hashing is busy")
+            # Already on a pool thread: it either holds a slot and finishes within one hash,
+            # or is past its deadline waiting for one and fails with HasherBusy right away
+            return future.result()
+
+    def hash(self, password):
+        # Raises ValueError for an empty or over-long password, HasherBusy when saturated
+        data = _encode(password)
+        return self.run(lambda: bcrypt.hashpw(data, bcrypt.gensalt(rounds=self.rounds)).decode("utf-8"))
+
+    def check(self, pw_hash, password):
+        if not isinstance(password, str) or not pw_hash:
+            return False
+        try:
+            data = _encode(password)
+        except ValueError:
+            return False
+        return self.run(_checkpw, data, pw_hash)
+
+    def needs_rehash(self, pw_hash):
+        return cost(pw_hash) != self.rounds
+
+    def rehash_later(self, password, save):
+        # Hashes at the configured cost in the background and hands the result to save(new_hash)
+        data = _encode(password)
+        def rehash():
+            save(bcrypt.hashpw(data, bcrypt.gensalt(rounds=self.rounds)).decode("utf-8"))
+        def report(future):
+            if future.exception():
+                print(f"Password rehash failed: {future.exception()}", flush=True)
+        future = self.submit(rehash)
+        future.add_done_callback(report)
+        return future
+
+def calibrate(target_ms, samples=3, min_rounds=10, max_rounds=16):
+    # [(rounds, median ms)] measured up to the first cost over the target, and the highest cost within it
+    timings = []
+    chosen = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        runs = []
+        for _ in range(samples):
+            started = time.perf_counter()
+            bcrypt.hashpw(b"calibration-password", bcrypt.gensalt(rounds=rounds))
+            runs.append((time.perf_counter() - started) * 1000)
+        median = sorted(runs)[len(runs) // 2]
+        timings.append((rounds, median))
+        if median > target_ms:
+            break
+        chosen = rounds
+    return timings, chosen
+
+hasher = PasswordHasher()
+
+if __name__ == "__main__":
+    # python passwords.py calibrate [target_ms]
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "calibrate":
+        target = float(sys.argv[2]) if len(sys.argv) > 2 else 250.0
+        timings, chosen = calibrate(target)
+        for rounds, ms in timings:
+            print(f"cost {rounds:>2}: {ms:8.1f}ms")
+        print(f"Highest cost within {target:.0f}ms on this machine: {chosen} (currently {ROUNDS})")
+        print(f"BCRYPT_LOG_ROUNDS={chosen}")
+    else:
+        print("Usage: python passwords.py calibrate [target_ms]")
+        sys.exit(2)
@@ -0,0 +1,227 @@
+import os
+import sys
+import mmap
+import time
+import fcntl
+import struct
+import hashlib
+import tempfile
+import threading
+from math import floor
+from limits.storage import Storage
+from limits.storage.base import SlidingWindowCounterSupport
+
+# Rate-limit counters shared by every worker process on the host.
+# flask-limiter's memory:// storage keeps counters per process, so under
+# gunicorn each worker enforced its own copy of every limit (N workers, N
+# times the allowance) and restarts reset them. This storage keeps them in a
+# fixed-size table in a memory-mapped file (in /dev/shm where available):
+#
+#   bucket = hash(key) % buckets, each bucket holding BUCKET_SLOTS slots of
+#   (key hash, window number, window length, previous count, current count)
+#
+# and implements the sliding-window-counter strategy: a limit of N per T
+# seconds allows a hit while previous * (time left in the window / T) +
+# current stays under N. A check reads one bucket under a byte-range lock on
+# it (fcntl, between processes) plus a thread lock (within the process), so
+# its cost does not depend on the number of keys. When a bucket is full the
+# slot that expired first is reused.
+#
+# RATELIMIT_STORAGE selects the backend: "shm" (default), "mongo" (limits'
+# MongoDB storage, for limits shared by several hosts) or "memory".
+
+SLOT = struct.Struct("<QqIII4x")
+BUCKET_SLOTS = 8
+LOCK_STRIPES = 64
+LAYOUT_VERSION = 1
+SLOTS = int(os.getenv("RATELIMIT_SLOTS", "65536"))
+SHM_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+SHM_PATH = os.getenv("RATELIMIT_SHM_PATH", os.path.join(SHM_DIR, f"portfolio-ratelimit-v{LAYOUT_VERSION}-{SLOTS}.bin"))
+
+def key_hash(key):
+    # 0 marks an empty slot
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little") or 1
+
+class SharedMemoryStorage(Storage, SlidingWindowCounterSupport):
+    STORAGE_SCHEME = ["shm"]
+
+    def __init__(self, uri=None, wrap_exceptions=False, **options):
+        # shm:// uses SHM_PATH; shm:///some/file names the table file
+        path = uri.split("://", 1)[1] if uri and "://" in uri else ""
+        self.path = path or SHM_PATH
+        self.buckets = max(SLOTS // BUCKET_SLOTS, 1)
+        self._map = None
+        self._fd = None
+        self._open_lock = threading.Lock()
+        self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        os.register_at_fork(after_in_child=self._reset_locks)
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    def _reset_locks(self):
+        # A fork can happen while another thread holds one of these
+        self._open_lock = threading.Lock()
+        self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+    @property
+    def base_exceptions(self):
+        return (OSError, ValueError)
+
+    def _table(self):
+        if self._map is None:
+            with self._open_lock:
+                if self._map is None:
+                    size = self.buckets * BUCKET_SLOTS * SLOT.size
+                    fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+                    if os.fstat(fd).st_size < size:
+                        os.ftruncate(fd, size)
+                    self._fd = fd
+                    self._map = mmap.mmap(fd, size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        return self._map
+
+    def _locked(self, key, update):
+        # update(slot) -> (new slot or None, result); slot is [hash, window, expiry, previous, current]
+        table = self._table()
+        h = key_hash(key)
+        bucket = h % self.buckets
+        start = bucket * BUCKET_SLOTS * SLOT.size
+        now = time.time()
+        with self._locks[bucket % LOCK_STRIPES]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, start)
+            try:
+                offset, victim, victim_end = None, None, None
+                for i in range(BUCKET_SLOTS):
+                    at = start + i * SLOT.size
+                    slot = SLOT.unpack_from(table, at)
+                    if slot[0] == h:
+                        offset = at
+                        break
+                    # Counts in a slot matter until the end of the window after its current one
+                    end = 0 if slot[0] == 0 else (slot[1] + 2) * slot[2]
+                    if victim is None or end < victim_end:
+                        victim, victim_end = at, end
+                if offset is None:
+                    offset, slot = victim, (h, 0, 0, 0, 0)
+                slot, result = update(list(slot), now)
+                if slot is not None:
+                    SLOT.pack_into(table, offset, *slot)
+                return result
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, start)
+
+    @staticmethod
+    def _roll(slot, expiry, now):
+        # Moves slot to the window containing now
+        window = int(now // expiry)
+        if slot[2] != expiry or slot[1] < window - 1:
+            slot[1:] = [window, expiry, 0, 0]
+        elif slot[1] == window - 1:
+            slot[1:] = [window, expiry, slot[4], 0]
+        return slot
+
+    @staticmethod
+    def _window_info(slot, expiry, now):
+        # (previous count, its weight in seconds, current count, current ttl) as limits expects
+        left = expiry - now % expiry
+        previous = slot[3]
+        return previous, float(left) if previous else 0.0, slot[4], left + expiry
+
+    def acquire_sliding_window_entry(self, key, limit, expiry, amount=1):
+        if amount > limit:
+            return False
+        def update(slot, now):
+            slot = self._roll(slot, expiry, now)
+            previous, weight, current, _ = self._window_info(slot, expiry, now)
+            if floor(previous * weight / expiry + current) + amount > limit:
+                return None, False
+            slot[4] += amount
+            return slot, True
+        return self._locked(key, update)
+
+    def get_sliding_window(self, key, expiry):
+        return self._locked(key, lambda slot, now: (None, self._window_info(self._roll(slot, expiry, now), expiry, now)))
+
+    def clear_sliding_window(self, key, expiry):
+        self.clear(key)
+
+    # Fixed windows (the "fixed-window" strategy), aligned to the clock
+    def incr(self, key, expiry, amount=1):
+        def update(slot, now):
+            slot = self._roll(slot, int(expiry), now)
+            slot[4] += amount
+            return slot, slot[4]
+        return self._locked(key, update)
+
+    def get(self, key):
+        def read(slot, now):
+            if slot[2] and slot[1] == int(now // slot[2]):
+                return None, slot[4]
+            return None, 0
+        return self._locked(key, read)
+
+    def get_expiry(self, key):
+        def read(slot, now):
+            return None, (slot[1] + 1) * slot[2] if slot[2] else now
+        return self._locked(key, read)
+
+    def clear(self, key):
+        # A slot with no window length is the blank one handed out for an unknown key
+        self._locked(key, lambda slot, now: ([0, 0, 0, 0, 0] if slot[2] else None, None))
+
+    def check(self):
+        try:
+            self._table()
+            return True
+        except OSError:
+            return False
+
+    def reset(self):
+        table = self._table()
+        used = self.stats()["used"]
+        table[:] = bytes(len(table))
+        return used
+
+    def stats(self):
+        table = self._table()
+        now = time.time()
+        used = live = 0
+        for at in range(0, len(table), SLOT.size):
+            h, window, expiry, _, _ = SLOT.unpack_from(table, at)
+            if h:
+                used += 1
+                live += (window + 2) * expiry > now
+        return {"path": self.path, "slots": len(table) // SLOT.size, "used": used, "live": live}
+
+def storage_config():
+    # (storage_uri, storage_options) for the Limiter
+    backend = os.getenv("RATELIMIT_STORAGE", "shm")
+    if backend == "mongo":
+        import certifi
+        return os.getenv("MONGO_URI", "mongodb://localhost:27017/"), {
+            "database_name": os.getenv("MONGO_DB_NAME", "portfolio_db"),
+            "counter_collection_name": "ratelimit_counters",
+            "window_collection_name": "ratelimit_windows",
+            "tlsCAFile": certifi.where()
+        }
+    if backend == "memory":
+        return "memory://", {}
+    return "shm://", {}
+
+if __name__ == "__main__":
+    # python ratelimit_store.py stats | reset | bench
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    store = SharedMemoryStorage()
+    if command == "stats":
+        print(store.stats())
+    elif command == "reset":
+        print(f"Cleared {store.reset()} slots")
+    elif command == "bench":
+        n = 100000
+        started = time.perf_counter()
+        for i in range(n):
+            store.acquire_sliding_window_entry(f"bench/{i % 1000}", 1000000, 60)
+        print(f"{(time.perf_counter() - started) / n * 1e6:.1f} µs per check")
+        for i in range(1000):
+            store.clear(f"bench/{i}")
+    else:
+        print("Usage: python ratelimit_store.py stats | reset | bench")
+        sys.exit(2)
@@ -0,0 +1,91 @@
+import sys
+import gzip
+import json
+import time
+from pymongo import DeleteOne
+from backup import read_archive, ArchiveError
+from importer import BulkImporter, write_op
+import rollups
+
+# Replays backup archives written by backup.py: one full archive followed by
+# the chain of delta archives taken after it, oldest first.
+#
+# Documents are upserted on their natural key with $set (see importer.write_op),
+# so fields left out of archives (the admin password) survive a restore and
+# sections seeded by init_db are updated rather than duplicated. Tombstones in
+# deltas become deletes. The search index and visitor rollups are updated
+# chunk by chunk for the documents that were written or deleted.
+
+def open_archive(path):
+    return gzip.open(path, "rt", encoding="utf-8")
+
+def archive_meta(path):
+    # Header of an archive without reading the rest of it
+    with open_archive(path) as f:
+        header = json.loads(f.readline())
+    if header.get("__backup__") != "header":
+        raise ArchiveError(f"{path} is not a backup archive")
+    return header
+
+def order_chain(paths):
+    # Sort archives oldest first and check they form full -> delta -> delta... with no gaps
+    archives = sorted(((archive_meta(p), p) for p in paths), key=lambda a: a[0]["created_at"])
+    if not archives or archives[0][0].get("mode") != "full":
+        raise ArchiveError("A restore chain must start with a full archive")
+    for (prev, _), (meta, path) in zip(archives, archives[1:]):
+        if meta.get("mode") != "delta":
+            raise ArchiveError(f"{path}: only one full archive may be replayed at a time")
+        if meta["since"] > prev["created_at"]:
+            raise ArchiveError(f"{path}: gap in the chain (changes since {prev['created_at']} are missing)")
+    return [p for _, p in archives]
+
+def replay(path, applier, drop=False):
+    with open_archive(path) as f:
+        dropped = set()
+        for event in read_archive(f):
+            if event[0] != "doc":
+                continue
+            _, collection, doc = event
+            if collection == "tombstones":
+                applier.add_op(doc["collection"], DeleteOne({"_id": doc["doc_id"]}), {"_id": doc["doc_id"]})
+                continue
+            if drop and collection not in dropped and collection != "settings":
+                applier.drop(collection)
+                dropped.add(collection)
+            applier.add_op(collection, write_op(collection, doc), doc)
+    applier.flush()
+
+def verify(path):
+    # Full read of an archive, checking every section before anything is written
+    with open_archive(path) as f:
+        for _ in read_archive(f):
+            pass
+
+def restore(paths, drop=False):
+    chain = order_chain(paths)
+    for path in chain:
+        verify(path)
+    # Archives are our own output, so documents skip validation
+    applier = BulkImporter(validate=False)
+    for i, path in enumerate(chain):
+        replay(path, applier, drop=drop and i == 0)
+        print(f"Replayed {path}: {applier.stats}", flush=True)
+    return applier.result()
+
+if __name__ == "__main__":
+    # python restore.py [--drop] full.ndjson.gz [delta.ndjson.gz ...]
+    # --drop clears each collection in the full archive first (settings are always merged)
+    args = sys.argv[1:]
+    drop = "--drop" in args
+    paths = [a for a in args if a != "--drop"]
+    if not paths:
+        print("Usage: python restore.py [--drop] <full archive> [<delta archive> ...]")
+        sys.exit(2)
+    rollups.load_routes()
+    start = time.perf_counter()
+    try:
+        stats = restore(paths, drop=drop)
+    except ArchiveError as e:
+        print(f"Restore failed: {e}")
+        sys.exit(1)
+    print(f"Restored {len(paths)} archive(s) in {time.perf_counter() - start:.1f}s: {stats}")
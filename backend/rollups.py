@@ -0,0 +1,274 @@
+import os
+import sys
+import time
+import datetime
+from functools import lru_cache
+from collections import defaultdict, Counter
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from models import visitor_logs, visitor_rollups, visitor_sketches
+from hll import HyperLogLog
+
+# Pre-aggregated visitor counters.
+# Every flushed batch of visitor logs is folded into hourly and daily buckets
+# plus one all-time document, so analytics reads O(days) small documents
+# instead of scanning visitor_logs.
+#
+#   {"_id": "d:2026-01-20", "granularity": "day",  "bucket": <start ts>, "views": n,
+#    "countries": {...}, "paths": {...}}
+#   {"_id": "h:2026-01-20T13", "granularity": "hour", ...}
+#   {"_id": "total", "granularity": "all", ...}
+#
+# Unique visitors are tracked separately in visitor_sketches as one HyperLogLog
+# per day plus an all-time sketch ({"_id", "granularity", "bucket", "registers", "v"}).
+#
+# Buckets use server local time, like the existing daily chart.
+#
+# "paths" counts the Flask route a request matched ("/api/blog/<slug>"), not
+# the raw URL: bots and scanners request endless distinct URLs, and each one
+# would add a field to the all-time document until it hit Mongo's 16MB limit.
+# URLs no route serves, including the SPA's not-found fallback, count as "other".
+
+TOTAL_ID = "total"
+# Longer "<n>d" windows are clamped; they reach back before any data anyway
+MAX_WINDOW_DAYS = 36500
+OTHER_PATH = "other"
+SPA_FALLBACK = "/<path:path>"
+# Set by app.py; lets a backfill match logs written before "route" was recorded
+url_map = None
+
+def _key(value):
+    # Mongo field names can't contain "." or start with "$"
+    return str(value).replace(".", "．").replace("$", "＄")
+
+def _unkey(value):
+    return value.replace("．", ".").replace("＄", "$")
+
+@lru_cache(maxsize=4096)
+def route_of(path):
+    # The URL rule a path matches, for logs without a "route"; None if no route serves it
+    from werkzeug.exceptions import HTTPException, MethodNotAllowed
+    if url_map is None or not path:
+        return None
+    adapter = url_map.bind("localhost")
+    for method in ("GET", "POST", "PUT", "DELETE"):
+        try:
+            rule, _ = adapter.match(path, method=method, return_rule=True)
+            return rule.rule
+        except MethodNotAllowed:
+            continue
+        except HTTPException:
+            return None
+    return None
+
+def load_routes():
+    # For command-line runs: the app's URL map, to match logs recorded before "route" was
+    global url_map
+    if url_map is None:
+        os.environ["STARTUP_BOOTSTRAP"] = "skip"
+        from app import app as flask_app
+        url_map = flask_app.url_map
+
+def _route_key(log):
+    route = log["route"] if "route" in log else route_of(log.get("path"))
+    if not route or route == SPA_FALLBACK:
+        route = OTHER_PATH
+    return _key(route)
+
+def day(ts):
+    return datetime.datetime.fromtimestamp(ts).strftime("%Y-%m-%d")
+
+def day_id(ts):
+    return "d:" + day(ts)
+
+def hour_id(ts):
+    return "h:" + datetime.datetime.fromtimestamp(ts).strftime("%Y-%m-%dT%H")
+
+def _bucket_start(ts, granularity):
+    dt = datetime.datetime.fromtimestamp(ts)
+    if granularity == "hour":
+        dt = dt.replace(minute=0, second=0, microsecond=0)
+    else:
+        dt = dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    return int(dt.timestamp())
+
+class _Accumulator:
+    def __init__(self):
+        self.buckets = defaultdict(lambda: {"views": 0, "countries": Counter(), "paths": Counter()})
+        self.meta = {}
+        self.sketches = defaultdict(HyperLogLog)
+
+    def add(self, log):
+        ts = log.get("timestamp")
+        if ts is None:
+            return
+        targets = [
+            (day_id(ts), "day", _bucket_start(ts, "day")),
+            (hour_id(ts), "hour", _bucket_start(ts, "hour")),
+            (TOTAL_ID, "all", 0)
+        ]
+        for bucket_id, granularity, start in targets:
+            bucket = self.buckets[bucket_id]
+            self.meta[bucket_id] = (granularity, start)
+            bucket["views"] += 1
+            if log.get("country"):
+                bucket["countries"][_key(log["country"])] += 1
+            if log.get("path") or log.get("route"):
+                bucket["paths"][_route_key(log)] += 1
+            if log.get("ip") and granularity != "hour":
+                self.sketches[bucket_id].add(log["ip"])
+
+    def operations(self):
+        ops = []
+        for bucket_id, bucket in self.buckets.items():
+            granularity, start = self.meta[bucket_id]
+            inc = {"views": bucket["views"]}
+            for name, count in bucket["countries"].items():
+                inc[f"countries.{name}"] = count
+            for name, count in bucket["paths"].items():
+                inc[f"paths.{name}"] = count
+            ops.append(UpdateOne(
+                {"_id": bucket_id},
+                {"$inc": inc, "$setOnInsert": {"granularity": granularity, "bucket": start}},
+                upsert=True
+            ))
+        return ops
+
+    def write(self):
+        ops = self.operations()
+        if ops:
+            visitor_rollups.bulk_write(ops, ordered=False)
+        for sketch_id, sketch in self.sketches.items():
+            granularity, start = self.meta[sketch_id]
+            merge_sketch(sketch_id, granularity, start, sketch)
+
+def merge_sketch(sketch_id, granularity, start, sketch, retries=10):
+    # Compare-and-swap on "v" so concurrent workers never lose each other's registers;
+    # HLL merges are idempotent, so retrying on a conflict is always safe.
+    for _ in range(retries):
+        doc = visitor_sketches.find_one({"_id": sketch_id})
+        if doc is None:
+            try:
+                visitor_sketches.insert_one({
+                    "_id": sketch_id,
+                    "granularity": granularity,
+                    "bucket": start,
+                    "registers": sketch.to_bytes(),
+                    "v": 1
+                })
+                return
+            except DuplicateKeyError:
+                continue
+        merged = HyperLogLog.from_bytes(doc["registers"]).merge(sketch)
+        if merged.to_bytes() == doc["registers"]:
+            return
+        result = visitor_sketches.update_one(
+            {"_id": sketch_id, "v": doc["v"]},
+            {"$set": {"registers": merged.to_bytes()}, "$inc": {"v": 1}}
+        )
+        if result.modified_count:
+            return
+    print(f"Sketch merge gave up after {retries} conflicts: {sketch_id}", flush=True)
+
+def record(batch):
+    # Ingest listener: fold a flushed batch of visitor logs into the rollups
+    acc = _Accumulator()
+    for log in batch:
+        acc.add(log)
+    acc.write()
+
+def clear():
+    visitor_rollups.delete_many({})
+    visitor_sketches.delete_many({})
+
+def backfill(batch_size=50000):
+    # Rebuild all rollups from visitor_logs. Run with logging paused (e.g. before
+    # starting the workers), otherwise events flushed meanwhile are counted twice.
+    clear()
+    acc = _Accumulator()
+    count = 0
+    cursor = visitor_logs.find({}, {"_id": 0, "timestamp": 1, "country": 1, "path": 1, "route": 1, "ip": 1}).batch_size(5000)
+    for log in cursor:
+        acc.add(log)
+        count += 1
+        if count % batch_size == 0:
+            acc.write()
+            acc = _Accumulator()
+            print(f"Backfilled {count} logs", flush=True)
+    acc.write()
+    return count
+
+def _decode(doc):
+    return {
+        "views": doc.get("views", 0),
+        "countries": {_unkey(k): v for k, v in doc.get("countries", {}).items()},
+        "paths": {_unkey(k): v for k, v in doc.get("paths", {}).items()}
+    }
+
+def totals():
+    doc = visitor_rollups.find_one({"_id": TOTAL_ID})
+    return _decode(doc or {})
+
+def daily(days=7, now=None):
+    # [(datetime, rollup)] for the last `days` local days, oldest first
+    now = now or datetime.datetime.now()
+    dates = [now - datetime.timedelta(days=days - 1 - i) for i in range(days)]
+    ids = [day_id(d.timestamp()) for d in dates]
+    docs = {d["_id"]: d for d in visitor_rollups.find({"_id": {"$in": ids}})}
+    return [(d, _decode(docs.get(i, {}))) for d, i in zip(dates, ids)]
+
+def hourly(start_ts, end_ts):
+    docs = visitor_rollups.find(
+        {"granularity": "hour", "bucket": {"$gte": start_ts, "$lte": end_ts}}
+    ).sort("bucket", 1)
+    return [(doc["bucket"], _decode(doc)) for doc in docs]
+
+def window_bounds(window=None, start=None, end=None, now=None):
+    # (start_ts, end_ts) for a named window or explicit YYYY-MM-DD dates; None means all time
+    now = now or datetime.datetime.now()
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if start or end:
+        first = datetime.datetime.strptime(start, "%Y-%m-%d") if start else datetime.datetime.fromtimestamp(0)
+        last = datetime.datetime.strptime(end, "%Y-%m-%d") if end else midnight
+        try:
+            return int(first.timestamp()), int(last.timestamp())
+        except (OverflowError, OSError):
+            raise ValueError("Dates out of range")
+    if not window or window == "all":
+        return None
+    if window == "today":
+        return int(midnight.timestamp()), int(midnight.timestamp())
+    if window == "month":
+        return int(midnight.replace(day=1).timestamp()), int(midnight.timestamp())
+    if window.endswith("d") and window[:-1].isdigit():
+        days = min(max(int(window[:-1]), 1), MAX_WINDOW_DAYS)
+        return int((midnight - datetime.timedelta(days=days - 1)).timestamp()), int(midnight.timestamp())
+    raise ValueError(f"Unknown window: {window}")
+
+def unique_visitors(bounds=None):
+    # Merge the per-day sketches covering bounds (inclusive day starts), or read the all-time one
+    if bounds is None:
+        docs = visitor_sketches.find({"_id": TOTAL_ID}, {"registers": 1})
+    else:
+        docs = visitor_sketches.find(
+            {"granularity": "day", "bucket": {"$gte": bounds[0], "$lte": bounds[1]}},
+            {"registers": 1}
+        )
+    merged = HyperLogLog()
+    for doc in docs:
+        merged.merge(HyperLogLog.from_bytes(doc["registers"]))
+    return merged.count()
+
+def top(counter, limit=5):
+    return [{"_id": k, "count": v} for k, v in Counter(counter).most_common(limit)]
+
+if __name__ == "__main__":
+    # python rollups.py backfill
+    if len(sys.argv) >= 2 and sys.argv[1] == "backfill":
+        load_routes()
+        start = time.perf_counter()
+        n = backfill()
+        print(f"Rolled up {n} visitor logs in {time.perf_counter() - start:.1f}s")
+    else:
+        print("Usage: python rollups.py backfill")
@@ -1,12 +1,26 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, send_file, Response, stream_with_context
 from flask_jwt_extended import jwt_required
-from models import contact_messages, portfolio_content, settings, visitor_logs
+from models import contact_messages, portfolio_content, settings, visitor_logs, sms_campaigns, record_deletion
 from extensions import limiter
-from sms_service import sms_service
-import time, datetime
+from sms_service import sms_outbox
+from campaigns import campaigns, prepare as prepare_recipients
+from visitor_ingest import visitor_ingest
+import rollups
+from content_cache import content_cache, conditional_json, public_content, public_settings
+import sections
+import blog
+import search
+import os, time, datetime
 import io
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, Border, Side
+import base64
+from bson import ObjectId
+from bson.errors import InvalidId
+import exporter
+import backup
+import importer
+from images import image_pipeline, NotAnImage
+import media
+from werkzeug.utils import secure_filename
 
 api_bp = Blueprint("api", __name__)
 
@@ -24,7 +38,7 @@ def submit_contact():
     if not all([name, email, phone, reason, message]):
         return jsonify({"error": "All fields are required"}), 400
 
-    msg_id = contact_messages.insert_one({
+    doc = {
         "name": name,
         "email": email,
         "phone": phone,
@@ -32,54 +46,70 @@ def submit_contact():
         "message": message,
         "status": "unread",
         "timestamp": int(time.time())
-    }).inserted_id
+    }
+    doc["updated_at"] = doc["timestamp"]
+    msg_id = contact_messages.insert_one(doc).inserted_id
+    search.safely(search.index_message, doc)
 
     # Send Notification to Admin
     admin_settings = settings.find_one({"type": "admin_credentials"})
     if admin_settings:
         admin_mobile = admin_settings.get("mobile")
         sms_body = f"Portfolio Msg ({reason})\nFrom: {name}\nEmail: {email}\nPhone: {phone}\nMsg: {message[:50]}..."
-        sms_service.send_sms(admin_mobile, sms_body)
+        sms_outbox.enqueue(admin_mobile, sms_body, key=f"contact:{msg_id}")
 
     return jsonify({"message": "Message sent successfully", "id": str(msg_id)}), 200
 
 # Bulk SMS Route
+# Creates a campaign and returns at once; poll /broadcast-message/<id> for progress
 @api_bp.route("/broadcast-message", methods=["POST"])
 @jwt_required()
 def send_bulk_sms():
-    print("Hit /bulk-sms endpoint", flush=True)
+    data = request.get_json() or {}
+    numbers = data.get("numbers") # Expecting a list of strings or comma-separated string
+    message = data.get("message")
+
+    if not numbers or not message:
+        return jsonify({"error": "Numbers and message are required"}), 400
+    if not isinstance(numbers, (list, str)):
+        return jsonify({"error": "numbers must be a list or a comma-separated string"}), 400
+
+    recipients = prepare_recipients(numbers)
+    unique, invalid, duplicates = recipients
+    if not unique:
+        # Nothing is stored, so a rejected broadcast leaves no campaign behind
+        return jsonify({"error": "No valid phone numbers", "invalid": invalid, "duplicates": duplicates}), 400
+
+    campaign_id = campaigns.create(recipients, message)
+    campaign = campaigns.status(campaign_id, failures=0)
+    campaigns.start(campaign_id)
+    print(f"Broadcast campaign {campaign_id}: {campaign['total']} recipients in {campaign['chunks']} chunks", flush=True)
+    return jsonify({"status": "queued", "campaign": campaign}), 202
+
+@api_bp.route("/broadcast-message", methods=["GET"])
+@jwt_required()
+def list_campaigns():
+    recent = []
+    for campaign in sms_campaigns.find({}, {"message": 0}).sort("created_at", -1).limit(20):
+        campaign["_id"] = str(campaign["_id"])
+        recent.append(campaign)
+    return jsonify(recent), 200
+
+@api_bp.route("/broadcast-message/<campaign_id>", methods=["GET"])
+@jwt_required()
+def get_campaign(campaign_id):
     try:
-        data = request.get_json()
-        print(f"Received data: {data}", flush=True)
-        numbers = data.get("numbers") # Expecting a list of strings or comma-separated string
-        message = data.get("message")
-
-        if not numbers or not message:
-            print("Missing numbers or message", flush=True)
-            return jsonify({"error": "Numbers and message are required"}), 400
-
-        # Ensure numbers is a comma-separated string for AakashSMS
-        if isinstance(numbers, list):
-            to_str = ",".join(numbers)
-        else:
-            to_str = numbers
-        
-        print(f"Formatted numbers: {to_str}", flush=True)
-
-        # Send SMS
-        response = sms_service.send_sms(to_str, message)
-        print(f"Service response: {response}", flush=True)
-        
-        return jsonify({"status": "processed", "api_response": response}), 200
-    except Exception as e:
-        print(f"Route Error: {e}", flush=True)
-        return jsonify({"error": str(e)}), 500
+        campaign = campaigns.status(ObjectId(campaign_id))
+    except InvalidId:
+        campaign = None
+    if campaign is None:
+        return jsonify({"error": "Campaign not found"}), 404
+    return jsonify(campaign), 200
 
 # Portfolio Content
 @api_bp.route("/content", methods=["GET"])
 def get_content():
-    content = list(portfolio_content.find({}, {"_id": 0}))
-    return jsonify(content), 200
+    return content_cache.respond("content", public_content)
 
 @api_bp.route("/content", methods=["POST"])
 @jwt_required()
@@ -88,100 +118,287 @@ def update_content():
     section = data.get("section")
     content = data.get("content")
 
-    portfolio_content.update_one(
-        {"section": section},
-        {"$set": {"content": content}},
-        upsert=True
-    )
-    return jsonify({"message": f"Section {section} updated"}), 200
+    # "version" (optional) makes the save conditional on nobody else having saved since
+    try:
+        content, version = sections.replace_section(section, content, data.get("version"))
+    except sections.Conflict as e:
+        return jsonify({"error": "Section was changed by someone else", "current": e.current}), 409
+    except sections.BadRequest as e:
+        return jsonify({"error": str(e)}), 400
+    content_changed(section)
+    return jsonify({"message": f"Section {section} updated", "version": version}), 200
+
+def content_changed(section):
+    content_cache.bump()
+
+# One section; list sections are paginated (?offset=&limit=) and every
+# section supports ?fields=a,b to return only those fields of each item
+@api_bp.route("/content/<section>", methods=["GET"])
+def get_content_section(section):
+    doc = content_cache.section(section)
+    if doc is None:
+        return jsonify({"error": "Section not found"}), 404
+    fields = [f for f in request.args.get("fields", "").split(",") if f]
+    offset = max(request.args.get("offset", 0, type=int), 0)
+    limit = request.args.get("limit", sections.MAX_PAGE_SIZE, type=int)
+    return conditional_json(sections.view(doc, fields, offset, max(limit, 1)))
+
+def item_error(e):
+    if isinstance(e, sections.Conflict):
+        return jsonify({"error": str(e), "current": e.current}), 409
+    if isinstance(e, sections.NotFound):
+        return jsonify({"error": str(e)}), 404
+    return jsonify({"error": str(e)}), 400
+
+@api_bp.route("/content/<section>/items", methods=["POST"])
+@jwt_required()
+def create_content_item(section):
+    data = request.get_json() or {}
+    try:
+        item, version = sections.create_item(section, data.get("item"), data.get("position"))
+    except (sections.NotFound, sections.BadRequest) as e:
+        return item_error(e)
+    content_changed(section)
+    return jsonify({"item": item, "version": version}), 201
+
+# Body: {"version": <item version being edited>, "item": {changed fields}}
+@api_bp.route("/content/<section>/items/<item_id>", methods=["PATCH"])
+@jwt_required()
+def update_content_item(section, item_id):
+    data = request.get_json() or {}
+    if not isinstance(data.get("version"), int):
+        return jsonify({"error": "version is required"}), 400
+    try:
+        item, version = sections.update_item(section, item_id, data.get("item"), data["version"])
+    except (sections.NotFound, sections.Conflict, sections.BadRequest) as e:
+        return item_error(e)
+    content_changed(section)
+    return jsonify({"item": item, "version": version}), 200
+
+@api_bp.route("/content/<section>/items/<item_id>", methods=["DELETE"])
+@jwt_required()
+def delete_content_item(section, item_id):
+    version = request.args.get("version", type=int)
+    if version is None:
+        return jsonify({"error": "version is required"}), 400
+    try:
+        version = sections.delete_item(section, item_id, version)
+    except (sections.NotFound, sections.Conflict) as e:
+        return item_error(e)
+    content_changed(section)
+    return jsonify({"message": "Item deleted", "version": version}), 200
+
+# Blog: summaries in pages (keyset cursor), bodies per post
+@api_bp.route("/blog", methods=["GET"])
+def list_blog_posts():
+    cursor = request.args.get("cursor")
+    limit = request.args.get("limit", blog.PAGE_SIZE, type=int)
+    if not cursor and limit == blog.PAGE_SIZE:
+        # The first page is what every visitor loads; it is also embedded in index.html
+        return content_cache.respond("blog:first", blog.list_summaries)
+    try:
+        return conditional_json(blog.list_summaries(cursor, limit))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@api_bp.route("/blog/<slug>", methods=["GET"])
+def get_blog_post(slug):
+    try:
+        return conditional_json(blog.get_post(slug))
+    except blog.NotFound as e:
+        return jsonify({"error": str(e)}), 404
+
+@api_bp.route("/blog", methods=["POST"])
+@jwt_required()
+def create_blog_post():
+    try:
+        post = blog.create_post(request.get_json() or {})
+    except blog.Conflict as e:
+        return jsonify({"error": str(e)}), 409
+    content_cache.bump()
+    return jsonify(post), 201
+
+# Body: {"version": <version being edited>, ...changed fields}
+@api_bp.route("/blog/<post_id>", methods=["PUT"])
+@jwt_required()
+def update_blog_post(post_id):
+    data = request.get_json() or {}
+    if not isinstance(data.get("version"), int):
+        return jsonify({"error": "version is required"}), 400
+    try:
+        post = blog.update_post(post_id, data, data["version"])
+    except InvalidId:
+        return jsonify({"error": "Invalid post id"}), 400
+    except blog.NotFound as e:
+        return jsonify({"error": str(e)}), 404
+    except blog.Conflict as e:
+        return jsonify({"error": str(e), "current": e.current}), 409
+    content_cache.bump()
+    return jsonify(post), 200
+
+@api_bp.route("/blog/<post_id>", methods=["DELETE"])
+@jwt_required()
+def delete_blog_post(post_id):
+    version = request.args.get("version", type=int)
+    if version is None:
+        return jsonify({"error": "version is required"}), 400
+    try:
+        blog.delete_post(post_id, version)
+    except InvalidId:
+        return jsonify({"error": "Invalid post id"}), 400
+    except blog.NotFound as e:
+        return jsonify({"error": str(e)}), 404
+    except blog.Conflict as e:
+        return jsonify({"error": str(e), "current": e.current}), 409
+    content_cache.bump()
+    return jsonify({"message": "Post deleted"}), 200
 
 # Admin Inbox
+INBOX_PAGE_SIZE = 50
+INBOX_MAX_PAGE_SIZE = 200
+# List views get a short preview instead of the full message body
+INBOX_SUMMARY_FIELDS = {
+    "name": 1, "email": 1, "phone": 1, "reason": 1, "status": 1, "timestamp": 1,
+    "preview": {"$substrCP": ["$message", 0, 120]}
+}
+
+def _encode_cursor(message):
+    raw = f"{message['timestamp']}:{message['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    ts, last_id = raw.split(":", 1)
+    return int(ts), ObjectId(last_id)
+
 @api_bp.route("/inbox", methods=["GET"])
 @jwt_required()
 def get_inbox():
-    messages = list(contact_messages.find().sort("timestamp", -1))
+    # Keyset pagination on (timestamp, _id), newest first.
+    # ?limit=1..200 &cursor=<next_cursor> &status= &reason= &fields=summary|full
+    limit = min(max(request.args.get("limit", INBOX_PAGE_SIZE, type=int), 1), INBOX_MAX_PAGE_SIZE)
+    query = {}
+    for field in ("status", "reason"):
+        if request.args.get(field):
+            query[field] = request.args[field]
+
+    cursor = request.args.get("cursor")
+    if cursor:
+        try:
+            ts, last_id = _decode_cursor(cursor)
+        except (ValueError, InvalidId):
+            return jsonify({"error": "Invalid cursor"}), 400
+        query["$or"] = [
+            {"timestamp": {"$lt": ts}},
+            {"timestamp": ts, "_id": {"$lt": last_id}}
+        ]
+
+    projection = None if request.args.get("fields") == "full" else INBOX_SUMMARY_FIELDS
+    messages = list(
+        contact_messages.find(query, projection)
+        .sort([("timestamp", -1), ("_id", -1)])
+        .limit(limit + 1)
+    )
+    next_cursor = None
+    if len(messages) > limit:
+        messages = messages[:limit]
+        next_cursor = _encode_cursor(messages[-1])
     for m in messages:
         m["_id"] = str(m["_id"])
-    return jsonify(messages), 200
+
+    return jsonify({
+        "messages": messages,
+        "next_cursor": next_cursor,
+        "counts": {
+            "total": contact_messages.estimated_document_count(),
+            "unread": contact_messages.count_documents({"status": "unread"})
+        }
+    }), 200
+
+@api_bp.route("/inbox/<msg_id>", methods=["GET"])
+@jwt_required()
+def get_message(msg_id):
+    try:
+        message = contact_messages.find_one({"_id": ObjectId(msg_id)})
+    except InvalidId:
+        return jsonify({"error": "Invalid message id"}), 400
+    if not message:
+        return jsonify({"error": "Message not found"}), 404
+    message["_id"] = str(message["_id"])
+    return jsonify(message), 200
 
 @api_bp.route("/inbox/<msg_id>", methods=["PATCH"])
 @jwt_required()
 def update_message_status(msg_id):
     from bson import ObjectId
     status = request.get_json().get("status")
-    contact_messages.update_one({"_id": ObjectId(msg_id)}, {"$set": {"status": status}})
+    contact_messages.update_one({"_id": ObjectId(msg_id)}, {"$set": {"status": status, "updated_at": int(time.time())}})
+    search.safely(search.set_message_status, msg_id, status)
     return jsonify({"message": "Status updated"}), 200
 
 @api_bp.route("/inbox/<msg_id>", methods=["DELETE"])
 @jwt_required()
 def delete_message(msg_id):
     from bson import ObjectId
-    contact_messages.delete_one({"_id": ObjectId(msg_id)})
+    if contact_messages.delete_one({"_id": ObjectId(msg_id)}).deleted_count:
+        record_deletion(contact_messages, ObjectId(msg_id))
+    search.safely(search.remove_message, msg_id)
     return jsonify({"message": "Message deleted"}), 200
 
+# Full-text search over inbox messages and blog posts
+@api_bp.route("/search", methods=["GET"])
+@jwt_required()
+def search_content():
+    q = request.args.get("q", "")
+    kind = request.args.get("kind")
+    if kind not in (None, "message", "blog"):
+        return jsonify({"error": "kind must be message or blog"}), 400
+    page = max(request.args.get("page", 1, type=int), 1)
+    limit = min(max(request.args.get("limit", 20, type=int), 1), 100)
+    prefix = request.args.get("prefix", "false").lower() in ("1", "true", "yes")
+    return jsonify(search.search(q, kind=kind, prefix=prefix, page=page, limit=limit)), 200
+
+EXPORT_FORMATS = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson"
+}
+
 @api_bp.route("/export-messages", methods=["GET"])
 @jwt_required()
 def export_messages():
+    # ?format=xlsx|csv|ndjson &from=YYYY-MM-DD &to=YYYY-MM-DD &status= &reason=
+    fmt = request.args.get("format", "xlsx")
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": "format must be xlsx, csv or ndjson"}), 400
     try:
-        # Fetch all messages
-        messages = list(contact_messages.find().sort("timestamp", -1))
-        
-        # Create a workbook and select the active worksheet
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Contact Messages"
-        
-        # Set page setup for A4
-        ws.page_setup.paperSize = 9 # A4
-        ws.page_setup.orientation = 'landscape'
-        ws.page_setup.fitToWidth = 1
-        
-        # Define headers
-        headers = ["Date", "Name", "Email", "Phone", "Reason", "Message", "Status"]
-        ws.append(headers)
-        
-        # Style headers
-        for cell in ws[1]:
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-            cell.border = Border(bottom=Side(style="thin"))
-        
-        # Add data
-        for msg in messages:
-            ws.append([
-                datetime.datetime.fromtimestamp(msg.get("timestamp", 0)).strftime("%Y-%m-%d %H:%M:%S"),
-                msg.get("name", ""),
-                msg.get("email", ""),
-                msg.get("phone", ""),
-                msg.get("reason", ""),
-                msg.get("message", ""),
-                msg.get("status", "unread")
-            ])
-        
-        # Auto-adjust column widths
-        for col in ws.columns:
-            max_length = 0
-            column = col[0].column_letter # Get the column name
-            for cell in col:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = (max_length + 2)
-            ws.column_dimensions[column].width = min(adjusted_width, 50) # Cap width at 50
-
-        # Save to BytesIO buffer
-        buffer = io.BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-        
-        return send_file(
-            buffer,
-            as_attachment=True,
-            download_name=f"contact_messages_{datetime.datetime.now().strftime('%Y%m%d')}.xlsx",
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        query = exporter.build_query(
+            request.args.get("from"), request.args.get("to"),
+            request.args.get("status"), request.args.get("reason")
         )
+    except ValueError:
+        return jsonify({"error": "Dates must be YYYY-MM-DD"}), 400
+
+    mimetype = EXPORT_FORMATS[fmt]
+    download_name = f"contact_messages_{datetime.datetime.now().strftime('%Y%m%d')}.{fmt}"
+    headers = {"Content-Disposition": f"attachment; filename={download_name}"}
+    try:
+        if fmt == "csv":
+            body = exporter.stream_csv(query)
+        elif fmt == "ndjson":
+            body = exporter.stream_ndjson(query)
+        else:
+            path = exporter.xlsx_file(query)
+            try:
+                headers["Content-Length"] = str(os.path.getsize(path))
+                response = Response(exporter.stream_file(path), mimetype=mimetype, headers=headers)
+            except Exception:
+                exporter.remove_file(path)
+                raise
+            # Runs when the response is closed, even if the body was never read (HEAD, client gone)
+            response.call_on_close(lambda: exporter.remove_file(path))
+            return response
+        return Response(stream_with_context(body), mimetype=mimetype, headers=headers)
     except Exception as e:
         print(f"Export Error: {e}", flush=True)
         return jsonify({"error": str(e)}), 500
@@ -196,8 +413,7 @@ def get_settings():
 # Public version for non-sensitive data
 @api_bp.route("/settings_public", methods=["GET"])
 def get_settings_public():
-    admin = settings.find_one({"type": "admin_credentials"}, {"_id": 0, "password": 0, "mobile": 0})
-    return jsonify(admin), 200
+    return content_cache.respond("settings_public", public_settings)
 
 @api_bp.route("/settings", methods=["POST"])
 @jwt_required()
@@ -215,112 +431,196 @@ def update_settings():
     
     if not update_fields:
         return jsonify({"error": "No fields to update"}), 400
+    update_fields["updated_at"] = int(time.time())
 
     settings.update_one(
         {"type": "admin_credentials"},
         {"$set": update_fields}
     )
+    content_cache.bump()
     return jsonify({"message": "Settings updated", "updated_fields": update_fields}), 200
 
 # File Upload Route
 @api_bp.route("/upload", methods=["POST"])
 @jwt_required()
 def upload_file():
-    print("Upload Endpoint Hit", flush=True)
     if 'file' not in request.files:
         return jsonify({"error": "No file part"}), 400
     file = request.files['file']
     if file.filename == '':
         return jsonify({"error": "No selected file"}), 400
-    
-    if file:
-        # Create uploads directory if not exists
-        upload_folder = os.path.join(os.getcwd(), 'static', 'uploads')
-        if not os.path.exists(upload_folder):
-            os.makedirs(upload_folder)
-            
-        filename = secure_filename(file.filename)
-        # Add timestamp to prevent overwrite
-        timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-        new_filename = f"{timestamp}_{filename}"
-        
-        file.save(os.path.join(upload_folder, new_filename))
-        
-        # Return the URL - use environment variable for production or localhost for dev
-        base_url = os.getenv("BASE_URL", "http://localhost:5000")
-        file_url = f"{base_url}/static/uploads/{new_filename}"
-        return jsonify({"url": file_url}), 200
+
+    # Hash while spooling to disk; the same bytes uploaded again reuse the earlier result
+    spooled = media.spool(file.stream)
+    digest = spooled.close()
+    try:
+        manifest = media.known_upload(digest)
+        if manifest is not None:
+            return jsonify(manifest), 200
+
+        names = []
+        def save(name, body):
+            names.append(media.store_bytes(body, name.rsplit(".", 1)[-1]))
+            return media.media_url(names[-1])
+
+        with open(spooled.path, "rb") as f:
+            data = f.read()
+        try:
+            manifest = image_pipeline.process(data, digest[:12], save)
+        except NotAnImage:
+            # SVGs and other files Pillow can't decode are stored as uploaded
+            ext = os.path.splitext(secure_filename(file.filename))[1].lstrip(".").lower()
+            if not media.NAME_PATTERN.match(f"{digest}.{ext}"):
+                ext = "bin"
+            names.append(media.commit(spooled, ext))
+            manifest = {"url": media.media_url(names[-1])}
+        media.record_upload(digest, manifest, names)
+        return jsonify(manifest), 200
+    finally:
+        spooled.discard()
+
+# Uploaded files are content-addressed, so their URLs can be cached forever
+@api_bp.route("/media/<name>", methods=["GET"])
+@limiter.exempt
+def serve_media(name):
+    match = media.NAME_PATTERN.match(name)
+    if not match or not os.path.exists(media.path_for(name)):
+        return jsonify({"error": "Not found"}), 404
+    response = send_file(media.path_for(name), etag=match.group(1), max_age=31536000, conditional=True)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    return response
+
+@api_bp.route("/media/gc", methods=["POST"])
+@jwt_required()
+def collect_media():
+    return jsonify(media.gc(dry_run=request.args.get("dry_run") == "1")), 200
 
 # Client Content Routes
 @api_bp.route("/backup", methods=["GET"])
 @jwt_required()
 def backup_data():
-    # Fetch all data from collections
-    data = {
-        "portfolio_content": list(portfolio_content.find({}, {"_id": 0})),
-        "settings": list(settings.find({}, {"_id": 0, "password": 0})),
-        "contact_messages": list(contact_messages.find({}, {"_id": 0}))
-    }
-    return jsonify(data), 200
+    # gzip-compressed NDJSON archive streamed from batched cursors.
+    # ?mode=delta exports only what changed since the last backup.
+    mode = request.args.get("mode", "full")
+    if mode not in ("full", "delta"):
+        return jsonify({"error": "mode must be full or delta"}), 400
+    try:
+        stream = backup.delta_backup_stream() if mode == "delta" else backup.full_backup_stream()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+    return Response(
+        stream_with_context(stream),
+        mimetype="application/gzip",
+        headers={"Content-Disposition": f"attachment; filename={backup.archive_name(mode)}"}
+    )
+
+# Bulk import of a backup archive or NDJSON (?collection= for plain NDJSON).
+# The body is read as a stream, so the 16 MB upload cap is raised for this route only.
+@api_bp.route("/import", methods=["POST"])
+@jwt_required()
+def import_data():
+    request.max_content_length = int(os.getenv("IMPORT_MAX_BYTES", str(1024 * 1024 * 1024)))
+    collection = request.args.get("collection")
+    if collection is not None and collection not in importer.VALIDATORS:
+        return jsonify({"error": f"collection must be one of {', '.join(importer.VALIDATORS)}"}), 400
+
+    def progress(p):
+        print(f"Import [{p['collection']}] chunk {p['chunk']}: {p['processed']} processed, {p['errors']} errors", flush=True)
+
+    try:
+        result = importer.import_stream(
+            io.BufferedReader(request.stream),
+            collection,
+            importer.BulkImporter(progress=progress)
+        )
+    except backup.ArchiveError as e:
+        return jsonify({"error": str(e)}), 400
+    content_cache.bump()
+    return jsonify(result), 200
 
 # Stronger Analytics (Aggregated)
 @api_bp.route("/analytics", methods=["GET"])
 @jwt_required()
 def get_analytics():
+    # Unique-visitor window: ?window=today|7d|30d|month|all or ?from=YYYY-MM-DD&to=YYYY-MM-DD
+    try:
+        bounds = rollups.window_bounds(request.args.get("window"), request.args.get("from"), request.args.get("to"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     # 1. Recent Logs (last 20)
     recent_logs = list(visitor_logs.find().sort("timestamp", -1).limit(20))
     for log in recent_logs:
         log["_id"] = str(log["_id"])
 
-    # 2. Daily Counts (Last 7 Days)
-    now = datetime.datetime.now()
-    daily_counts = []
-    for i in range(7):
-        date = now - datetime.timedelta(days=6-i)
-        start_ts = int(date.replace(hour=0, minute=0, second=0, microsecond=0).timestamp())
-        end_ts = int(date.replace(hour=23, minute=59, second=59).timestamp())
-        
-        count = visitor_logs.count_documents({
-            "timestamp": {"$gte": start_ts, "$lte": end_ts}
-        })
-        daily_counts.append({"date": date.strftime("%a"), "count": count})
-
-    # 3. Top Countries
-    pipeline = [
-        {"$match": {"country": {"$exists": True}}},
-        {"$group": {"_id": "$country", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}},
-        {"$limit": 5}
+    # 2. Daily Counts (Last 7 Days) from the daily rollups
+    days = min(max(request.args.get("days", 7, type=int), 1), 90)
+    daily_counts = [
+        {"date": date.strftime("%a" if days <= 7 else "%b %d"), "count": bucket["views"]}
+        for date, bucket in rollups.daily(days)
     ]
-    top_countries = list(visitor_logs.aggregate(pipeline))
+
+    # 3. Top Countries / Paths from the all-time rollup
+    totals = rollups.totals()
+    top_countries = rollups.top(totals["countries"])
+    top_paths = rollups.top(totals["paths"])
 
     # 4. Total Stats
-    total_views = visitor_logs.count_documents({})
-    unique_visitors = len(visitor_logs.distinct("ip"))
+    total_views = totals["views"]
+    # Unique visitors from merged per-day HyperLogLog sketches
+    unique_visitors = rollups.unique_visitors(bounds)
 
     return jsonify({
         "recent": recent_logs,
         "daily": daily_counts,
         "top_countries": top_countries,
+        "top_paths": top_paths,
         "stats": {
             "total_views": total_views,
-            "unique_visitors": unique_visitors
+            "unique_visitors": unique_visitors,
+            # What the count covers: from/to take precedence over window, as in window_bounds
+            "unique_window": "custom" if request.args.get("from") or request.args.get("to") else request.args.get("window") or "all",
+            "unique_from": rollups.day(bounds[0]) if bounds else None,
+            "unique_to": rollups.day(bounds[1]) if bounds else None
         }
     }), 200
 
+@api_bp.route("/ingest-stats", methods=["GET"])
+@jwt_required()
+def get_ingest_stats():
+    return jsonify(visitor_ingest.stats()), 200
+
+# Delivery status of queued SMS (contact notifications, OTPs)
+@api_bp.route("/sms-outbox", methods=["GET"])
+@jwt_required()
+def get_sms_outbox():
+    query = {}
+    if request.args.get("status"):
+        query["status"] = request.args.get("status")
+    limit = min(request.args.get("limit", 50, type=int), 200)
+    fields = {"text": 0, "response": 0}
+    messages = []
+    for msg in sms_outbox.collection.find(query, fields).sort("created_at", -1).limit(limit):
+        msg["_id"] = str(msg["_id"])
+        if msg.get("sensitive"):
+            msg["key"] = "otp"
+        messages.append(msg)
+    return jsonify({"counts": sms_outbox.stats(), "messages": messages}), 200
+
 @api_bp.route("/dashboard-stats", methods=["GET"])
 @jwt_required()
 def get_dashboard_stats():
     # Fetch Counts
-    total_views = visitor_logs.count_documents({})
+    total_views = rollups.totals()["views"]
     
     # Portfolio projects count
     portfolio_data = portfolio_content.find_one({"section": "portfolio"})
     total_projects = len(portfolio_data.get("content", [])) if portfolio_data else 0
 
     # Blog posts count
-    blog_data = portfolio_content.find_one({"section": "blog"})
-    total_blogs = len(blog_data.get("content", [])) if blog_data else 0
+    total_blogs = blog.count()
 
     return jsonify({
         "total_views": total_views,
@@ -0,0 +1,279 @@
+import re
+import sys
+import math
+import time
+from hashlib import sha1
+from collections import Counter
+from pymongo import UpdateOne, DeleteMany
+
+from models import contact_messages, blog_posts, search_postings, search_docs
+
+# Inverted index over inbox messages and blog posts, stored in Mongo so every
+# worker sees the same index.
+#
+#   search_postings: {"term", "doc", "kind", "tf"}        one per (term, document)
+#   search_docs:     {"_id": "<kind>:<id>", "kind", "ref", "title", "snippet",
+#                     "length", "hash", ...}                display data + doc length
+#   search_docs "__stats__": {"docs", "length"}            corpus size for BM25
+#
+# Documents are (re)indexed by the write routes; queries are BM25-ranked, AND
+# across terms, with optional prefix matching. A prefix expands to at most
+# MAX_PREFIX_TERMS index terms (the response says when it was cut); the
+# postings of an exact term are never truncated.
+
+STATS_ID = "__stats__"
+MAX_PREFIX_TERMS = 50
+K1 = 1.2
+B = 0.75
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it",
+    "of", "on", "or", "the", "to", "was", "with", "this", "that", "i", "you"
+}
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+def tokenize(text):
+    return [t for t in _TOKEN_RE.findall(str(text or "").lower()) if t not in STOPWORDS]
+
+def strip_html(text):
+    return _TAG_RE.sub(" ", str(text or ""))
+
+def _weighted_terms(fields):
+    # fields: [(text, weight)] -> Counter(term -> weighted tf), plain length
+    tf = Counter()
+    length = 0
+    for text, weight in fields:
+        tokens = tokenize(text)
+        length += len(tokens)
+        for token in tokens:
+            tf[token] += weight
+    return tf, length
+
+def _index(doc_id, kind, fields, display, extra_terms=()):
+    tf, length = _weighted_terms(fields)
+    for term in extra_terms:
+        tf[term] += 1
+    content_hash = sha1(repr(sorted(tf.items())).encode("utf-8")).hexdigest()
+    previous = search_docs.find_one({"_id": doc_id}, {"length": 1, "hash": 1})
+
+    if previous and previous.get("hash") == content_hash:
+        # Only display fields changed (e.g. status)
+        search_docs.update_one({"_id": doc_id}, {"$set": display})
+        return
+
+    ops = [DeleteMany({"doc": doc_id})] if previous else []
+    ops += [
+        UpdateOne({"term": term, "doc": doc_id}, {"$set": {"kind": kind, "tf": count}}, upsert=True)
+        for term, count in tf.items()
+    ]
+    if ops:
+        search_postings.bulk_write(ops, ordered=True)
+    search_docs.update_one(
+        {"_id": doc_id},
+        {"$set": {"kind": kind, "length": length, "hash": content_hash, **display}},
+        upsert=True
+    )
+    delta_docs = 0 if previous else 1
+    delta_len = length - (previous.get("length", 0) if previous else 0)
+    search_docs.update_one({"_id": STATS_ID}, {"$inc": {"docs": delta_docs, "length": delta_len}}, upsert=True)
+
+def _remove(doc_id):
+    previous = search_docs.find_one_and_delete({"_id": doc_id}, {"length": 1})
+    if previous:
+        search_postings.delete_many({"doc": doc_id})
+        search_docs.update_one({"_id": STATS_ID}, {"$inc": {"docs": -1, "length": -previous.get("length", 0)}})
+
+# --- Indexing hooks ---
+
+def index_message(message):
+    msg_id = str(message["_id"])
+    email = str(message.get("email") or "").lower()
+    _index(
+        f"message:{msg_id}",
+        "message",
+        [
+            (message.get("name"), 3),
+            (email, 2),
+            (message.get("reason"), 2),
+            (message.get("message"), 1)
+        ],
+        {
+            "ref": msg_id,
+            "title": message.get("name"),
+            "subtitle": message.get("email"),
+            "snippet": str(message.get("message") or "")[:160],
+            "status": message.get("status", "unread"),
+            "timestamp": message.get("timestamp")
+        },
+        extra_terms=[email] if email else ()
+    )
+
+def set_message_status(msg_id, status):
+    search_docs.update_one({"_id": f"message:{msg_id}"}, {"$set": {"status": status}})
+
+def remove_message(msg_id):
+    _remove(f"message:{msg_id}")
+
+def index_post(post_id, post):
+    body = strip_html(post.get("content"))
+    _index(
+        f"blog:{post_id}",
+        "blog",
+        [(post.get("title"), 3), (post.get("category"), 2), (body, 1)],
+        {
+            "ref": post.get("slug"),
+            "title": post.get("title"),
+            "subtitle": post.get("category"),
+            "snippet": " ".join(body.split())[:160],
+            "date": post.get("date")
+        }
+    )
+
+def remove_post(post_id):
+    _remove(f"blog:{post_id}")
+
+def remove_legacy_blog():
+    # Entries from when posts were keyed by their position in the blog section
+    for doc in search_docs.find({"kind": "blog", "ref": {"$type": "int"}}, {"_id": 1}):
+        _remove(doc["_id"])
+
+def clear(kind):
+    # Drops every entry of one kind, for a restore that empties the collection behind it
+    removed = list(search_docs.aggregate([
+        {"$match": {"kind": kind}},
+        {"$group": {"_id": None, "docs": {"$sum": 1}, "length": {"$sum": "$length"}}}
+    ]))
+    search_postings.delete_many({"doc": {"$regex": f"^{kind}:"}})
+    search_docs.delete_many({"kind": kind})
+    if removed:
+        search_docs.update_one({"_id": STATS_ID}, {"$inc": {"docs": -removed[0]["docs"], "length": -removed[0]["length"]}})
+
+def safely(hook, *args):
+    # Search indexing must never fail the write it follows
+    try:
+        hook(*args)
+    except Exception as e:
+        print(f"Search index error: {e}", flush=True)
+
+# --- Queries ---
+
+def _expand(token, prefix, kind):
+    # Index terms a query token stands for, and whether a prefix matched more than MAX_PREFIX_TERMS of them
+    if not prefix:
+        return [token], False
+    query = {"term": {"$regex": "^" + re.escape(token)}}
+    if kind:
+        query["kind"] = kind
+    # An anchored regex still walks the term index as a range scan; shortest (closest) terms are kept
+    terms = sorted(search_postings.distinct("term", query), key=lambda t: (len(t), t))
+    return terms[:MAX_PREFIX_TERMS], len(terms) > MAX_PREFIX_TERMS
+
+def _document_frequency(term, kind):
+    query = {"term": term}
+    if kind:
+        query["kind"] = kind
+    return search_postings.count_documents(query)
+
+def _postings(term, kind, docs=None):
+    # {doc: tf}, every posting of the term or only those for `docs`
+    query = {"term": term}
+    if kind:
+        query["kind"] = kind
+    if docs is not None:
+        query["doc"] = {"$in": list(docs)}
+    return {p["doc"]: p["tf"] for p in search_postings.find(query, {"_id": 0, "doc": 1, "tf": 1})}
+
+def _no_results(page, limit, truncated=False):
+    return {"results": [], "total": 0, "page": page, "limit": limit, "truncated": truncated}
+
+def search(q, kind=None, prefix=False, page=1, limit=20):
+    # "truncated" is true when a prefix matched more than MAX_PREFIX_TERMS terms and only the shortest were used
+    tokens = tokenize(q)
+    if not tokens:
+        return _no_results(page, limit)
+
+    stats = search_docs.find_one({"_id": STATS_ID}) or {}
+    n_docs = max(stats.get("docs", 0), 1)
+    avg_len = max(stats.get("length", 0) / n_docs, 1.0)
+
+    groups = []
+    truncated = False
+    for i, token in enumerate(tokens):
+        # The last token is always prefix-matched so partial words still find results
+        terms, capped = _expand(token, prefix or i == len(tokens) - 1, kind)
+        truncated = truncated or capped
+        groups.append([(term, _document_frequency(term, kind)) for term in terms])
+
+    # AND across query tokens, rarest first: once the first token has narrowed the
+    # candidates, common terms only fetch their postings for those documents
+    groups.sort(key=lambda group: sum(df for _, df in group))
+    candidates = None
+    matched = []  # [(document frequency, {doc: tf})]
+    for group in groups:
+        docs = set()
+        for term, df in group:
+            if not df:
+                continue
+            postings = _postings(term, kind, candidates)
+            matched.append((df, postings))
+            docs.update(postings)
+        candidates = docs
+        if not candidates:
+            return _no_results(page, limit, truncated)
+
+    lengths = {
+        d["_id"]: d.get("length", 0)
+        for d in search_docs.find({"_id": {"$in": list(candidates)}}, {"length": 1})
+    }
+    scores = Counter()
+    for df, postings in matched:
+        idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        for doc_id, tf in postings.items():
+            if doc_id not in candidates:
+                continue
+            norm = K1 * (1 - B + B * lengths.get(doc_id, avg_len) / avg_len)
+            scores[doc_id] += idf * tf * (K1 + 1) / (tf + norm)
+
+    ranked = scores.most_common()
+    start = (page - 1) * limit
+    page_ids = [doc_id for doc_id, _ in ranked[start:start + limit]]
+    docs = {
+        d["_id"]: d
+        for d in search_docs.find({"_id": {"$in": page_ids}}, {"length": 0, "hash": 0})
+    }
+    results = []
+    for doc_id in page_ids:
+        if doc_id in docs:
+            doc = docs[doc_id]
+            doc["id"] = doc.pop("_id")
+            doc["score"] = round(scores[doc_id], 4)
+            results.append(doc)
+    return {"results": results, "total": len(ranked), "page": page, "limit": limit, "truncated": truncated}
+
+def rebuild():
+    search_postings.delete_many({})
+    search_docs.delete_many({})
+    count = 0
+    for message in contact_messages.find().batch_size(1000):
+        index_message(message)
+        count += 1
+    posts = 0
+    for post in blog_posts.find().batch_size(1000):
+        index_post(str(post["_id"]), post)
+        posts += 1
+    return count, posts
+
+if __name__ == "__main__":
+    # python search.py rebuild
+    # python search.py query <text>
+    if len(sys.argv) >= 2 and sys.argv[1] == "rebuild":
+        start = time.perf_counter()
+        messages, posts = rebuild()
+        print(f"Indexed {messages} messages and {posts} blog posts in {time.perf_counter() - start:.1f}s")
+    elif len(sys.argv) >= 3 and sys.argv[1] == "query":
+        for r in search(" ".join(sys.argv[2:]))["results"]:
+            print(r["score"], r["id"], r.get("title"))
+    else:
+        print("Usage: python search.py rebuild | query <text>")
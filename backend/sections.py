@@ -0,0 +1,175 @@
+import time
+from bson import ObjectId
+from pymongo import ReturnDocument
+from models import portfolio_content
+
+# Section and item-level access to portfolio_content.
+# Sections whose content is a list (portfolio, clients, testimonials)
+# hold items with a stable "id" and a per-item "version"; each section also
+# carries a "version". Item writes use positional updates ($push, content.$
+# and $pull), so a change only sends and rewrites that item, and a write
+# naming a stale version is refused with a Conflict instead of overwriting a
+# concurrent edit.
+
+MAX_PAGE_SIZE = 100
+# Sections whose items moved to their own collection
+RETIRED_SECTIONS = {"blog": "Blog posts are managed through /api/blog"}
+# Fields the server owns on every item
+ITEM_META = ("id", "version")
+
+class NotFound(Exception):
+    pass
+
+class Conflict(Exception):
+    def __init__(self, current):
+        super().__init__("Item was changed by someone else")
+        self.current = current
+
+class BadRequest(Exception):
+    pass
+
+def new_item_id():
+    return str(ObjectId())
+
+def stamp_items(content, previous=None):
+    # Gives list items an id and version; items whose fields are unchanged keep their version
+    if not isinstance(content, list):
+        return content
+    known = {i.get("id"): i for i in (previous or []) if isinstance(i, dict) and i.get("id")}
+    for item in content:
+        if not isinstance(item, dict):
+            continue
+        old = known.get(item.get("id"))
+        if old is None:
+            item["id"] = item.get("id") or new_item_id()
+            item["version"] = 1
+        elif {k: v for k, v in item.items() if k not in ITEM_META} != {k: v for k, v in old.items() if k not in ITEM_META}:
+            item["version"] = old.get("version", 1) + 1
+        else:
+            item["version"] = old.get("version", 1)
+    return content
+
+def assign_item_ids():
+    # One-off upgrade of list sections stored before items had ids
+    for doc in portfolio_content.find({"content": {"$type": "array"}}, {"section": 1, "content": 1, "version": 1}):
+        if all(isinstance(i, dict) and i.get("id") for i in doc["content"] if isinstance(i, dict)):
+            continue
+        portfolio_content.update_one(
+            {"_id": doc["_id"], "version": doc.get("version")},
+            {"$set": {"content": stamp_items(doc["content"]), "version": doc.get("version") or 1}}
+        )
+
+def _clean_fields(fields):
+    if not isinstance(fields, dict):
+        raise BadRequest("Item must be an object")
+    for key in fields:
+        if not isinstance(key, str) or not key or "." in key or key.startswith("$"):
+            raise BadRequest(f"Invalid field name: {key!r}")
+    return {k: v for k, v in fields.items() if k not in ITEM_META}
+
+def _project(value, fields):
+    if fields and isinstance(value, dict):
+        return {k: value[k] for k in fields if k in value}
+    return value
+
+def view(doc, fields=None, offset=0, limit=None):
+    # Response body for GET /content/<section>: a page of items for list sections
+    content = doc.get("content")
+    body = {"section": doc["section"], "version": doc.get("version", 0)}
+    if isinstance(content, list):
+        limit = min(limit or MAX_PAGE_SIZE, MAX_PAGE_SIZE)
+        if fields:
+            fields = list(fields) + [f for f in ITEM_META if f not in fields]
+        body["total"] = len(content)
+        body["offset"] = offset
+        body["items"] = [_project(item, fields) for item in content[offset:offset + limit]]
+    else:
+        body["content"] = _project(content, fields)
+    return body
+
+def _touch():
+    return {"updated_at": int(time.time())}
+
+def _list_section(section):
+    if section in RETIRED_SECTIONS:
+        raise BadRequest(RETIRED_SECTIONS[section])
+    if portfolio_content.find_one({"section": section, "content": {"$type": "array"}}, {"_id": 1}) is None:
+        raise NotFound(f"Section {section} is not a list section")
+
+def _current_item(section, item_id):
+    doc = portfolio_content.find_one({"section": section, "content.id": item_id}, {"content": {"$elemMatch": {"id": item_id}}})
+    if doc is None:
+        raise NotFound("Item not found")
+    return doc["content"][0]
+
+def create_item(section, fields, position=None):
+    _list_section(section)
+    item = {**_clean_fields(fields), "id": new_item_id(), "version": 1}
+    push = {"$each": [item]}
+    if position is not None:
+        # Index to insert at; negative counts from the end, as with $position
+        try:
+            position = int(position)
+        except (TypeError, ValueError):
+            raise BadRequest("position must be an integer")
+        if abs(position) > 2 ** 31 - 1:
+            raise BadRequest("position is out of range")
+        push["$position"] = position
+    doc = portfolio_content.find_one_and_update(
+        {"section": section},
+        {"$push": {"content": push}, "$inc": {"version": 1}, "$set": _touch()},
+        projection={"version": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    return item, doc["version"]
+
+def update_item(section, item_id, fields, version):
+    # Merge fields into one item if it is still at `version`
+    changes = _clean_fields(fields)
+    update = {"$inc": {"content.$.version": 1, "version": 1}, "$set": _touch()}
+    for key, value in changes.items():
+        update["$set"][f"content.$.{key}"] = value
+    doc = portfolio_content.find_one_and_update(
+        {"section": section, "content": {"$elemMatch": {"id": item_id, "version": version}}},
+        update,
+        projection={"content": {"$elemMatch": {"id": item_id}}, "version": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if doc is None:
+        raise Conflict(_current_item(section, item_id))
+    return doc["content"][0], doc["version"]
+
+def delete_item(section, item_id, version):
+    doc = portfolio_content.find_one_and_update(
+        {"section": section, "content": {"$elemMatch": {"id": item_id, "version": version}}},
+        {"$pull": {"content": {"id": item_id}}, "$inc": {"version": 1}, "$set": _touch()},
+        projection={"version": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if doc is None:
+        raise Conflict(_current_item(section, item_id))
+    return doc["version"]
+
+def replace_section(section, content, version=None, attempts=3):
+    # Whole-section save; with `version` it only applies if nobody saved in between
+    if section in RETIRED_SECTIONS:
+        raise BadRequest(RETIRED_SECTIONS[section])
+    for _ in range(attempts):
+        previous = portfolio_content.find_one({"section": section}, {"content": 1, "version": 1})
+        if version is not None and previous is not None and previous.get("version", 0) != version:
+            raise Conflict({"version": previous.get("version", 0)})
+        stamped = stamp_items(content, previous.get("content") if previous else None)
+        query = {"section": section}
+        if previous is not None:
+            # Item versions were derived from `previous`, so it must still be current
+            query["version"] = previous.get("version")
+        doc = portfolio_content.find_one_and_update(
+            query,
+            {"$set": {"content": stamped, **_touch()}, "$inc": {"version": 1}},
+            projection={"version": 1},
+            upsert=previous is None,
+            return_document=ReturnDocument.AFTER
+        )
+        if doc is not None:
+            return stamped, doc["version"]
+    raise Conflict({"version": None})
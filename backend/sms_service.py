@@ -1,30 +1,281 @@
 import os
-import requests
+import time
+import atexit
+import datetime
+import threading
+from pymongo import ReturnDocument
+from metrics import metrics
+from pymongo.errors import DuplicateKeyError
+
+class SMSDeliveryError(Exception):
+    def __init__(self, message, retryable=True, response=None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.response = response
 
 class AakashSMS:
     def __init__(self):
         self.token = os.getenv("AAKASH_SMS_TOKEN")
         self.base_url = "https://sms.aakashsms.com/sms/v3/send"
+        self._session = None
+        self.timeout = (3, 10)
 
-    def send_sms(self, to, message):
+    @property
+    def session(self):
+        # One pooled keep-alive session per process instead of a new connection per SMS;
+        # built (and requests imported) on the first send rather than at worker boot
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=int(os.getenv("SMS_POOL_SIZE", "10")))
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._session = session
+        return self._session
+
+    def deliver(self, to, message):
+        # Raises SMSDeliveryError; retryable unless the gateway rejected the request outright
         if not self.token:
             print(f"SMS Simulation to {to}: {message}")
             return {"status": "simulated", "message": message}
-        
+
         payload = {
             "auth_token": self.token,
             "to": to,
             "text": message
         }
-        print(f"Sending SMS to {to} with payload: {payload}", flush=True)
+        import requests
+        print(f"Sending SMS to {to}", flush=True)
         try:
             # Added verify=False to avoid SSL issues in local dev environments
-            response = requests.post(self.base_url, data=payload, verify=False, timeout=10)
-            print(f"AakashSMS Response Status: {response.status_code}", flush=True)
-            print(f"AakashSMS Response Body: {response.text}", flush=True)
-            return response.json()
-        except Exception as e:
+            with metrics.outbound("aakash_sms"):
+                response = self.session.post(self.base_url, data=payload, verify=False, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise SMSDeliveryError(str(e))
+        print(f"AakashSMS Response Status: {response.status_code}", flush=True)
+        try:
+            body = response.json()
+        except ValueError:
+            body = {"status_code": response.status_code, "text": response.text[:500]}
+        if response.status_code >= 500 or response.status_code == 429:
+            raise SMSDeliveryError(f"Gateway returned {response.status_code}", response=body)
+        if not response.ok or (isinstance(body, dict) and body.get("error")):
+            raise SMSDeliveryError(f"Gateway rejected message ({response.status_code})", retryable=False, response=body)
+        return body
+
+    def send_sms(self, to, message):
+        try:
+            return self.deliver(to, message)
+        except SMSDeliveryError as e:
             print(f"SMS Sending Error: {e}", flush=True)
+            return e.response or {"status": "error", "message": str(e)}
+
+class FakeSMSGateway:
+    # Local stand-in for tests and development (SMS_GATEWAY=fake).
+    # Records every delivery and can be told to fail the next N attempts.
+    def __init__(self, fail_next=0, latency=0.0):
+        self.sent = []
+        self.fail_next = fail_next
+        self.latency = latency
+        self._lock = threading.Lock()
+
+    def deliver(self, to, message):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            if self.fail_next > 0:
+                self.fail_next -= 1
+                raise SMSDeliveryError("Fake gateway failure")
+            self.sent.append({"to": to, "text": message, "at": time.time()})
+        return {"status": "fake", "to": to}
+
+    def send_sms(self, to, message):
+        try:
+            return self.deliver(to, message)
+        except SMSDeliveryError as e:
             return {"status": "error", "message": str(e)}
 
-sms_service = AakashSMS()
+# --- Outbox ---
+# HTTP handlers only enqueue; a dispatcher thread in each worker claims due
+# messages atomically, delivers them through the pooled gateway and records
+# the outcome. Messages survive restarts because the outbox lives in Mongo.
+#
+#   {"key", "to", "text", "status": pending|sending|sent|failed|expired,
+#    "attempts", "next_attempt_at", "locked_until", "expires_at" (optional),
+#    "sensitive" (optional), "created_at", "updated_at", "last_error",
+#    "response", "purge_at"}
+#
+# Finished jobs get a purge_at date and are removed by its TTL index after
+# SMS_OUTBOX_RETENTION_DAYS. Sensitive jobs (one-time codes) lose their text
+# as soon as they finish, and must not carry secrets in their key.
+
+TERMINAL = ("sent", "failed", "expired")
+RETENTION = float(os.getenv("SMS_OUTBOX_RETENTION_DAYS", "30")) * 86400
+MAX_ATTEMPTS = int(os.getenv("SMS_MAX_ATTEMPTS", "5"))
+BACKOFF_BASE = float(os.getenv("SMS_BACKOFF_BASE", "5"))
+BACKOFF_MAX = 15 * 60
+LOCK_SECONDS = 60
+
+def _purge_date(now):
+    # TTL indexes only act on BSON dates
+    return datetime.datetime.fromtimestamp(now + RETENTION, datetime.timezone.utc)
+
+def backoff(attempts):
+    return min(BACKOFF_BASE * (2 ** (attempts - 1)), BACKOFF_MAX)
+
+class SMSOutbox:
+    def __init__(self, gateway, poll_interval=2.0):
+        self.gateway = gateway
+        self.poll_interval = poll_interval
+        self._reset()
+        atexit.register(self.stop)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pid = os.getpid()
+
+    @property
+    def collection(self):
+        from models import sms_outbox
+        return sms_outbox
+
+    def enqueue(self, to, text, key=None, sensitive=False, **extra):
+        # Returns the outbox id; an existing key is treated as already queued
+        now = time.time()
+        doc = {
+            "to": to,
+            "text": text,
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "locked_until": 0,
+            "created_at": now,
+            "updated_at": now,
+            **extra
+        }
+        if key:
+            doc["key"] = key
+        if sensitive:
+            doc["sensitive"] = True
+        try:
+            outbox_id = self.collection.insert_one(doc).inserted_id
+        except DuplicateKeyError:
+            existing = self.collection.find_one({"key": key}, {"_id": 1})
+            return existing["_id"] if existing else None
+        self._ensure_worker()
+        self._wake.set()
+        return outbox_id
+
+    def _claim(self):
+        now = time.time()
+        return self.collection.find_one_and_update(
+            {
+                "status": {"$in": ["pending", "sending"]},
+                "next_attempt_at": {"$lte": now},
+                "locked_until": {"$lte": now}
+            },
+            {"$set": {"status": "sending", "locked_until": now + LOCK_SECONDS}, "$inc": {"attempts": 1}},
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _finish(self, job, fields):
+        now = time.time()
+        fields["updated_at"] = now
+        update = {"$set": fields}
+        if fields.get("status") in TERMINAL:
+            fields["purge_at"] = _purge_date(now)
+            if job.get("sensitive"):
+                update["$unset"] = {"text": ""}
+        self.collection.update_one({"_id": job["_id"]}, update)
+
+    def scrub(self):
+        # Brings jobs queued before purge_at and "sensitive" existed in line (run by the bootstrap)
+        self.collection.update_many({"key": {"$regex": "^otp:"}}, {"$set": {"sensitive": True}, "$unset": {"key": ""}})
+        self.collection.update_many({"sensitive": True, "status": {"$in": list(TERMINAL)}}, {"$unset": {"text": ""}})
+        self.collection.update_many(
+            {"status": {"$in": list(TERMINAL)}, "purge_at": {"$exists": False}},
+            {"$set": {"purge_at": _purge_date(time.time())}}
+        )
+
+    def process(self, job):
+        if job.get("expires_at") and time.time() > job["expires_at"]:
+            # e.g. an OTP that is no longer valid; delivering it late is pointless
+            self._finish(job, {"status": "expired"})
+            return False
+        try:
+            response = self.gateway.deliver(job["to"], job["text"])
+        except SMSDeliveryError as e:
+            if e.retryable and job["attempts"] < MAX_ATTEMPTS:
+                self._finish(job, {
+                    "status": "pending",
+                    "locked_until": 0,
+                    "next_attempt_at": time.time() + backoff(job["attempts"]),
+                    "last_error": str(e)
+                })
+            else:
+                self._finish(job, {"status": "failed", "last_error": str(e), "response": e.response})
+            return False
+        except Exception as e:
+            # Unexpected errors are retried like transient gateway failures
+            self._finish(job, {
+                "status": "pending" if job["attempts"] < MAX_ATTEMPTS else "failed",
+                "locked_until": 0,
+                "next_attempt_at": time.time() + backoff(job["attempts"]),
+                "last_error": str(e)
+            })
+            return False
+        self._finish(job, {"status": "sent", "response": response, "sent_at": time.time()})
+        return True
+
+    def drain(self, limit=None):
+        # Deliver everything currently due in the calling thread; returns how many were attempted
+        done = 0
+        while limit is None or done < limit:
+            job = self._claim()
+            if job is None:
+                break
+            self.process(job)
+            done += 1
+        return done
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.drain()
+            except Exception as e:
+                print(f"SMS dispatcher error: {e}", flush=True)
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _ensure_worker(self):
+        if self._pid != os.getpid():
+            self._reset()
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="sms-dispatcher", daemon=True)
+            self._thread.start()
+
+    def start(self):
+        self._ensure_worker()
+
+    def stop(self, timeout=5.0):
+        if self._pid != os.getpid():
+            return
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def stats(self):
+        counts = {s: 0 for s in ("pending", "sending", "sent", "failed", "expired")}
+        for row in self.collection.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+            counts[row["_id"]] = row["count"]
+        return counts
+
+sms_service = FakeSMSGateway() if os.getenv("SMS_GATEWAY") == "fake" else AakashSMS()
+sms_outbox = SMSOutbox(sms_service, poll_interval=float(os.getenv("SMS_POLL_INTERVAL", "2")))
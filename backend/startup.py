@@ -0,0 +1,169 @@
+import os
+import sys
+import time
+import uuid
+import hashlib
+import subprocess
+from contextlib import contextmanager
+
+# Worker boot bookkeeping.
+# app.py times its startup phases here and logs one summary line per worker.
+# The database bootstrap (seed documents, indexes, one-off data migrations)
+# is idempotent but costs several round trips, so it runs once per
+# deployment: the revision that last completed it is recorded in `settings`
+# and later workers only read that one document. On a new revision the
+# workers, which boot in parallel, race to claim it atomically; the winner
+# holds a lease while it runs the steps and the others wait (at most
+# STARTUP_BOOTSTRAP_WAIT seconds) for it to finish. A claim whose lease ran
+# out, e.g. because the worker died, can be taken over. STARTUP_BOOTSTRAP=always
+# runs it on every boot, STARTUP_BOOTSTRAP=skip never (for deployments that
+# run `python startup.py bootstrap` as a release step).
+
+BOOTSTRAP_TYPE = "db_bootstrap"
+BOOTSTRAP_MODE = os.getenv("STARTUP_BOOTSTRAP", "auto")
+BOOTSTRAP_LEASE = int(os.getenv("STARTUP_BOOTSTRAP_LEASE", "300"))
+BOOTSTRAP_WAIT = float(os.getenv("STARTUP_BOOTSTRAP_WAIT", "20"))
+BOOTSTRAP_POLL = 0.25
+# Modules whose code decides what the bootstrap does; editing one starts a new revision
+BOOTSTRAP_SOURCES = ("models.py", "sections.py", "blog.py", "auth.py", "sms_service.py", "startup.py")
+
+PHASES = []
+_started = time.perf_counter()
+
+@contextmanager
+def phase(name):
+    began = time.perf_counter()
+    try:
+        yield
+    finally:
+        PHASES.append((name, time.perf_counter() - began))
+
+def revision():
+    # DEPLOY_REVISION (e.g. the git sha) when the platform provides one, else a hash of the bootstrap code
+    if os.getenv("DEPLOY_REVISION"):
+        return os.getenv("DEPLOY_REVISION")
+    digest = hashlib.sha1()
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in BOOTSTRAP_SOURCES:
+        with open(os.path.join(here, name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+def bootstrap_steps():
+    from models import init_db, ensure_indexes
+    from auth import init_admin
+    import sections
+    import blog
+    from sms_service import sms_outbox
+    return [
+        ("seed", init_db),
+        ("indexes", ensure_indexes),
+        ("item ids", sections.assign_item_ids),
+        ("blog migration", blog.migrate_from_section),
+        ("admin", init_admin),
+        ("sms outbox", sms_outbox.scrub)
+    ]
+
+def _claim(settings, current):
+    # Owner token if this worker took the bootstrap of `current`; None while another worker holds it or once it is done
+    from pymongo.errors import DuplicateKeyError
+    from models import INDEXES
+    # The claim relies on the unique `type` index, which a fresh database does not have yet
+    settings.create_indexes(INDEXES[settings])
+    owner = uuid.uuid4().hex
+    now = int(time.time())
+    try:
+        settings.find_one_and_update(
+            {"type": BOOTSTRAP_TYPE, "$or": [
+                {"revision": {"$ne": current}},
+                {"state": "running", "lease_until": {"$lt": now}}
+            ]},
+            {"$set": {"revision": current, "state": "running", "owner": owner, "lease_until": now + BOOTSTRAP_LEASE}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # No claimable record, and inserting one collided with the record that blocks it
+        return None
+    return owner
+
+def _run_steps(settings, current, owner):
+    mine = {"owner": owner} if owner else {}
+    try:
+        for name, step in bootstrap_steps():
+            with phase(f"bootstrap {name}"):
+                step()
+    except BaseException:
+        if owner:
+            # Let the next worker take over instead of waiting out the lease
+            settings.update_one({"type": BOOTSTRAP_TYPE, **mine}, {"$set": {"lease_until": 0}})
+        raise
+    settings.update_one(
+        {"type": BOOTSTRAP_TYPE, **mine},
+        {"$set": {"revision": current, "state": "done", "completed_at": int(time.time())}, "$unset": {"owner": "", "lease_until": ""}},
+        upsert=not owner
+    )
+
+def bootstrap_database(force=False):
+    # True if the steps ran in this worker, False if this revision was (or is being) bootstrapped elsewhere
+    from models import settings
+    if BOOTSTRAP_MODE == "skip" and not force:
+        return False
+    current = revision()
+    if BOOTSTRAP_MODE == "always" or force:
+        _run_steps(settings, current, None)
+        return True
+    deadline = time.monotonic() + BOOTSTRAP_WAIT
+    while True:
+        done = settings.find_one({"type": BOOTSTRAP_TYPE}, {"_id": 0, "revision": 1, "state": 1})
+        if done and done.get("revision") == current and done.get("state") != "running":
+            return False
+        owner = _claim(settings, current)
+        if owner:
+            _run_steps(settings, current, owner)
+            return True
+        if time.monotonic() >= deadline:
+            print(f"Database bootstrap of {current} is still running in another worker; starting without it", flush=True)
+            return False
+        time.sleep(BOOTSTRAP_POLL)
+
+def summary():
+    total = time.perf_counter() - _started
+    parts = ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in PHASES)
+    return f"Worker {os.getpid()} started in {total * 1000:.0f}ms ({parts})"
+
+def import_profile(module="app", top=25):
+    # [(cumulative µs, self µs, module)] from `python -X importtime -c "import app"`, slowest first
+    env = {**os.environ, "STARTUP_BOOTSTRAP": "skip"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env, capture_output=True, text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), int(own), name.rstrip()))
+    rows.sort(reverse=True)
+    return rows[:top], result.returncode
+
+if __name__ == "__main__":
+    # python startup.py profile [N] | bootstrap
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "profile":
+        rows, code = import_profile(top=int(sys.argv[2]) if len(sys.argv) > 2 else 25)
+        if code != 0:
+            print("Importing app failed; run `python -c 'import app'` to see why")
+            sys.exit(1)
+        print(f"{'cumulative':>12} {'self':>10}  module")
+        for cumulative, own, name in rows:
+            print(f"{cumulative / 1000:>10.1f}ms {own / 1000:>8.1f}ms  {name}")
+    elif command == "bootstrap":
+        os.environ["STARTUP_BOOTSTRAP"] = "skip"
+        from app import app
+        with app.app_context():
+            bootstrap_database(force=True)
+        print(summary())
+    else:
+        print("Usage: python startup.py profile [N] | bootstrap")
+        sys.exit(2)
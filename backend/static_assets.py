@@ -0,0 +1,179 @@
+import os
+import re
+import sys
+import gzip
+import hashlib
+import tempfile
+import mimetypes
+from flask import Response, request, send_file
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip variants are always built
+    brotli = None
+
+# Manifest-backed serving of the built frontend (static/dist).
+# The dist directory is walked once at startup: every file's headers, ETag
+# and body are computed up front, along with gzip (and brotli, if installed)
+# variants for compressible types, so a request is a dict lookup with no
+# filesystem access. Vite's content-hashed files under assets/ are cached
+# for a year as immutable; everything else, index.html included, is
+# revalidated with its ETag.
+
+DIST_DIR = os.path.join(os.path.dirname(__file__), "static", "dist")
+# Larger files (videos, big images) are streamed from disk instead of held in memory
+MAX_MEMORY_FILE = int(os.getenv("STATIC_MAX_MEMORY_FILE", str(2 * 1024 * 1024)))
+MIN_COMPRESS_SIZE = 1024
+COMPRESSIBLE = re.compile(r"^(text/|application/(javascript|json|xml|manifest\+json)|image/svg\+xml)")
+HASHED_ASSET = re.compile(r"^assets/.+-[A-Za-z0-9_-]{8,}\.[a-z0-9]+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+# Preferred first when the client accepts several
+ENCODINGS = ["br", "gzip"]
+# _save's temp files, e.g. index.js.gz.k3j2x9.tmp
+TEMP_VARIANT = re.compile(r"\.(gz|br)\.[^.]+\.tmp$")
+
+class Asset:
+    __slots__ = ("path", "mimetype", "etag", "cache_control", "bodies", "size")
+
+    def __init__(self, path, mimetype, etag, cache_control, bodies, size):
+        self.path = path
+        self.mimetype = mimetype
+        self.etag = etag
+        self.cache_control = cache_control
+        # {encoding or None: bytes}; empty when the file is served from disk
+        self.bodies = bodies
+        self.size = size
+
+def _fresh(full, ext):
+    return os.path.exists(full + ext) and os.path.getmtime(full + ext) >= os.path.getmtime(full)
+
+def _save(path, body):
+    # Keeps a compressed variant next to its file so later worker boots read it instead of
+    # compressing again; skipped when dist is read-only. Each worker writes its own temp file,
+    # so a concurrent boot never swaps in a file another worker is still writing
+    try:
+        fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=os.path.dirname(path))
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(body)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+def _variants(full, data, mimetype):
+    bodies = {None: data}
+    if len(data) < MIN_COMPRESS_SIZE or not COMPRESSIBLE.match(mimetype):
+        return bodies
+    # Prefer variants precompressed by the build (or by an earlier boot), if there are any
+    for encoding, ext, compress in (
+        ("gzip", ".gz", lambda d: gzip.compress(d, 9, mtime=0)),
+        ("br", ".br", brotli.compress if brotli else None)
+    ):
+        if full and _fresh(full, ext):
+            with open(full + ext, "rb") as f:
+                body = f.read()
+        elif compress:
+            body = compress(data)
+            if full:
+                _save(full + ext, body)
+        else:
+            continue
+        if len(body) < len(data):
+            bodies[encoding] = body
+    return bodies
+
+def memory_asset(data, mimetype, cache_control=REVALIDATE):
+    # Asset for a generated body (e.g. the rendered index.html), with compressed variants
+    etag = hashlib.sha1(data).hexdigest()[:20]
+    return Asset(None, mimetype, etag, cache_control, _variants(None, data, mimetype), len(data))
+
+class StaticManifest:
+    def __init__(self, dist_dir=DIST_DIR):
+        self.dist_dir = dist_dir
+        self.assets = {}
+        self.index = None
+        # Optional callable(index asset) -> asset used in place of the plain index.html
+        self.index_renderer = None
+        self.build()
+
+    def build(self):
+        assets = {}
+        for root, _, files in os.walk(self.dist_dir):
+            for name in files:
+                if name.endswith((".gz", ".br")) and os.path.exists(os.path.join(root, name[:-3])):
+                    continue
+                if TEMP_VARIANT.search(name):
+                    # A variant another worker is writing (or a crashed boot left behind)
+                    continue
+                full = os.path.join(root, name)
+                rel = os.path.relpath(full, self.dist_dir).replace(os.sep, "/")
+                mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                size = os.path.getsize(full)
+                cache_control = IMMUTABLE if HASHED_ASSET.match(rel) else REVALIDATE
+                if size > MAX_MEMORY_FILE:
+                    digest = hashlib.sha1()
+                    with open(full, "rb") as f:
+                        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                            digest.update(chunk)
+                    assets[rel] = Asset(full, mimetype, digest.hexdigest()[:20], cache_control, {}, size)
+                    continue
+                with open(full, "rb") as f:
+                    data = f.read()
+                etag = hashlib.sha1(data).hexdigest()[:20]
+                assets[rel] = Asset(full, mimetype, etag, cache_control, _variants(full, data, mimetype), size)
+        self.assets = assets
+        self.index = assets.get("index.html")
+        return self
+
+    def stats(self):
+        raw = sum(a.size for a in self.assets.values())
+        compressed = {e: sum(len(a.bodies[e]) for a in self.assets.values() if e in a.bodies) for e in ENCODINGS}
+        return {"files": len(self.assets), "bytes": raw, "compressed_bytes": compressed, "brotli": brotli is not None}
+
+    def _encoding(self, asset):
+        for encoding in ENCODINGS:
+            if encoding in asset.bodies and request.accept_encodings[encoding] > 0:
+                return encoding
+        return None
+
+    def respond(self, asset):
+        if not asset.bodies:
+            response = send_file(asset.path, mimetype=asset.mimetype, etag=asset.etag, conditional=True)
+            response.headers["Cache-Control"] = asset.cache_control
+            return response
+        encoding = self._encoding(asset)
+        response = Response(asset.bodies[encoding], mimetype=asset.mimetype)
+        response.set_etag(f"{asset.etag}-{encoding}" if encoding else asset.etag)
+        response.headers["Cache-Control"] = asset.cache_control
+        if len(asset.bodies) > 1:
+            response.headers["Vary"] = "Accept-Encoding"
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        return response.make_conditional(request)
+
+    def serve(self, path):
+        # None when there is nothing to serve (frontend not built)
+        asset = self.assets.get(path) if path else None
+        if asset is None:
+            # Missing hashed assets 404 rather than getting index.html under a JS/CSS URL
+            if path.startswith("assets/"):
+                return Response("Not found", status=404)
+            asset = self.index
+        if asset is None:
+            return None
+        if asset is self.index and self.index_renderer:
+            asset = self.index_renderer(asset)
+        return self.respond(asset)
+
+static_files = StaticManifest()
+
+if __name__ == "__main__":
+    # python static_assets.py - prints what the manifest holds for static/dist
+    print(StaticManifest(sys.argv[1] if len(sys.argv) > 1 else DIST_DIR).stats())
@@ -0,0 +1,18 @@
+import os
+import sys
+import tempfile
+
+# Unit tests for the modules that work without a MongoDB server:
+#   pip install pytest && python -m pytest tests   (from backend/)
+# MongoClient only connects on first use, so importing models and the modules
+# built on it is fine as long as no test touches a collection.
+
+_scratch = tempfile.mkdtemp(prefix="portfolio-tests-")
+os.environ["MONGO_URI"] = "mongodb://localhost:27017/"
+os.environ["MONGO_DB_NAME"] = "portfolio_test"
+os.environ["RATELIMIT_SHM_PATH"] = os.path.join(_scratch, "ratelimit.bin")
+os.environ["PASSWORD_HASH_SLOT_PATH"] = os.path.join(_scratch, "bcrypt-slots")
+os.environ["METRICS_DIR"] = os.path.join(_scratch, "metrics")
+os.environ.setdefault("JWT_SECRET_KEY", "test-" + "x" * 40)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,31 @@
+import pytest
+from bson import ObjectId
+import blog
+
+def test_slugify():
+    assert blog.slugify("Hello, World!") == "hello-world"
+    assert blog.slugify("Café déjà vu") == "cafe-deja-vu"
+    assert blog.slugify("!!!") == "post"
+    assert len(blog.slugify("x" * 200)) == 80
+
+def test_summary_and_reading_time():
+    fields = blog.derived_fields({"content": "<p>" + "word " * 450 + "</p>", "date": "2024-03-01"})
+    assert fields["reading_time"] == 3
+    assert fields["summary"].endswith("…")
+    assert len(fields["summary"]) <= blog.SUMMARY_LENGTH + 1
+    assert fields["published_at"] == blog.parse_date("Mar 01, 2024")
+
+def test_parse_date_fallback():
+    assert blog.parse_date("not a date", 123) == 123
+    assert blog.parse_date("01 March 2024") == blog.parse_date("2024-03-01")
+
+def test_plain_text_decodes_entities():
+    assert blog.plain_text("<b>Tom&nbsp;&amp;&nbsp;Jerry</b>") == "Tom & Jerry"
+
+def test_cursor_round_trip():
+    post = {"published_at": 1700000000, "_id": ObjectId()}
+    assert blog.decode_cursor(blog.encode_cursor(post)) == (post["published_at"], post["_id"])
+
+def test_bad_cursor_is_rejected_before_querying():
+    with pytest.raises(ValueError):
+        blog.list_summaries("not-a-cursor")
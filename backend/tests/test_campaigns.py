@@ -0,0 +1,13 @@
+import campaigns
+
+def test_normalize():
+    assert campaigns.normalize("+977 981-234-5678") == "9812345678"
+    assert campaigns.normalize("09812345678") == "9812345678"
+    assert campaigns.normalize("12345") is None
+    assert campaigns.normalize("1812345678") is None
+
+def test_prepare_counts_invalid_and_duplicates():
+    unique, invalid, duplicates = campaigns.prepare("9812345678, 9812345678,abc,+9779800000000")
+    assert unique == ["9812345678", "9800000000"]
+    assert (invalid, duplicates) == (1, 1)
+    assert campaigns.prepare([]) == ([], 0, 0)
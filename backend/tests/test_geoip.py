@@ -0,0 +1,28 @@
+import ipaddress
+from geoip import GeoIndex, LRUCache
+
+CSV = """start,end,country,city,lat,lon
+1.0.0.0,1.0.0.255,AU,Sydney,-33.8,151.2
+8.8.8.0,8.8.8.255,US,Mountain View,37.4,-122.1
+2001:db8::,2001:db8::ffff,NP,Kathmandu,27.7,85.3
+"""
+
+def test_lookup_and_compiled_index(tmp_path):
+    source = tmp_path / "ranges.csv"
+    source.write_text(CSV)
+    index = GeoIndex.from_csv(str(source))
+    assert len(index) == 3
+    assert index.find(ipaddress.ip_address("8.8.8.8"))[:2] == ("US", "Mountain View")
+    assert index.find(ipaddress.ip_address("2001:db8::1"))[0] == "NP"
+    assert index.find(ipaddress.ip_address("9.9.9.9")) is None
+    compiled = tmp_path / "ranges.idx"
+    index.save(str(compiled))
+    assert GeoIndex.load(str(compiled)).find(ipaddress.ip_address("1.0.0.7"))[0] == "AU"
+
+def test_lru_cache_evicts_least_recent():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
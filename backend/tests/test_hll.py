@@ -0,0 +1,28 @@
+import pytest
+from hll import HyperLogLog
+
+def test_estimate_is_within_error():
+    sketch = HyperLogLog().update(f"10.0.{i // 256}.{i % 256}" for i in range(50_000))
+    assert abs(sketch.count() - 50_000) / 50_000 < 0.05
+
+def test_small_counts_are_exact_enough():
+    assert HyperLogLog().update(["a", "b", "c", "a"]).count() == 3
+    assert HyperLogLog().count() == 0
+
+def test_merge_is_union():
+    a = HyperLogLog().update(range(0, 6000))
+    b = HyperLogLog().update(range(4000, 10_000))
+    both = HyperLogLog().update(range(0, 10_000))
+    assert a.merge(b).to_bytes() == both.to_bytes()
+
+def test_bytes_round_trip():
+    sketch = HyperLogLog(p=10).update(range(1000))
+    copy = HyperLogLog.from_bytes(sketch.to_bytes())
+    assert copy.p == 10
+    assert copy.count() == sketch.count()
+
+def test_precision_mismatch():
+    with pytest.raises(ValueError):
+        HyperLogLog(p=10).merge(HyperLogLog(p=12))
+    with pytest.raises(ValueError):
+        HyperLogLog(p=3)
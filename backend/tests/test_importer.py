@@ -0,0 +1,53 @@
+import pytest
+from bson import ObjectId
+from pymongo import InsertOne, UpdateOne, DeleteOne
+import importer
+
+def test_post_without_derived_fields_is_completed():
+    doc = {"slug": "a", "title": "t", "content": "<p>hi</p>", "date": "2024-01-01"}
+    importer.VALIDATORS["blog_posts"](doc)
+    assert isinstance(doc["published_at"], int)
+    assert doc["summary"] == "hi"
+
+def test_missing_fields_are_invalid():
+    with pytest.raises(importer.ValidationError):
+        importer.VALIDATORS["contact_messages"]({"name": "n", "email": "e"})
+    with pytest.raises(importer.ValidationError):
+        importer.VALIDATORS["visitor_logs"]({"ip": "1.1.1.1", "timestamp": "soon"})
+
+def test_invalid_lines_are_counted_not_raised():
+    imp = importer.BulkImporter()
+    imp.add_doc("blog_posts", {"slug": "a"}, line=1)
+    imp.add_doc("nope", {}, line=2)
+    assert imp.stats["invalid"] == 2
+    assert [e["line"] for e in imp.error_samples] == [1, 2]
+
+def test_posts_are_keyed_on_id():
+    post_id = ObjectId()
+    op = importer.write_op("blog_posts", {"_id": post_id, "slug": "old-slug", "title": "t"})
+    assert isinstance(op, UpdateOne)
+    assert op._filter == {"_id": post_id}
+    assert importer.write_op("blog_posts", {"slug": "s", "title": "t"})._filter == {"slug": "s"}
+
+def test_natural_keys_and_protected_fields():
+    op = importer.write_op("settings", {"_id": ObjectId(), "type": "admin_credentials", "password": "x", "mobile": "98"})
+    assert op._filter == {"type": "admin_credentials"}
+    assert "password" not in op._doc["$set"]
+    assert isinstance(importer.write_op("visitor_logs", {"ip": "1.1.1.1"}), InsertOne)
+
+def test_derived_lookup_matches_written_docs():
+    post_id = ObjectId()
+    entries = [
+        (importer.write_op("blog_posts", {"_id": post_id, "slug": "a", "title": "t"}), {"_id": post_id, "slug": "a"}),
+        (importer.write_op("blog_posts", {"slug": "b", "title": "t"}), {"slug": "b", "title": "t"}),
+        (DeleteOne({"_id": 1}), {"_id": 1})
+    ]
+    assert importer._lookup(entries) == {"$or": [{"_id": {"$in": [post_id]}}, {"slug": {"$in": ["b"]}}]}
+    assert importer._lookup(entries[2:]) is None
+
+def test_docs_without_a_key_get_an_id_up_front():
+    imp = importer.BulkImporter(derived=False)
+    imp.add_doc("visitor_logs", {"ip": "1.1.1.1", "timestamp": 1})
+    (op, doc), = imp.pending["visitor_logs"]
+    assert isinstance(doc["_id"], ObjectId)
+    assert op._filter == {"_id": doc["_id"]}
@@ -0,0 +1,38 @@
+import json
+import threading
+from metrics import Metrics, Registry, BUCKETS, _dump
+
+def test_registry_sums_thread_shards():
+    registry = Registry()
+    def work():
+        for _ in range(1000):
+            registry.inc("http_requests_total", route="/", method="GET", status="200")
+        registry.observe("http_request_duration_seconds", 0.003, route="/", method="GET")
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    snapshot = registry.snapshot()
+    assert snapshot[("http_requests_total", (("route", "/"), ("method", "GET"), ("status", "200")))] == 4000
+    histogram = snapshot[("http_request_duration_seconds", (("route", "/"), ("method", "GET")))]
+    assert histogram[BUCKETS.index(0.005)] == 4
+    assert abs(histogram[-1] - 0.012) < 1e-9
+
+def test_collect_merges_workers_and_retires_dead_ones(tmp_path):
+    metrics = Metrics(directory=str(tmp_path))
+    metrics.inc("outbound_http_requests_total", target="x", outcome="ok")
+    key = ("outbound_http_requests_total", (("target", "x"), ("outcome", "ok")))
+    # A worker that has exited (pid 2**22 + 1 is above the default pid_max)
+    (tmp_path / f"{2 ** 22 + 1}.json").write_text(json.dumps(_dump({key: 5})))
+    assert metrics.collect()[key] == 6
+    assert (tmp_path / "retired.json").exists()
+    assert metrics.collect()[key] == 6
+
+def test_render_prometheus_text(tmp_path):
+    metrics = Metrics(directory=str(tmp_path))
+    metrics.observe("mongodb_command_duration_seconds", 0.02, collection="c", command="find")
+    text = metrics.render()
+    assert "# TYPE mongodb_command_duration_seconds histogram" in text
+    assert 'mongodb_command_duration_seconds_bucket{collection="c",command="find",le="+Inf"} 1' in text
+    assert 'mongodb_command_duration_seconds_count{collection="c",command="find"} 1' in text
@@ -0,0 +1,50 @@
+import time
+import threading
+import pytest
+from passwords import PasswordHasher, HostSlots, HasherBusy, cost, MAX_PASSWORD_BYTES
+
+@pytest.fixture
+def hasher(tmp_path):
+    return PasswordHasher(rounds=4, workers=1, slots=1, queue_timeout=0.5, slot_path=str(tmp_path / "slots"))
+
+def test_hash_and_check(hasher):
+    stored = hasher.hash("correct horse")
+    assert cost(stored) == 4
+    assert hasher.check(stored, "correct horse")
+    assert not hasher.check(stored, "wrong")
+    assert not hasher.check("not-a-bcrypt-hash", "correct horse")
+    assert not hasher.check(stored, None)
+
+def test_password_length_limits(hasher):
+    with pytest.raises(ValueError):
+        hasher.hash("")
+    with pytest.raises(ValueError):
+        hasher.hash("x" * (MAX_PASSWORD_BYTES + 1))
+    assert not hasher.check(hasher.hash("x"), "x" * (MAX_PASSWORD_BYTES + 1))
+
+def test_needs_rehash(hasher):
+    assert hasher.needs_rehash("$2b$12$" + "a" * 53)
+    assert not hasher.needs_rehash(hasher.hash("pw"))
+
+def test_slots_are_exclusive(tmp_path):
+    slots = HostSlots(1, str(tmp_path / "slots"))
+    held = slots.acquire(time.monotonic() + 1)
+    with pytest.raises(HasherBusy):
+        slots.acquire(time.monotonic() + 0.05)
+    slots.release(held)
+    slots.release(slots.acquire(time.monotonic() + 1))
+
+def test_busy_instead_of_waiting_in_the_queue(hasher):
+    started = threading.Event()
+    release = threading.Event()
+    def block():
+        started.set()
+        release.wait(5)
+    blocker = hasher.submit(block)
+    started.wait(1)
+    began = time.monotonic()
+    with pytest.raises(HasherBusy):
+        hasher.hash("pw")
+    assert time.monotonic() - began < 1.5
+    release.set()
+    blocker.result()
@@ -0,0 +1,38 @@
+import os
+import time
+from ratelimit_store import SharedMemoryStorage, key_hash
+
+def storage(tmp_path):
+    return SharedMemoryStorage(f"shm://{tmp_path / 'table.bin'}")
+
+def test_counter(tmp_path):
+    store = storage(tmp_path)
+    assert store.incr("k", 60) == 1
+    assert store.incr("k", 60, amount=2) == 3
+    assert store.get("k") == 3
+    assert store.get_expiry("k") > time.time()
+    store.clear("k")
+    assert store.get("k") == 0
+
+def test_sliding_window_limit(tmp_path):
+    store = storage(tmp_path)
+    assert all(store.acquire_sliding_window_entry("login", 5, 60) for _ in range(5))
+    assert not store.acquire_sliding_window_entry("login", 5, 60)
+    assert store.acquire_sliding_window_entry("other", 5, 60)
+    previous, _, current, _ = store.get_sliding_window("login", 60)
+    assert previous + current == 5
+
+def test_counts_are_shared_across_processes(tmp_path):
+    store = storage(tmp_path)
+    store.incr("shared", 60)
+    pid = os.fork()
+    if pid == 0:
+        code = 0 if storage(tmp_path).incr("shared", 60) == 2 else 1
+        os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert store.get("shared") == 2
+
+def test_key_hash_never_zero():
+    assert key_hash("") != 0
+    assert key_hash("a") == key_hash("a")
@@ -0,0 +1,44 @@
+import datetime
+import pytest
+from werkzeug.routing import Map, Rule
+import rollups
+
+NOW = datetime.datetime(2026, 3, 15, 13, 30)
+MIDNIGHT = int(datetime.datetime(2026, 3, 15).timestamp())
+
+def test_named_windows():
+    assert rollups.window_bounds("today", now=NOW) == (MIDNIGHT, MIDNIGHT)
+    start, end = rollups.window_bounds("7d", now=NOW)
+    assert end == MIDNIGHT
+    assert start == int(datetime.datetime(2026, 3, 9).timestamp())
+    assert rollups.window_bounds("month", now=NOW)[0] == int(datetime.datetime(2026, 3, 1).timestamp())
+    assert rollups.window_bounds("all", now=NOW) is None
+
+def test_huge_windows_are_clamped():
+    start, end = rollups.window_bounds("1000000d", now=NOW)
+    oldest = datetime.datetime(2026, 3, 15) - datetime.timedelta(days=rollups.MAX_WINDOW_DAYS - 1)
+    assert (start, end) == (int(oldest.timestamp()), MIDNIGHT)
+
+def test_bad_windows():
+    for window in ("week", "-3d", "d"):
+        with pytest.raises(ValueError):
+            rollups.window_bounds(window, now=NOW)
+    with pytest.raises(ValueError):
+        rollups.window_bounds(None, "2026-13-01", None, now=NOW)
+
+def test_paths_are_counted_per_route(monkeypatch):
+    url_map = Map([Rule("/", endpoint="home"), Rule("/api/blog/<slug>", endpoint="post"), Rule("/<path:path>", endpoint="spa")])
+    monkeypatch.setattr(rollups, "url_map", url_map)
+    rollups.route_of.cache_clear()
+    acc = rollups._Accumulator()
+    ts = int(NOW.timestamp())
+    for path in ("/", "/api/blog/a", "/api/blog/b", "/wp-login.php", "/.env"):
+        acc.add({"timestamp": ts, "path": path, "ip": "1.1.1.1"})
+    acc.add({"timestamp": ts, "path": "/api/blog/c", "route": "/api/blog/<slug>"})
+    paths = acc.buckets[rollups.TOTAL_ID]["paths"]
+    assert dict(paths) == {"/": 1, "/api/blog/<slug>": 3, "other": 2}
+    rollups.route_of.cache_clear()
+
+def test_field_names_are_escaped():
+    assert rollups._unkey(rollups._key("a.b$c")) == "a.b$c"
+    assert "." not in rollups._key("a.b")
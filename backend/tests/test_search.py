@@ -0,0 +1,14 @@
+import search
+
+def test_tokenize_drops_stopwords_and_case():
+    assert search.tokenize("The Flutter app, and THE API!") == ["flutter", "app", "api"]
+    assert search.tokenize(None) == []
+
+def test_strip_html():
+    assert search.tokenize(search.strip_html("<p>Hello <b>world</b></p>")) == ["hello", "world"]
+
+def test_weighted_terms():
+    tf, length = search._weighted_terms([("Flutter", 3), ("flutter widgets", 1)])
+    assert tf["flutter"] == 4
+    assert tf["widgets"] == 1
+    assert length == 3
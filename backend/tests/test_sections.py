@@ -0,0 +1,24 @@
+import pytest
+import sections
+
+def test_stamp_items_versions():
+    first = sections.stamp_items([{"title": "a"}, {"title": "b"}])
+    assert all(item["id"] and item["version"] == 1 for item in first)
+    edited = [dict(first[0], title="A"), dict(first[1])]
+    second = sections.stamp_items(edited, previous=first)
+    assert [item["version"] for item in second] == [2, 1]
+    assert sections.stamp_items({"bio": "x"}) == {"bio": "x"}
+
+def test_clean_fields():
+    assert sections._clean_fields({"title": "t", "id": "x", "version": 9}) == {"title": "t"}
+    for bad in ({"a.b": 1}, {"$set": 1}, {"": 1}, ["title"]):
+        with pytest.raises(sections.BadRequest):
+            sections._clean_fields(bad)
+
+def test_view_pages_list_sections():
+    doc = {"section": "portfolio", "version": 3, "content": [{"id": str(i), "title": f"t{i}", "image": "i", "version": 1} for i in range(5)]}
+    body = sections.view(doc, fields=["title"], offset=1, limit=2)
+    assert body["total"] == 5
+    assert [item["id"] for item in body["items"]] == ["1", "2"]
+    assert "image" not in body["items"][0]
+    assert sections.view({"section": "about", "content": {"bio": "b", "x": 1}}, fields=["bio"])["content"] == {"bio": "b"}
@@ -0,0 +1,197 @@
+import os
+import time
+import atexit
+import threading
+from collections import deque
+from geoip import geoip
+from metrics import metrics
+
+# Write-behind pipeline for visitor_logs.
+# The before_request hook only appends to an in-process buffer; a background
+# thread drains it with batched insert_many(ordered=False) calls.
+
+POLICIES = ("drop_new", "drop_oldest", "block")
+
+def ip_api_geo(batch):
+    # Fallback when no GEOIP_DB dataset is configured.
+    # Resolve countries for a whole batch with ip-api's batch endpoint (100 IPs per call)
+    import requests
+    ips = list({e["ip"] for e in batch if e.get("ip")})
+    geo = {}
+    for i in range(0, len(ips), 100):
+        try:
+            with metrics.outbound("ip_api"):
+                resp = requests.post(
+                    "http://ip-api.com/batch?fields=status,query,country,city,lat,lon",
+                    json=ips[i:i + 100],
+                    timeout=5
+                ).json()
+        except Exception:
+            continue
+        for row in resp:
+            if row.get("status") == "success":
+                geo[row["query"]] = {
+                    "country": row.get("country"),
+                    "city": row.get("city"),
+                    "lat": row.get("lat"),
+                    "lon": row.get("lon")
+                }
+    for event in batch:
+        event.update(geo.get(event.get("ip"), {}))
+
+class VisitorIngest:
+    def __init__(self, max_queue=10000, batch_size=500, flush_interval=2.0, policy="drop_new", block_timeout=0.05):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown queue policy: {policy}")
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+        # Callables run on each batch in the worker thread before it is written
+        self.enrichers = []
+        # Callables run on each batch after it has been written
+        self.listeners = []
+        self._reset()
+        atexit.register(self.shutdown)
+        if hasattr(os, "register_at_fork"):
+            # The parent keeps (and flushes) whatever it had buffered; the child starts empty
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._buffer = deque()
+        self._thread = None
+        self._stopping = False
+        self._pid = os.getpid()
+        self.counters = {"queued": 0, "flushed": 0, "dropped": 0, "failed": 0, "batches": 0}
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="visitor-ingest", daemon=True)
+                self._thread.start()
+
+    def submit(self, event):
+        if self._pid != os.getpid():
+            self._reset()
+        self._ensure_worker()
+        with self._lock:
+            if len(self._buffer) >= self.max_queue:
+                if self.policy == "drop_oldest":
+                    self._buffer.popleft()
+                    self.counters["dropped"] += 1
+                elif self.policy == "block":
+                    if not self._not_full.wait_for(lambda: len(self._buffer) < self.max_queue, self.block_timeout):
+                        self.counters["dropped"] += 1
+                        return False
+                else:
+                    self.counters["dropped"] += 1
+                    return False
+            self._buffer.append(event)
+            self.counters["queued"] += 1
+            if len(self._buffer) >= self.batch_size:
+                self._not_empty.notify()
+        return True
+
+    def _take(self, limit):
+        batch = []
+        while self._buffer and len(batch) < limit:
+            batch.append(self._buffer.popleft())
+        if batch:
+            self._not_full.notify_all()
+        return batch
+
+    def _run(self):
+        while True:
+            with self._lock:
+                deadline = time.monotonic() + self.flush_interval
+                while len(self._buffer) < self.batch_size and not self._stopping:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._not_empty.wait(remaining)
+                batch = self._take(self.batch_size)
+                stopping = self._stopping and not self._buffer
+            if batch:
+                self._write(batch)
+            if stopping:
+                return
+
+    def _write(self, batch):
+        for enrich in self.enrichers:
+            try:
+                enrich(batch)
+            except Exception as e:
+                print(f"Visitor enrich error: {e}", flush=True)
+
+        from models import visitor_logs
+        from pymongo.errors import BulkWriteError
+        # Differential backups select logs by when they reached the database (see backup.py)
+        ingested_at = int(time.time())
+        for event in batch:
+            event["ingested_at"] = ingested_at
+        written = []
+        try:
+            visitor_logs.insert_many(batch, ordered=False)
+            written = batch
+        except BulkWriteError as e:
+            failed = {err["index"] for err in e.details.get("writeErrors", [])}
+            written = [event for i, event in enumerate(batch) if i not in failed]
+            print(f"Visitor flush partial failure: {len(failed)} events", flush=True)
+        except Exception as e:
+            print(f"Visitor flush error: {e}", flush=True)
+
+        with self._lock:
+            self.counters["flushed"] += len(written)
+            self.counters["failed"] += len(batch) - len(written)
+            self.counters["batches"] += 1
+
+        if written:
+            for listener in self.listeners:
+                try:
+                    listener(written)
+                except Exception as e:
+                    print(f"Visitor listener error: {e}", flush=True)
+
+    def flush(self):
+        # Synchronously drain everything buffered so far in the calling thread
+        while True:
+            with self._lock:
+                batch = self._take(self.batch_size)
+            if not batch:
+                return
+            self._write(batch)
+
+    def shutdown(self, timeout=5.0):
+        if self._pid != os.getpid():
+            return
+        with self._lock:
+            self._stopping = True
+            self._not_empty.notify_all()
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self.counters,
+                "pending": len(self._buffer),
+                "max_queue": self.max_queue,
+                "policy": self.policy
+            }
+
+visitor_ingest = VisitorIngest(
+    max_queue=int(os.getenv("VISITOR_QUEUE_SIZE", "10000")),
+    batch_size=int(os.getenv("VISITOR_BATCH_SIZE", "500")),
+    flush_interval=float(os.getenv("VISITOR_FLUSH_INTERVAL", "2")),
+    policy=os.getenv("VISITOR_QUEUE_POLICY", "drop_new")
+)
+visitor_ingest.enrichers.append(geoip.enrich if geoip.available else ip_api_geo)
@@ -11,18 +11,19 @@ const PrivateRoute = ({ children }) => {
 };
 
 import { useState, useEffect } from 'react';
-import axios from 'axios';
 import Maintenance from './pages/Maintenance';
-import { getApiUrl } from './config/api';
+import { getBootstrap, loadPublicSettings } from './config/bootstrap';
 
 function App() {
-  const [maintenance, setMaintenance] = useState(false);
-  const [loading, setLoading] = useState(true);
+  const initial = getBootstrap()?.settings;
+  const [maintenance, setMaintenance] = useState(initial?.maintenance_mode || false);
+  const [loading, setLoading] = useState(!initial);
 
   useEffect(() => {
-    axios.get(getApiUrl('settings_public'))
-      .then(res => {
-        setMaintenance(res.data.maintenance_mode);
+    if (initial) return;
+    loadPublicSettings()
+      .then(data => {
+        setMaintenance(data.maintenance_mode);
         setLoading(false);
       })
       .catch((err) => {
@@ -22,9 +22,10 @@ const ImageUpload = ({ initialImage, onUpload, token, label = "Upload Image" })
                     Authorization: `Bearer ${token}`
                 }
             });
-            const url = resp.data.url;
-            setPreview(url);
-            onUpload(url);
+            // Images come back as a manifest of resized variants; other files as a plain url
+            const manifest = resp.data;
+            setPreview(manifest.thumbnail?.url || manifest.url);
+            onUpload(manifest.url, manifest);
         } catch (err) {
             console.error("Upload failed", err);
             alert("Image upload failed");
@@ -1,46 +1,61 @@
 import { useState, useEffect } from 'react';
-import axios from 'axios';
-import { X, Calendar, ArrowRight } from 'lucide-react';
+import { X, Calendar, ArrowRight, Clock } from 'lucide-react';
 import DOMPurify from 'dompurify';
 import { motion, AnimatePresence } from 'framer-motion';
-import { getApiUrl } from '../../config/api';
+import { getBootstrap, loadBlogPage, loadBlogPost } from '../../config/bootstrap';
 
 const sanitizer = DOMPurify.sanitize ? DOMPurify : (DOMPurify.default || DOMPurify);
 
 
+// The list holds summaries only; a post's body is fetched when it is opened
 const BlogTab = () => {
-    const [posts, setPosts] = useState([]);
+    const initial = getBootstrap()?.blog;
+    const [posts, setPosts] = useState(initial?.posts || []);
+    const [nextCursor, setNextCursor] = useState(initial?.next_cursor || null);
+    const [loading, setLoading] = useState(!initial);
     const [selectedPost, setSelectedPost] = useState(null);
 
+    const loadPage = async (cursor) => {
+        setLoading(true);
+        try {
+            const page = await loadBlogPage(cursor);
+            setPosts(prev => cursor ? [...prev, ...page.posts] : page.posts);
+            setNextCursor(page.next_cursor);
+        } catch (err) {
+            console.error("Error fetching blog posts", err);
+        } finally {
+            setLoading(false);
+        }
+    };
+
     useEffect(() => {
-        const fetchPosts = async () => {
-            try {
-                const resp = await axios.get(getApiUrl('content'));
-                const blogData = resp.data.find(item => item.section === 'blog');
-                if (blogData && blogData.content) {
-                    setPosts(blogData.content);
-                }
-            } catch (err) {
-                console.error("Failed to fetch blog posts", err);
-            }
-        };
-        fetchPosts();
+        if (!initial) loadPage(null);
     }, []);
 
+    const openPost = async (post) => {
+        setSelectedPost(post);
+        try {
+            const full = await loadBlogPost(post.slug);
+            setSelectedPost(current => current?.id === post.id ? full : current);
+        } catch (err) {
+            console.error("Error fetching blog post", err);
+        }
+    };
+
     return (
         <>
             <div className="grid md:grid-cols-2 lg:grid-cols-3 gap-8">
                 {posts.length === 0 ? (
-                    <p className="text-gray-500 col-span-full text-center py-10">No blog posts found.</p>
+                    <p className="text-gray-500 col-span-full text-center py-10">{loading ? 'Loading posts...' : 'No blog posts found.'}</p>
                 ) : (
-                    posts.map((post, index) => (
+                    posts.map((post) => (
                         <article
-                            key={index}
+                            key={post.id}
                             className="bg-[#1e1e1f] rounded-3xl border border-gray-800 overflow-hidden shadow-2xl group cursor-pointer hover:border-orange-400/50 transition-colors"
-                            onClick={() => setSelectedPost(post)}
+                            onClick={() => openPost(post)}
                         >
                             <div className="h-48 overflow-hidden relative">
-                                <img src={post.image} alt={post.title} className="w-full h-full object-cover group-hover:scale-110 transition-transform duration-500" />
+                                <img src={post.image} srcSet={post.image_srcset || undefined} sizes="(min-width: 1024px) 33vw, (min-width: 768px) 50vw, 100vw" loading="lazy" alt={post.title} className="w-full h-full object-cover group-hover:scale-110 transition-transform duration-500" />
                                 <div className="absolute inset-0 bg-black/20 group-hover:bg-black/0 transition-colors" />
                             </div>
                             <div className="p-6">
@@ -48,13 +63,14 @@ const BlogTab = () => {
                                     <span className="text-orange-400 font-bold uppercase tracking-wider">{post.category}</span>
                                     <span className="w-1 h-1 bg-gray-500 rounded-full"></span>
                                     <span className="flex items-center gap-1"><Calendar size={12} /> {post.date}</span>
+                                    {post.reading_time && (
+                                        <span className="flex items-center gap-1"><Clock size={12} /> {post.reading_time} min read</span>
+                                    )}
                                 </div>
                                 <h4 className="text-white font-bold text-lg mb-3 leading-tight group-hover:text-orange-400 transition-colors line-clamp-2">
                                     {post.title}
                                 </h4>
-                                <div className="text-gray-400 text-sm line-clamp-3 mb-4"
-                                    dangerouslySetInnerHTML={{ __html: sanitizer.sanitize(post.content || '').substring(0, 150) + '...' }}
-                                />
+                                <p className="text-gray-400 text-sm line-clamp-3 mb-4">{post.summary}</p>
                                 <button className="text-sm font-medium text-white flex items-center gap-2 group/btn">
                                     Read Article <ArrowRight size={16} className="group-hover/btn:translate-x-1 transition-transform" />
                                 </button>
@@ -64,6 +80,18 @@ const BlogTab = () => {
                 )}
             </div>
 
+            {nextCursor && (
+                <div className="flex justify-center mt-8">
+                    <button
+                        onClick={() => loadPage(nextCursor)}
+                        disabled={loading}
+                        className="px-6 py-3 rounded-xl bg-[#2b2b2c] border border-gray-700 text-white text-sm font-medium hover:border-orange-400/50 transition-colors disabled:opacity-50"
+                    >
+                        {loading ? 'Loading...' : 'Load more posts'}
+                    </button>
+                </div>
+            )}
+
             <AnimatePresence>
                 {selectedPost && (
                     <motion.div
@@ -81,7 +109,7 @@ const BlogTab = () => {
                             onClick={e => e.stopPropagation()}
                         >
                             <div className="h-64 sm:h-80 shrink-0 relative">
-                                <img src={selectedPost.image} alt={selectedPost.title} className="w-full h-full object-cover" />
+                                <img src={selectedPost.image} srcSet={selectedPost.image_srcset || undefined} sizes="(min-width: 896px) 896px, 100vw" alt={selectedPost.title} className="w-full h-full object-cover" />
                                 <button
                                     onClick={() => setSelectedPost(null)}
                                     className="absolute top-4 right-4 bg-black/50 hover:bg-black/80 p-2 rounded-full text-white transition-colors"
@@ -105,8 +133,11 @@ const BlogTab = () => {
 
                                     <div
                                         className="prose prose-invert prose-lg max-w-none prose-img:rounded-2xl prose-a:text-orange-400 prose-headings:text-white"
-                                        dangerouslySetInnerHTML={{ __html: sanitizer.sanitize(selectedPost.content) }}
+                                        dangerouslySetInnerHTML={{ __html: sanitizer.sanitize(selectedPost.content ?? '') }}
                                     />
+                                    {selectedPost.content === undefined && (
+                                        <p className="text-gray-500 text-center">Loading article...</p>
+                                    )}
                                 </div>
                             </div>
                         </motion.div>
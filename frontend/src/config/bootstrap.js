@@ -0,0 +1,52 @@
+import axios from 'axios';
+import { getApiUrl } from './api';
+
+// Data the server embeds into index.html (see backend/bootstrap.py), so the
+// first render needs no API round trips. Falls back to the API when absent
+// (e.g. the Vite dev server).
+let bootstrap;
+
+export const getBootstrap = () => {
+    if (bootstrap === undefined) {
+        const el = document.getElementById('bootstrap-data');
+        try {
+            bootstrap = el ? JSON.parse(el.textContent) : null;
+        } catch {
+            bootstrap = null;
+        }
+    }
+    return bootstrap;
+};
+
+export const loadContent = async () => {
+    const data = getBootstrap();
+    if (data) return data.content;
+    return (await axios.get(getApiUrl('content'))).data;
+};
+
+export const loadPublicSettings = async () => {
+    const data = getBootstrap();
+    if (data) return data.settings || {};
+    return (await axios.get(getApiUrl('settings_public'))).data;
+};
+
+// A page of blog summaries ({posts, next_cursor}); the first page is embedded
+export const loadBlogPage = async (cursor) => {
+    const data = getBootstrap();
+    if (!cursor && data?.blog) return data.blog;
+    const params = cursor ? { cursor } : {};
+    return (await axios.get(getApiUrl('blog'), { params })).data;
+};
+
+export const loadBlogPost = async (slug) => {
+    return (await axios.get(getApiUrl(`blog/${encodeURIComponent(slug)}`))).data;
+};
+
+// [{section, content}] -> {section: content}
+export const contentBySection = (list) => {
+    const data = {};
+    (list || []).forEach(item => {
+        data[item.section] = item.content;
+    });
+    return data;
+};
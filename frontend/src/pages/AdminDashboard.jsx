@@ -88,7 +88,7 @@ const QuillEditor = ({ value, onChange, token }) => {
 };
 
 
-const AnalyticsTab = ({ token, messages }) => {
+const AnalyticsTab = ({ token, messageCount }) => {
     const [statsData, setStatsData] = useState({ recent: [], daily: [], top_countries: [], stats: {} });
     const [statsLoading, setStatsLoading] = useState(true);
 
@@ -134,7 +134,7 @@ const AnalyticsTab = ({ token, messages }) => {
                 {[
                     { label: 'Total Views', value: statsData.stats?.total_views || 0, color: 'text-blue-400', icon: Eye },
                     { label: 'Unique Visitors', value: statsData.stats?.unique_visitors || 0, color: 'text-orange-400', icon: User },
-                    { label: 'Messages', value: messages?.length || 0, color: 'text-purple-400', icon: Mail }
+                    { label: 'Messages', value: messageCount || 0, color: 'text-purple-400', icon: Mail }
                 ].map((stat, i) => (
                     <div key={i} className="bg-[#1e1e1f] p-8 rounded-3xl border border-gray-800">
                         <div className="flex justify-between items-center mb-4">
@@ -265,6 +265,32 @@ const BroadcastTab = ({ token }) => {
         setStatus({ type: 'success', msg: 'Number added.' });
     };
 
+    // The server queues a campaign and sends it in the background; poll until it finishes
+    const pollCampaign = async (campaign) => {
+        const describe = (c) => `${c.sent} sent, ${c.failed} failed, ${c.pending} pending of ${c.total}` +
+            (c.invalid || c.duplicates ? ` (${c.invalid} invalid, ${c.duplicates} duplicate numbers skipped)` : '');
+        // A campaign whose worker went away is resumed by the server within a few minutes;
+        // stop watching if it makes no progress for longer than that
+        const stallLimit = 5 * 60 * 1000;
+        let lastProgress = Date.now();
+        while (campaign.status !== 'completed') {
+            if (Date.now() - lastProgress > stallLimit) {
+                setStatus({ type: 'info', msg: `Broadcast is still queued on the server: ${describe(campaign)}. Check back later.` });
+                return;
+            }
+            setStatus({ type: 'info', msg: `Sending broadcast... ${describe(campaign)}` });
+            await new Promise(resolve => setTimeout(resolve, 2000));
+            const response = await fetch(getApiUrl(`broadcast-message/${campaign._id}`), {
+                headers: { 'Authorization': `Bearer ${token}` }
+            });
+            if (!response.ok) throw new Error('Lost track of the broadcast campaign');
+            const next = await response.json();
+            if (next.pending !== campaign.pending || next.status !== campaign.status) lastProgress = Date.now();
+            campaign = next;
+        }
+        setStatus({ type: campaign.failed ? 'error' : 'success', msg: `Broadcast finished: ${describe(campaign)}` });
+    };
+
     const sendBroadcast = async () => {
         if (smsData.numbers.length === 0) {
             setStatus({ type: 'error', msg: 'No phone numbers loaded.' });
@@ -284,7 +310,6 @@ const BroadcastTab = ({ token }) => {
 
         setSending(true);
         setStatus({ type: 'info', msg: 'Sending broadcast...' });
-        console.log("Attempting to send broadcast to:", smsData.numbers);
 
         try {
             // Using fetch instead of axios to debug Network Error
@@ -303,8 +328,8 @@ const BroadcastTab = ({ token }) => {
             const data = await response.json();
 
             if (response.ok) {
-                setStatus({ type: 'success', msg: `Broadcast processed! API Response: ${JSON.stringify(data.api_response)}` });
                 setSmsData({ numbers: [], message: '' });
+                await pollCampaign(data.campaign);
             } else {
                 throw new Error(data.error || 'Server responded with error');
             }
@@ -416,10 +441,218 @@ const BroadcastTab = ({ token }) => {
     );
 };
 
+// Blog posts live in their own collection (/api/blog): the list loads
+// summaries a page at a time, a post's body is fetched when it is opened, and
+// each post is saved on its own with the version it was loaded at.
+const BLOG_FIELDS = ['title', 'category', 'date', 'image', 'image_srcset', 'content'];
+
+const BlogPostsEditor = ({ token }) => {
+    const [posts, setPosts] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [openId, setOpenId] = useState(null);
+    const [saving, setSaving] = useState(null);
+    const auth = { headers: { Authorization: `Bearer ${token}` } };
+
+    const loadPage = async (cursor) => {
+        try {
+            const res = await axios.get(getApiUrl('blog'), { params: cursor ? { cursor } : {} });
+            setPosts(prev => cursor ? [...prev, ...res.data.posts] : res.data.posts);
+            setNextCursor(res.data.next_cursor);
+        } catch (err) {
+            console.error("Error fetching blog posts", err);
+        }
+    };
+
+    useEffect(() => {
+        loadPage(null);
+    }, []);
+
+    const editPost = (id, changes) => {
+        setPosts(prev => prev.map(p => p.id === id ? { ...p, ...changes, dirty: true } : p));
+    };
+
+    const replacePost = (id, post) => {
+        setPosts(prev => prev.map(p => p.id === id ? post : p));
+    };
+
+    const togglePost = async (post) => {
+        if (openId === post.id) {
+            setOpenId(null);
+            return;
+        }
+        setOpenId(post.id);
+        if (post.content !== undefined) return;
+        try {
+            const res = await axios.get(getApiUrl(`blog/${encodeURIComponent(post.slug)}`));
+            // Keep any edits made while the body was loading
+            setPosts(prev => prev.map(p => p.id === post.id ? { ...res.data, ...p } : p));
+        } catch (err) {
+            console.error("Error fetching blog post", err);
+        }
+    };
+
+    const savePost = async (post) => {
+        const fields = {};
+        BLOG_FIELDS.forEach(key => {
+            if (post[key] !== undefined) fields[key] = post[key];
+        });
+        setSaving(post.id);
+        try {
+            const res = post.isNew
+                ? await axios.post(getApiUrl('blog'), fields, auth)
+                : await axios.put(getApiUrl(`blog/${post.id}`), { ...fields, version: post.version }, auth);
+            replacePost(post.id, res.data);
+            if (openId === post.id) setOpenId(res.data.id);
+        } catch (err) {
+            if (err.response?.status === 409) {
+                alert('This post was changed in another session. Reloading the latest version.');
+                replacePost(post.id, err.response.data.current);
+                return;
+            }
+            alert('Failed to save post');
+        } finally {
+            setSaving(null);
+        }
+    };
+
+    const deletePost = async (post) => {
+        if (!window.confirm('Are you sure you want to delete this post?')) return;
+        if (!post.isNew) {
+            try {
+                await axios.delete(getApiUrl(`blog/${post.id}`), { ...auth, params: { version: post.version } });
+            } catch (err) {
+                if (err.response?.status === 409) {
+                    alert('This post was changed in another session. Reloading the latest version.');
+                    replacePost(post.id, err.response.data.current);
+                } else {
+                    alert('Failed to delete post');
+                }
+                return;
+            }
+        }
+        setPosts(prev => prev.filter(p => p.id !== post.id));
+    };
+
+    const addPost = () => {
+        const id = `new-${Date.now()}`;
+        setPosts(prev => [{
+            id,
+            isNew: true,
+            dirty: true,
+            title: 'New Post',
+            date: new Date().toLocaleDateString('en-US', { month: 'short', day: 'numeric', year: 'numeric' }),
+            category: 'Technology',
+            image: 'https://via.placeholder.com/800x400',
+            content: 'Post content here...'
+        }, ...prev]);
+        setOpenId(id);
+    };
+
+    return renderCard("Blog Posts", (
+        <div className="space-y-4">
+            <button
+                onClick={addPost}
+                className="w-full border-2 border-dashed border-gray-800 py-6 rounded-2xl text-gray-500 hover:text-orange-400 hover:border-orange-400/50 transition-all flex items-center justify-center gap-2 group"
+            >
+                <Plus size={20} />
+                <span className="font-bold">Write New Post</span>
+            </button>
+            {posts.map(post => (
+                <div key={post.id} className="bg-[#121212] rounded-2xl border border-gray-800 p-6 space-y-4">
+                    <div className="flex items-center justify-between gap-4">
+                        <button onClick={() => togglePost(post)} className="flex-1 text-left">
+                            <h5 className="text-white font-bold">{post.title || 'Untitled'}</h5>
+                            <p className="text-gray-500 text-xs mt-1">
+                                {post.date}{post.category ? ` · ${post.category}` : ''}{post.dirty ? ' · unsaved changes' : ''}
+                            </p>
+                        </button>
+                        <div className="flex items-center gap-2">
+                            {post.dirty && (
+                                <button
+                                    onClick={() => savePost(post)}
+                                    disabled={saving === post.id}
+                                    className="bg-orange-400 hover:bg-orange-500 text-black p-2 rounded-lg transition-all disabled:opacity-50"
+                                    title="Save Post"
+                                >
+                                    <Save size={18} />
+                                </button>
+                            )}
+                            <button
+                                onClick={() => deletePost(post)}
+                                className="bg-red-500/20 hover:bg-red-500 text-red-500 hover:text-white p-2 rounded-lg transition-all"
+                                title="Delete Post"
+                            >
+                                <Trash size={18} />
+                            </button>
+                        </div>
+                    </div>
+
+                    {openId === post.id && (
+                        <div className="grid md:grid-cols-[250px_1fr] gap-6 pt-4 border-t border-gray-800">
+                            <div>
+                                <ImageUpload
+                                    label="Featured Image"
+                                    token={token}
+                                    initialImage={post.image}
+                                    onUpload={(url, manifest) => editPost(post.id, { image: url, image_srcset: manifest?.srcset || '' })}
+                                />
+                                <input
+                                    value={post.date || ''}
+                                    onChange={(e) => editPost(post.id, { date: e.target.value })}
+                                    className="w-full bg-transparent border-b border-gray-800 py-2 mt-2 text-gray-500 text-xs outline-none"
+                                    placeholder="Date"
+                                />
+                            </div>
+                            <div className="space-y-4">
+                                <input
+                                    value={post.title || ''}
+                                    onChange={(e) => editPost(post.id, { title: e.target.value })}
+                                    className="w-full bg-transparent text-xl font-bold text-white outline-none placeholder-gray-600"
+                                    placeholder="Post Title"
+                                />
+                                <input
+                                    value={post.category || ''}
+                                    onChange={(e) => editPost(post.id, { category: e.target.value })}
+                                    className="w-full bg-transparent text-orange-400 text-xs uppercase font-bold outline-none"
+                                    placeholder="CATEGORY"
+                                />
+                                <div className="bg-[#1a1a1b] rounded-xl border border-gray-800 overflow-hidden">
+                                    {post.content === undefined ? (
+                                        <p className="text-gray-500 text-sm p-6">Loading post...</p>
+                                    ) : (
+                                        <QuillEditor
+                                            value={post.content}
+                                            onChange={(val) => {
+                                                // Quill reports its initial value too; only real edits mark the post dirty
+                                                if (val !== post.content) editPost(post.id, { content: val });
+                                            }}
+                                            token={token}
+                                        />
+                                    )}
+                                </div>
+                            </div>
+                        </div>
+                    )}
+                </div>
+            ))}
+            {nextCursor && (
+                <button
+                    onClick={() => loadPage(nextCursor)}
+                    className="w-full py-3 rounded-xl border border-gray-800 text-gray-400 hover:text-white hover:border-gray-600 transition-all text-sm font-bold"
+                >
+                    Load More Posts
+                </button>
+            )}
+        </div>
+    ));
+};
+
 const AdminDashboard = () => {
     const { token, logout } = useAuth();
     const navigate = useNavigate();
     const [messages, setMessages] = useState([]);
+    const [inboxCursor, setInboxCursor] = useState(null);
+    const [inboxCounts, setInboxCounts] = useState({ total: 0, unread: 0 });
     const [content, setContent] = useState({});
     const [adminSettings, setAdminSettings] = useState({});
     const [activeTab, setActiveTab] = useState('Overview');
@@ -427,6 +660,8 @@ const AdminDashboard = () => {
     const [stats, setStats] = useState({ total_views: 0, total_projects: 0, total_blogs: 0 });
     const [twoFaSetupData, setTwoFaSetupData] = useState({ secret: '', qr_code: '', step: 0 }); // 0: hidden, 1: show QR
 
+    const [sectionVersions, setSectionVersions] = useState({});
+
     const tabs = ['Overview', 'Profile', 'Resume', 'Portfolio & Blogs', 'Skills & Extras', 'Analytics', 'Messages', 'Broadcast', 'Settings', 'Security'];
 
     const fetchData = async () => {
@@ -438,9 +673,16 @@ const AdminDashboard = () => {
             ]);
 
             const contentMap = {};
-            contentResp.data.forEach(item => contentMap[item.section] = item.content);
+            const versions = {};
+            contentResp.data.forEach(item => {
+                contentMap[item.section] = item.content;
+                versions[item.section] = item.version;
+            });
             setContent(contentMap);
-            setMessages(messagesResp.data);
+            setSectionVersions(versions);
+            setMessages(messagesResp.data.messages);
+            setInboxCursor(messagesResp.data.next_cursor);
+            setInboxCounts(messagesResp.data.counts);
             setAdminSettings(settingsResp.data);
         } catch (err) {
             if (err.response?.status === 401) logout();
@@ -456,6 +698,22 @@ const AdminDashboard = () => {
         fetchStats();
     }, [token]);
 
+    const loadMoreMessages = async () => {
+        if (!inboxCursor) return;
+        try {
+            const resp = await axios.get(getApiUrl('inbox'), {
+                params: { cursor: inboxCursor },
+                headers: { Authorization: `Bearer ${token}` }
+            });
+            setMessages(prev => [...prev, ...resp.data.messages]);
+            setInboxCursor(resp.data.next_cursor);
+            setInboxCounts(resp.data.counts);
+        } catch (err) {
+            if (err.response?.status === 401) logout();
+            console.error(err);
+        }
+    };
+
     const fetchStats = async () => {
         try {
             const res = await axios.get(getApiUrl('dashboard-stats'), {
@@ -469,13 +727,19 @@ const AdminDashboard = () => {
 
     const updateContent = async (section, data) => {
         try {
+            // The version makes the save fail (409) instead of overwriting someone else's newer save
             await axios.post(getApiUrl('content'),
-                { section, content: data },
+                { section, content: data, version: sectionVersions[section] },
                 { headers: { Authorization: `Bearer ${token}` } }
             );
             alert('Updated successfully');
             fetchData();
         } catch (err) {
+            if (err.response?.status === 409) {
+                alert('This section was changed in another session. Reloading the latest version.');
+                fetchData();
+                return;
+            }
             alert('Update failed');
         }
     };
@@ -493,9 +757,16 @@ const AdminDashboard = () => {
     };
 
     const downloadBackup = async () => {
-        const data = { content, messages, settings: adminSettings };
-        const blob = new Blob([JSON.stringify(data, null, 2)], { type: "application/json" });
-        saveAs(blob, "portfolio_backup.json");
+        try {
+            const resp = await axios.get(getApiUrl('backup'), {
+                headers: { Authorization: `Bearer ${token}` },
+                responseType: 'blob'
+            });
+            saveAs(resp.data, `portfolio_backup_${new Date().toISOString().slice(0, 10)}.ndjson.gz`);
+        } catch (err) {
+            if (err.response?.status === 401) logout();
+            alert('Backup failed');
+        }
     };
 
     // Icon Selection Helper
@@ -781,7 +1052,7 @@ const AdminDashboard = () => {
                                     <td className="py-4 text-white font-medium">{msg.name}</td>
                                     <td className="py-4 text-gray-400 text-sm">{msg.email}</td>
                                     <td className="py-4 text-gray-400 text-sm">{msg.phone}</td>
-                                    <td className="py-4 text-gray-400 text-sm max-w-sm truncate">{msg.message}</td>
+                                    <td className="py-4 text-gray-400 text-sm max-w-sm truncate">{msg.preview}</td>
                                     <td className="py-4 text-right space-x-4">
                                         <button className="text-gray-500 hover:text-orange-400 transition-colors"><CheckCircle size={18} /></button>
                                         <button className="text-gray-500 hover:text-red-500 transition-colors"><Trash2 size={18} /></button>
@@ -790,6 +1061,11 @@ const AdminDashboard = () => {
                             ))}
                         </tbody>
                     </table>
+                    {inboxCursor && (
+                        <button onClick={loadMoreMessages} className="mt-6 w-full text-sm text-gray-400 hover:text-orange-400 transition-colors">
+                            Load more ({messages.length} of {inboxCounts.total})
+                        </button>
+                    )}
                 </div>
             ), (
                 <button
@@ -1236,9 +1512,10 @@ const AdminDashboard = () => {
                                         label="Project Cover"
                                         token={token}
                                         initialImage={project.image}
-                                        onUpload={(url) => {
+                                        onUpload={(url, manifest) => {
                                             const newList = [...content.portfolio];
                                             newList[i].image = url;
+                                            newList[i].image_srcset = manifest?.srcset || '';
                                             setContent({ ...content, portfolio: newList });
                                         }}
                                     />
@@ -1283,106 +1560,11 @@ const AdminDashboard = () => {
                     </div>
                 </div>
             ))}
-            {renderCard("Blog Posts", (
-                <div className="space-y-4">
-                    {content.blog?.map((post, i) => (
-                        <div key={i} className="bg-[#121212] rounded-2xl border border-gray-800 p-6 space-y-4 group relative">
-                            <button
-                                onClick={() => {
-                                    if (window.confirm('Are you sure you want to delete this post?')) {
-                                        const newList = [...content.blog];
-                                        newList.splice(i, 1);
-                                        setContent({ ...content, blog: newList });
-                                    }
-                                }}
-                                className="absolute top-4 right-4 bg-red-500/20 hover:bg-red-500 text-red-500 hover:text-white p-2 rounded-lg transition-all z-10"
-                                title="Delete Post"
-                            >
-                                <Trash size={18} />
-                            </button>
-
-                            <div className="grid md:grid-cols-[250px_1fr] gap-6">
-                                <div>
-                                    <ImageUpload
-                                        label="Featured Image"
-                                        token={token}
-                                        initialImage={post.image}
-                                        onUpload={(url) => {
-                                            const newList = [...content.blog];
-                                            newList[i].image = url;
-                                            setContent({ ...content, blog: newList });
-                                        }}
-                                    />
-                                    <input
-                                        value={post.date}
-                                        onChange={(e) => {
-                                            const newList = [...content.blog];
-                                            newList[i].date = e.target.value;
-                                            setContent({ ...content, blog: newList });
-                                        }}
-                                        className="w-full bg-transparent border-b border-gray-800 py-2 mt-2 text-gray-500 text-xs outline-none"
-                                        placeholder="Date"
-                                    />
-                                </div>
-                                <div className="space-y-4">
-                                    <input
-                                        value={post.title}
-                                        onChange={(e) => {
-                                            const newList = [...content.blog];
-                                            newList[i].title = e.target.value;
-                                            setContent({ ...content, blog: newList });
-                                        }}
-                                        className="w-full bg-transparent text-xl font-bold text-white outline-none placeholder-gray-600"
-                                        placeholder="Post Title"
-                                    />
-                                    <input
-                                        value={post.category}
-                                        onChange={(e) => {
-                                            const newList = [...content.blog];
-                                            newList[i].category = e.target.value;
-                                            setContent({ ...content, blog: newList });
-                                        }}
-                                        className="w-full bg-transparent text-orange-400 text-xs uppercase font-bold outline-none"
-                                        placeholder="CATEGORY"
-                                    />
-                                    <div className="bg-[#1a1a1b] rounded-xl border border-gray-800 overflow-hidden">
-                                        <QuillEditor
-                                            value={post.content}
-                                            onChange={(val) => {
-                                                const newList = [...content.blog];
-                                                newList[i].content = val;
-                                                setContent({ ...content, blog: newList });
-                                            }}
-                                            token={token}
-                                        />
-                                    </div>
-                                </div>
-                            </div>
-                        </div>
-                    ))}
-                    <button
-                        onClick={() => {
-                            const newList = [...(content.blog || []), {
-                                title: 'New Post',
-                                date: new Date().toLocaleDateString('en-US', { month: 'short', day: 'numeric', year: 'numeric' }),
-                                category: 'Technology',
-                                image: 'https://via.placeholder.com/800x400',
-                                content: 'Post content here...'
-                            }];
-                            setContent({ ...content, blog: newList });
-                        }}
-                        className="w-full border-2 border-dashed border-gray-800 py-6 rounded-2xl text-gray-500 hover:text-orange-400 hover:border-orange-400/50 transition-all flex items-center justify-center gap-2 group"
-                    >
-                        <Plus size={20} />
-                        <span className="font-bold">Write New Post</span>
-                    </button>
-                </div>
-            ))}
+            <BlogPostsEditor token={token} />
             <div className="flex justify-end">
                 <button
                     onClick={() => {
                         updateContent('portfolio', content.portfolio);
-                        updateContent('blog', content.blog);
                     }}
                     className="bg-orange-400 hover:bg-orange-500 text-black font-bold px-10 py-3 rounded-xl transition-all"
                 >
@@ -1785,7 +1967,7 @@ const AdminDashboard = () => {
                     {activeTab === 'Resume' && renderResume()}
                     {activeTab === 'Portfolio & Blogs' && renderPortfolio()}
                     {activeTab === 'Skills & Extras' && renderSkills()}
-                    {activeTab === 'Analytics' && <AnalyticsTab token={token} messages={messages} />}
+                    {activeTab === 'Analytics' && <AnalyticsTab token={token} messageCount={inboxCounts.total} />}
                     {activeTab === 'Messages' && renderMessages()}
                     {activeTab === 'Broadcast' && <BroadcastTab token={token} />}
                     {activeTab === 'Settings' && renderSettings()}
@@ -1,6 +1,5 @@
 import { useState, useEffect } from 'react';
-import axios from 'axios';
-import { getApiUrl } from '../config/api';
+import { getBootstrap, loadContent, loadPublicSettings, contentBySection } from '../config/bootstrap';
 import Sidebar from '../components/Sidebar';
 import AboutTab from '../components/tabs/AboutTab';
 import ResumeTab from '../components/tabs/ResumeTab';
@@ -11,24 +10,18 @@ import { motion, AnimatePresence } from 'framer-motion';
 
 const Home = () => {
     const [activeTab, setActiveTab] = useState('About');
-    const [content, setContent] = useState({});
-    const [settings, setSettings] = useState({});
+    const initial = getBootstrap();
+    const [content, setContent] = useState(() => contentBySection(initial?.content));
+    const [settings, setSettings] = useState(initial?.settings || {});
     const tabs = ['About', 'Resume', 'Portfolio', 'Blog', 'Contact'];
 
     useEffect(() => {
+        if (initial) return;
         const fetchContent = async () => {
             try {
-                const [contentResp, settingsResp] = await Promise.all([
-                    axios.get(getApiUrl('content')),
-                    axios.get(getApiUrl('settings_public')) // We'll need this route
-                ]);
-
-                const data = {};
-                contentResp.data.forEach(item => {
-                    data[item.section] = item.content;
-                });
-                setContent(data);
-                setSettings(settingsResp.data);
+                const [contentList, publicSettings] = await Promise.all([loadContent(), loadPublicSettings()]);
+                setContent(contentBySection(contentList));
+                setSettings(publicSettings);
             } catch (err) {
                 console.error("Error fetching data", err);
             }
@@ -1,6 +1,5 @@
 import React, { useEffect, useState } from 'react';
-import axios from 'axios';
-import { getApiUrl } from '../config/api';
+import { loadContent } from '../config/bootstrap';
 import { Mail, Phone, MapPin, Loader2 } from 'lucide-react';
 
 const Maintenance = () => {
@@ -12,8 +11,8 @@ const Maintenance = () => {
             try {
                 // Fetch public settings/content to display contact info
                 // We'll try to get content 'personal_info'
-                const resp = await axios.get(getApiUrl('content'));
-                const personal = resp.data.find(item => item.section === 'personal_info')?.content;
+                const content = await loadContent();
+                const personal = content.find(item => item.section === 'personal_info')?.content;
                 setContactInfo(personal);
             } catch (err) {
                 console.error("Failed to fetch contact info", err);